@@ -0,0 +1,151 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import glob
+import multiprocessing
+from .MsgPackWrapper import MsgPackWrapper, DEBUGLEVEL
+
+__author__ = 'jleuven'
+
+
+def findRecordings(inputs, pattern="*_PlayerData.lz4"):
+    """
+        Collect recordings from directories, glob patterns and/or file names
+        :param inputs: directory, glob pattern, file name or a list of those
+        :param pattern: pattern to use for directories
+        :return: sorted list of file names
+    """
+    if not isinstance(inputs, (list, tuple)):
+        inputs = [inputs]
+    recordings = set()
+    for input_name in inputs:
+        if os.path.isdir(input_name):
+            recordings.update(glob.glob(os.path.join(input_name, pattern)))
+        else:
+            recordings.update(file_name for file_name in glob.glob(input_name) if os.path.isfile(file_name))
+    return sorted(recordings)
+
+
+def getOutputFileName(input_file_name, output_dir=None, extension=".npz"):
+    """
+        Determine output file name for a recording
+        :param input_file_name: Name of the recording
+        :param output_dir: Output directory (None: next to the recording)
+        :param extension: Extension of the output file
+        :return: output file name
+    """
+    base_name = os.path.splitext(os.path.basename(input_file_name))[0] + extension
+    if output_dir is None:
+        return os.path.join(os.path.dirname(input_file_name), base_name)
+    return os.path.join(output_dir, base_name)
+
+
+def isConverted(input_file_name, output_file_name):
+    """
+        Check if a recording is already converted (output exists and is newer than the input)
+        :param input_file_name: Name of the recording
+        :param output_file_name: Name of the output file
+        :return: Boolean
+    """
+    return os.path.isfile(output_file_name) and os.path.getmtime(output_file_name) >= os.path.getmtime(input_file_name)
+
+
+def convertRecording(input_file_name, output_file_name, **options):
+    """
+        Decode a single recording and store it with savez. The output is written under a temporary name first, so an
+        interrupted conversion never leaves a file that looks complete
+        :param input_file_name: Name of the recording
+        :param output_file_name: Name of the output file
+        :param options: MsgPackWrapper options (skip_frames, as_numpy, min_life, all_life_matters, ...)
+        :return: Number of frames converted
+    """
+    wrapper = MsgPackWrapper(input_file_name, **options)
+    try:
+        wrapper.getAllFrames()
+        temp_output_file_name = output_file_name + ".part"
+        wrapper.savez(temp_output_file_name)
+        if os.path.isfile(output_file_name):
+            os.remove(output_file_name)
+        os.rename(temp_output_file_name, output_file_name)
+        return len(wrapper)
+    finally:
+        wrapper.closeInputFile()
+
+
+def _convertJob(job):
+    """
+        Worker function for the process pool (errors are returned, so one bad file does not stop the batch)
+        :param job: (input_file_name, output_file_name, options)
+        :return: (input_file_name, output_file_name, number of frames, error message)
+    """
+    input_file_name, output_file_name, options = job
+    try:
+        return input_file_name, output_file_name, convertRecording(input_file_name, output_file_name, **options), None
+    except Exception as e:
+        return input_file_name, output_file_name, 0, "{}: {}".format(type(e).__name__, e)
+
+
+def printProgress(done, total, input_file_name, num_frames, error):
+    """
+        Default progress report
+        :param done: Number of finished recordings
+        :param total: Number of recordings
+        :param input_file_name: Name of the finished recording
+        :param num_frames: Number of frames converted
+        :param error: Error message (None when successful)
+        :return: None
+    """
+    if error is None:
+        print("[{}/{}] {} ({} frames)".format(done, total, input_file_name, num_frames))
+    else:
+        print("[{}/{}] FAILED {}: {}".format(done, total, input_file_name, error))
+
+
+def convertRecordings(inputs, output_dir=None, processes=None, resume=True, progress=printProgress,
+                      skip_frames=5, as_numpy=True, all_life_matters=False, min_life=5,
+                      debug_level=DEBUGLEVEL.ERROR, header_resolver=None):
+    """
+        Convert a batch of recordings to npz files in parallel, one process per recording
+        :param inputs: directory, glob pattern, file name or a list of those --> findRecordings
+        :param output_dir: Output directory (None: next to the recordings)
+        :param processes: Number of worker processes (None: number of cpus)
+        :param resume: Skip recordings that are already converted
+        :param progress: Function called after every recording (see printProgress), None to disable
+        :param skip_frames: Use one in every 'skip_frames' for output data
+        :param as_numpy: Store output data in a numpy array
+        :param all_life_matters: No minimal life-threshold for players
+        :param min_life: minimal life-threshold for players
+        :param debug_level: Debug level
+        :param header_resolver: HeaderResolver for missing header values (e.g. HeaderResolver(offline=True))
+        :return: dict with input file name -> error message (None when successful or skipped)
+    """
+    options = {"skip_frames": skip_frames,
+               "as_numpy": as_numpy,
+               "all_life_matters": all_life_matters,
+               "min_life": min_life,
+               "debug_level": debug_level,
+               "header_resolver": header_resolver}
+    if output_dir is not None and not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    results = {}
+    jobs = []
+    for input_file_name in findRecordings(inputs):
+        output_file_name = getOutputFileName(input_file_name, output_dir=output_dir)
+        if resume and isConverted(input_file_name, output_file_name):
+            results[input_file_name] = None
+        else:
+            jobs.append((input_file_name, output_file_name, options))
+    if not jobs:
+        return results
+
+    pool = multiprocessing.Pool(processes=min(processes or multiprocessing.cpu_count(), len(jobs)))
+    try:
+        for done, (input_file_name, _, num_frames, error) in enumerate(pool.imap_unordered(_convertJob, jobs)):
+            results[input_file_name] = error
+            if progress is not None:
+                progress(done + 1, len(jobs), input_file_name, num_frames, error)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return results
@@ -0,0 +1,266 @@
+"""
+    Benchmarks on synthetic recordings (see SyntheticRecording). Every benchmark runs in a new process, so the peak RSS
+    belongs to that benchmark only. Run with: python -m MsgPackWrapper.Benchmark --help
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from .MsgPackWrapper import MsgPackWrapper
+from .HeaderResolver import HeaderResolver
+from .SyntheticRecording import generateRecording, getRecordingFileName
+
+__author__ = 'jleuven'
+
+
+def _benchmarkNext(input_file_name, work_dir, options):
+    wrapper = MsgPackWrapper(input_file_name, **options)
+    begin = time.time()
+    num_frames = sum(1 for _ in wrapper)
+    return num_frames, time.time() - begin
+
+
+def _benchmarkGetAllFrames(input_file_name, work_dir, options):
+    wrapper = MsgPackWrapper(input_file_name, **options)
+    begin = time.time()
+    wrapper.getAllFrames()
+    return len(wrapper), time.time() - begin
+
+
+def _benchmarkPassThrough(input_file_name, work_dir, options):
+    begin = time.time()
+    wrapper = MsgPackWrapper(input_file_name, os.path.join(work_dir, "pass_through.lz4"), pass_through_only=True,
+                             **options)
+    elapsed = time.time() - begin
+    wrapper.closeInputFile()
+    return None, elapsed
+
+
+def _benchmarkSelectionSingle(input_file_name, work_dir, options):
+    wrapper = MsgPackWrapper(input_file_name, **options)
+    wrapper.getAllFrames()
+    duration = wrapper.all_data[-1][-1]
+    begin = time.time()
+    wrapper.writeMsgPackFrameSelectionSingle(os.path.join(work_dir, "selection.lz4"), from_timestamp=duration / 4,
+                                             to_timestamp=duration * 3 / 4)
+    return len(wrapper) // 2, time.time() - begin
+
+
+def _benchmarkSavez(input_file_name, work_dir, options):
+    wrapper = MsgPackWrapper(input_file_name, **options)
+    wrapper.getAllFrames()
+    begin = time.time()
+    wrapper.savez(os.path.join(work_dir, "output.npz"))
+    return len(wrapper), time.time() - begin
+
+
+def _benchmarkLoadz(input_file_name, work_dir, options):
+    npz_file_name = os.path.join(work_dir, "output.npz")
+    if not os.path.isfile(npz_file_name):
+        _benchmarkSavez(input_file_name, work_dir, options)
+    wrapper = MsgPackWrapper(**options)
+    begin = time.time()
+    wrapper.loadz(npz_file_name)
+    return len(wrapper), time.time() - begin
+
+
+# name -> (function, MsgPackWrapper options)
+BENCHMARKS = [("next", _benchmarkNext, {"as_numpy": True}),
+              ("getAllFrames", _benchmarkGetAllFrames, {"as_numpy": False}),
+              ("passThrough", _benchmarkPassThrough, {}),
+              ("passThroughFastRepair", _benchmarkPassThrough, {"fast_repair": True}),
+              ("passThroughCompressThreads", _benchmarkPassThrough, {"compress_threads": 4}),
+              ("writeMsgPackFrameSelectionSingle", _benchmarkSelectionSingle, {"as_numpy": True}),
+              ("savez", _benchmarkSavez, {"as_numpy": True}),
+              ("loadz", _benchmarkLoadz, {"as_numpy": True})]
+
+
+def getPeakRSS():
+    """
+        Peak resident set size of the current process
+        :return: bytes
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _runBenchmark(connection, benchmark, input_file_name, work_dir, options):
+    """
+        Process function: run one benchmark and send (num_frames, seconds, peak rss, error) back
+    """
+    try:
+        num_frames, elapsed = benchmark(input_file_name, work_dir, options)
+        connection.send((num_frames, elapsed, getPeakRSS(), None))
+    except Exception as e:
+        connection.send((None, None, getPeakRSS(), "{}: {}".format(type(e).__name__, e)))
+    finally:
+        connection.close()
+
+
+def runBenchmark(benchmark, input_file_name, work_dir, options):
+    """
+        Run a benchmark function in a new process
+        :param benchmark: benchmark function (input_file_name, work_dir, options) -> (num_frames, seconds)
+        :param input_file_name: Name of the recording
+        :param work_dir: Directory for output files
+        :param options: MsgPackWrapper options
+        :return: (num_frames, seconds, peak rss in bytes, error message)
+    """
+    parent_connection, child_connection = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_runBenchmark,
+                                      args=(child_connection, benchmark, input_file_name, work_dir, options))
+    process.start()
+    child_connection.close()
+    try:
+        result = parent_connection.recv()
+    except EOFError:
+        result = (None, None, None, "process died (exit code {})".format(process.exitcode))
+    process.join()
+    return result
+
+
+def runBenchmarks(num_frames_list=(3000, 30000), max_players_list=(10, 30), legacy_list=(False, True), skip_frames=1,
+                  benchmarks=None, repeat=1, work_dir=None, report=None):
+    """
+        Generate synthetic recordings and run the benchmarks on them
+        :param num_frames_list: Recording sizes (frames)
+        :param max_players_list: maxPlayers values
+        :param legacy_list: Formats (False: current, True: legacy)
+        :param skip_frames: skip_frames option of MsgPackWrapper
+        :param benchmarks: Names of benchmarks to run (None: all, see BENCHMARKS)
+        :param repeat: Number of runs per benchmark (the fastest run is reported)
+        :param work_dir: Directory for recordings and outputs (None: temporary directory, removed afterwards)
+        :param report: Function called with every result dict (None: printResult)
+        :return: list of result dicts
+    """
+    report = report or printResult
+    remove_work_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="MsgPackWrapper-benchmark-")
+    results = []
+    try:
+        for num_frames in num_frames_list:
+            for max_players in max_players_list:
+                for legacy in legacy_list:
+                    case_dir = os.path.join(work_dir, "{}-{}-{}".format(num_frames, max_players,
+                                                                        "legacy" if legacy else "current"))
+                    if not os.path.isdir(case_dir):
+                        os.makedirs(case_dir)
+                    input_file_name = os.path.join(case_dir, getRecordingFileName(datetime.datetime(2016, 11, 24, 16)))
+                    raw_size = generateRecording(input_file_name, num_frames=num_frames, max_players=max_players,
+                                                 legacy=legacy)
+                    input_size = os.path.getsize(input_file_name)
+                    for name, benchmark, benchmark_options in BENCHMARKS:
+                        if benchmarks is not None and name not in benchmarks:
+                            continue
+                        options = dict(benchmark_options, skip_frames=skip_frames,
+                                       header_resolver=HeaderResolver(cache_file_name="", offline=True))
+                        runs = [runBenchmark(benchmark, input_file_name, case_dir, options) for _ in range(repeat)]
+                        successful_runs = [run for run in runs if run[3] is None] or runs
+                        frames, elapsed, peak_rss, error = min(successful_runs, key=lambda run: run[1] or 0)
+                        if frames is None and error is None:
+                            frames = num_frames
+                        result = {"benchmark": name,
+                                  "numFrames": num_frames,
+                                  "maxPlayers": max_players,
+                                  "legacy": legacy,
+                                  "inputBytes": input_size,
+                                  "rawBytes": raw_size,
+                                  "frames": frames,
+                                  "seconds": elapsed,
+                                  "framesPerSecond": frames / elapsed if elapsed else None,
+                                  "MBPerSecond": raw_size / elapsed / 1e6 if elapsed else None,
+                                  "peakRSS": peak_rss,
+                                  "error": error}
+                        results.append(result)
+                        report(result)
+    finally:
+        if remove_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def runStartupBenchmark(input_file_name, repeat=10):
+    """
+        Measure the startup time of the command line tool (new python process per run, the fastest run is reported)
+        :param input_file_name: Name of a recording for the info subcommand
+        :param repeat: Number of runs per command
+        :return: dict with command -> seconds
+    """
+    commands = {"python": [sys.executable, "-c", "pass"],
+                "--help": [sys.executable, "-m", "MsgPackWrapper.CommandLine", "--help"],
+                "info": [sys.executable, "-m", "MsgPackWrapper.CommandLine", "info", input_file_name],
+                "import MsgPackWrapper": [sys.executable, "-c", "from MsgPackWrapper import MsgPackWrapper"]}
+    results = {}
+    with open(os.devnull, "w") as devnull:
+        for name, command in commands.items():
+            runs = []
+            for _ in range(repeat):
+                begin = time.time()
+                subprocess.check_call(command, stdout=devnull)
+                runs.append(time.time() - begin)
+            results[name] = min(runs)
+    return results
+
+
+def printResult(result):
+    """
+        Default report: one line per result
+        :param result: result dict (see runBenchmarks)
+        :return: None
+    """
+    case = "{numFrames:>7} frames {maxPlayers:>3} players {0:<7}".format("legacy" if result["legacy"] else "current",
+                                                                          **result)
+    if result["error"] is not None:
+        print("{} {:<33} FAILED {}".format(case, result["benchmark"], result["error"]))
+    else:
+        print("{} {:<33} {:>10.0f} frames/s {:>8.1f} MB/s {:>8.1f} MB rss".format(
+            case, result["benchmark"], result["framesPerSecond"] or 0, result["MBPerSecond"] or 0,
+            result["peakRSS"] / 1e6))
+    sys.stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MsgPackWrapper benchmarks on synthetic recordings")
+    parser.add_argument("--frames", type=int, nargs="+", default=[3000, 30000], help="recording sizes (frames)")
+    parser.add_argument("--max-players", type=int, nargs="+", default=[10, 30], help="maxPlayers values")
+    parser.add_argument("--format", choices=["current", "legacy", "both"], default="both", help="recording format")
+    parser.add_argument("--skip-frames", type=int, default=1, help="skip_frames option")
+    parser.add_argument("--benchmark", nargs="+", choices=[name for name, _, _ in BENCHMARKS], help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per benchmark (fastest is reported)")
+    parser.add_argument("--work-dir", help="keep recordings and outputs in this directory")
+    parser.add_argument("--json", help="also write the results to this json file")
+    parser.add_argument("--startup", action="store_true", help="measure startup time of the command line tool only")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        work_dir = tempfile.mkdtemp(prefix="MsgPackWrapper-benchmark-")
+        try:
+            input_file_name = os.path.join(work_dir, getRecordingFileName(datetime.datetime(2016, 11, 24, 16)))
+            generateRecording(input_file_name, num_frames=args.frames[0])
+            results = runStartupBenchmark(input_file_name, repeat=max(args.repeat, 10))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        for name, seconds in sorted(results.items(), key=lambda result: result[1]):
+            print("{:<33} {:>8.1f} ms".format(name, seconds * 1e3))
+        return 0
+
+    legacy_list = {"current": (False,), "legacy": (True,), "both": (False, True)}[args.format]
+    results = runBenchmarks(num_frames_list=args.frames, max_players_list=args.max_players, legacy_list=legacy_list,
+                            skip_frames=args.skip_frames, benchmarks=args.benchmark, repeat=args.repeat,
+                            work_dir=args.work_dir)
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(results, json_file, indent=2, sort_keys=True)
+    return 1 if any(result["error"] is not None for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
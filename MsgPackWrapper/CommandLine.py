@@ -0,0 +1,245 @@
+"""
+    Command line tool (installed as 'msgpackwrapper'). Run with: msgpackwrapper --help
+
+    The tool is called from shell pipelines many times, so startup time matters: only argparse/json are imported here,
+    every subcommand imports what it needs (info does not load numpy).
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import sys
+import json
+import logging
+import argparse
+
+__author__ = 'jleuven'
+
+
+def _getOptions(args):
+    """
+        MsgPackWrapper options shared by the subcommands
+    """
+    from .MsgPackWrapper import DEBUGLEVEL
+    from .HeaderResolver import HeaderResolver
+    return {"debug_level": DEBUGLEVEL.INFO if args.debug else DEBUGLEVEL.ERROR,
+            "header_resolver": HeaderResolver(offline=True) if args.offline else None,
+            "decode_threads": args.decode_threads,
+            "follow": args.follow,
+            "follow_timeout": args.follow_timeout}
+
+
+def _toJson(value):
+    """
+        json.dumps default: msg-pack raw strings -> text
+    """
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return repr(value)
+
+
+def readInfo(input_file_name, scan=False):
+    """
+        Read the header of a recording (only the first lz4-block is decompressed). With scan, all frames are skipped
+        through to count them and to find the footer
+        :param input_file_name: Name of the recording (or of a cache directory written by saveCache)
+        :param scan: Read the whole file
+        :return: dict with header (and footer, frames, selections when scanned or stored in the cache)
+    """
+    if os.path.isdir(input_file_name):
+        # Cache directory: the manifest has everything
+        with open(os.path.join(input_file_name, "manifest.json"), "r") as manifest_file:
+            manifest = json.load(manifest_file)
+        return {"header": manifest["header"], "footer": manifest["footer"], "frames": manifest["numFrames"]}
+
+    import msgpack
+    from .Lz4FrameReader import Lz4FrameReader
+    with open(input_file_name, "rb") as input_file:
+        lz4_reader = Lz4FrameReader(input_file)
+        unpacker = msgpack.Unpacker(lz4_reader, use_list=False)
+        info = {"header": unpacker.unpack(), "lz4Frames": lz4_reader.num_frames}
+        if not scan:
+            return info
+
+        info.update(footer=None, frames=0, selections=1)
+        try:
+            while True:
+                # Frames are only skipped; the footer and headers of next selections are recognised by their keys
+                msg_pack_frame = {}
+                for _ in range(unpacker.read_map_header()):
+                    key = unpacker.unpack()
+                    if key in ("endLogTime", "maxPlayers"):
+                        msg_pack_frame[key] = unpacker.unpack()
+                    else:
+                        unpacker.skip()
+                if "endLogTime" in msg_pack_frame:
+                    info["footer"] = msg_pack_frame
+                elif "maxPlayers" in msg_pack_frame:
+                    info["selections"] += 1
+                else:
+                    info["frames"] += 1
+        except (EOFError, StopIteration, msgpack.OutOfData):
+            pass
+        return info
+
+
+def _commandInfo(args):
+    for input_file_name in args.input:
+        info = readInfo(input_file_name, scan=args.scan)
+        if len(args.input) > 1:
+            info["file"] = input_file_name
+        print(json.dumps(info, default=_toJson, sort_keys=True, indent=args.indent))
+    return 0
+
+
+def _commandRepair(args):
+    from .MsgPackWrapper import MsgPackWrapper
+    output_file_name = args.output or args.input.replace(".lz4", "-repaired.lz4")
+    MsgPackWrapper(args.input, output_file_name, pass_through_only=True, flush_size=args.flush_size,
+                   fast_repair=args.fast, compress_threads=args.compress_threads, single_float=args.single_float,
+                   **_getOptions(args))
+    print(output_file_name)
+    return 0
+
+
+def _commandClip(args):
+    from .MsgPackWrapper import MsgPackWrapper
+    if args.output and len(args.output) != len(args.clip):
+        raise ValueError("Number of output files ({}) does not match number of clips ({})".format(len(args.output),
+                                                                                                   len(args.clip)))
+    wrapper = MsgPackWrapper(args.input, retain_data=False, retain_msg_pack_data=False,
+                             compress_threads=args.compress_threads, single_float=args.single_float,
+                             **_getOptions(args))
+    clips = wrapper.splitClips([from_timestamp for from_timestamp, _ in args.clip],
+                               [to_timestamp for _, to_timestamp in args.clip], output_file_names=args.output or None)
+    wrapper.closeInputFile()
+    for output_file_name, num_frames in clips:
+        print("{}\t{}".format(output_file_name, num_frames))
+    return 0
+
+
+def _commandConvert(args):
+    import numpy as np
+    from .MsgPackWrapper import MsgPackWrapper
+    wrapper = MsgPackWrapper(args.input, use_iterator=False, skip_frames=args.skip_frames, as_numpy=True,
+                             all_life_matters=args.all_life_matters, min_life=args.min_life,
+                             retain_msg_pack_data=False, dtype=np.float32 if args.float32 else np.float64,
+                             **_getOptions(args))
+    wrapper.closeInputFile()
+    if args.output.endswith(".npz"):
+        wrapper.savez(args.output)
+    else:
+        wrapper.saveCache(args.output)
+    print("{}\t{}".format(args.output, len(wrapper)))
+    return 0
+
+
+def _aggregateFile(args_input_file_name):
+    """
+        Aggregate one recording (runs in the worker processes)
+    """
+    args, input_file_name = args_input_file_name
+    from .MsgPackWrapper import MsgPackWrapper
+    wrapper = MsgPackWrapper(input_file_name, skip_frames=args.skip_frames, as_numpy=True,
+                             all_life_matters=args.all_life_matters, min_life=args.min_life, retain_data=False,
+                             retain_msg_pack_data=False, **_getOptions(args))
+    aggregator = wrapper.aggregate(bins=args.bins)
+    wrapper.closeInputFile()
+    return aggregator
+
+
+def _commandAggregate(args):
+    work = [(args, input_file_name) for input_file_name in args.input]
+    if args.processes > 1:
+        from multiprocessing import Pool
+        pool = Pool(args.processes)
+        try:
+            aggregators = pool.map(_aggregateFile, work)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        aggregators = [_aggregateFile(file_work) for file_work in work]
+    aggregator = aggregators[0]
+    for other in aggregators[1:]:
+        aggregator.merge(other)
+    print(json.dumps(aggregator.asDict(), sort_keys=True, indent=args.indent))
+    return 0
+
+
+def createParser():
+    """
+        :return: argparse.ArgumentParser for the command line tool
+    """
+    parser = argparse.ArgumentParser(prog="msgpackwrapper", description="Incatec PlayerData recording tool")
+    parser.add_argument("--offline", action="store_true", help="never resolve missing header values over the network")
+    parser.add_argument("--debug", action="store_true", help="log INFO messages and show tracebacks")
+    subparsers = parser.add_subparsers(dest="command")
+
+    info_parser = subparsers.add_parser("info", help="print header (and footer) as json")
+    info_parser.add_argument("input", nargs="+", help="recording(s) or cache directories")
+    info_parser.add_argument("--scan", action="store_true", help="read the whole file: footer and number of frames")
+    info_parser.add_argument("--indent", type=int, default=None, help="json indentation")
+    info_parser.set_defaults(function=_commandInfo)
+
+    repair_parser = subparsers.add_parser("repair", help="fix header and frames of a recording (passThrough)")
+    repair_parser.add_argument("input", help="recording")
+    repair_parser.add_argument("-o", "--output", help="output file (default: <input>-repaired.lz4)")
+    repair_parser.add_argument("--fast", action="store_true", help="copy frames that need no fixes as raw bytes")
+    repair_parser.add_argument("--flush-size", type=int, default=1 << 20, help="bytes to collect before compressing")
+    repair_parser.set_defaults(function=_commandRepair)
+
+    clip_parser = subparsers.add_parser("clip", help="cut clips out of a recording (one pass, not loaded in memory)")
+    clip_parser.add_argument("input", help="recording")
+    clip_parser.add_argument("--clip", nargs=2, type=float, action="append", required=True, metavar=("FROM", "TO"),
+                             help="clip between two timestamps (seconds), can be repeated")
+    clip_parser.add_argument("-o", "--output", action="append", help="output file per clip (default: "
+                                                                      "<input>-clip-<nr>.lz4)")
+    clip_parser.set_defaults(function=_commandClip)
+
+    convert_parser = subparsers.add_parser("convert", help="decode a recording to an npz file or a frame cache")
+    convert_parser.add_argument("input", help="recording")
+    convert_parser.add_argument("output", help="output .npz file or cache directory")
+    convert_parser.add_argument("--float32", action="store_true", help="store frames as 32 bit floats")
+    convert_parser.set_defaults(function=_commandConvert)
+
+    aggregate_parser = subparsers.add_parser("aggregate", help="heatmaps and player statistics of recordings as json "
+                                                                "(one pass, not loaded in memory)")
+    aggregate_parser.add_argument("input", nargs="+", help="recording(s), the results are merged")
+    aggregate_parser.add_argument("--bins", nargs=2, type=int, default=(100, 60), metavar=("LENGTH", "WIDTH"),
+                                  help="number of heatmap bins")
+    aggregate_parser.add_argument("--processes", type=int, default=1, help="aggregate files in parallel processes")
+    aggregate_parser.add_argument("--indent", type=int, default=None, help="json indentation")
+    aggregate_parser.set_defaults(function=_commandAggregate)
+
+    for subparser in (convert_parser, aggregate_parser):
+        subparser.add_argument("--skip-frames", type=int, default=5, help="use one in every SKIP_FRAMES frames")
+        subparser.add_argument("--min-life", type=int, default=5, help="minimal life-threshold for players")
+        subparser.add_argument("--all-life-matters", action="store_true", help="no minimal life-threshold")
+    for subparser in (repair_parser, clip_parser, convert_parser, aggregate_parser):
+        subparser.add_argument("--decode-threads", type=int, default=0, help="threads that decompress the input")
+        subparser.add_argument("--follow", action="store_true", help="input is still being written: wait for new data "
+                                                                     "until the footer")
+        subparser.add_argument("--follow-timeout", type=float, default=None, help="seconds without new data before "
+                                                                                  "the input ends (--follow)")
+    for subparser in (repair_parser, clip_parser):
+        subparser.add_argument("--compress-threads", type=int, default=0, help="threads that compress the output")
+        subparser.add_argument("--single-float", action="store_true", help="write floats as 32 bit floats")
+    return parser
+
+
+def main(argv=None):
+    args = createParser().parse_args(argv)
+    if args.command is None:
+        createParser().print_help()
+        return 2
+    logging.basicConfig(level=logging.INFO if args.debug else logging.WARNING)
+    try:
+        return args.function(args)
+    except Exception as e:
+        if args.debug:
+            raise
+        print("{}: {}".format(type(e).__name__, e), file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
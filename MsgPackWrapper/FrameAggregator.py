@@ -0,0 +1,175 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import numpy as np
+
+__author__ = 'jleuven'
+
+
+class FrameAggregator(object):
+    """
+        Accumulates statistics over processed frames (rows of max_players * [x, y, weight] + ball [x, y, value] +
+        timestamp) in fixed memory:
+            player_heatmap  2-D histogram of player positions on the field (bins[0] x bins[1])
+            ball_heatmap    2-D histogram of ball positions
+            player_counts   number of frames per number of players (0 - max_players)
+            slot_*          count, sum, min and max of x, y and weight per player slot (frames the slot is in use)
+        Normalised player positions (-1 - 1) are scaled by fieldDimensions (half the field size, in meters), ball
+        positions are in meters already (like the visualisation draws them); positions outside the field are counted
+        in the border bins. Empty slots/balls (all values 0) are not counted. Aggregators of other files (or worker
+        processes, the object can be pickled) are combined with merge.
+    """
+
+    def __init__(self, max_players, field_dimensions, bins=(100, 60)):
+        """
+            Constructor
+            :param max_players: maxPlayers of the recordings
+            :param field_dimensions: fieldDimensions of the recordings (half length and width of the field, in meters)
+            :param bins: Number of heatmap bins along the length and width of the field
+        """
+        self.max_players = max_players
+        self.field_dimensions = (float(field_dimensions[0]), float(field_dimensions[1]))
+        self.bins = (int(bins[0]), int(bins[1]))
+        self.num_frames = 0
+        self.first_time_stamp = self.last_time_stamp = None
+        self.player_heatmap = self.ball_heatmap = self.player_counts = None
+        self.slot_counts = self.slot_sums = self.slot_mins = self.slot_maxs = None
+        self.reset()
+
+
+    @classmethod
+    def fromHeader(cls, header, bins=(100, 60)):
+        """
+            Create aggregator for the recordings of a header
+            :param header: msg-pack-header (maxPlayers, fieldDimensions)
+            :param bins: Number of heatmap bins along the length and width of the field
+            :return: FrameAggregator
+        """
+        return cls(header["maxPlayers"], header["fieldDimensions"], bins=bins)
+
+
+    def reset(self):
+        """
+            Clear all statistics
+            :return: None
+        """
+        self.num_frames = 0
+        self.first_time_stamp = self.last_time_stamp = None
+        self.player_heatmap = np.zeros(self.bins, dtype=np.int64)
+        self.ball_heatmap = np.zeros(self.bins, dtype=np.int64)
+        self.player_counts = np.zeros(self.max_players + 1, dtype=np.int64)
+        self.slot_counts = np.zeros(self.max_players, dtype=np.int64)
+        self.slot_sums = np.zeros((self.max_players, 3))
+        self.slot_mins = np.full((self.max_players, 3), np.inf)
+        self.slot_maxs = np.full((self.max_players, 3), -np.inf)
+
+
+    def add(self, frames):
+        """
+            Add processed frames
+            :param frames: array (number of frames x (max_players * 3 + 4)) or one frame
+            :return: None
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        if frames.ndim == 1:
+            frames = frames[np.newaxis]
+        if not len(frames):
+            return
+        players = frames[:, :self.max_players * 3].reshape(len(frames), self.max_players, 3)
+        balls = frames[:, self.max_players * 3:self.max_players * 3 + 2]
+        time_stamps = frames[:, -1]
+
+        in_use = players.any(axis=2)
+        slot_in_use = in_use[:, :, np.newaxis]
+        self.slot_counts += in_use.sum(axis=0)
+        self.slot_sums += np.where(slot_in_use, players, 0.0).sum(axis=0)
+        self.slot_mins = np.minimum(self.slot_mins, np.where(slot_in_use, players, np.inf).min(axis=0))
+        self.slot_maxs = np.maximum(self.slot_maxs, np.where(slot_in_use, players, -np.inf).max(axis=0))
+        self.player_counts += np.bincount(in_use.sum(axis=1), minlength=self.max_players + 1)
+        self.player_heatmap += self.__histogram(players[in_use][:, :2])
+        self.ball_heatmap += self.__histogram(balls[balls.any(axis=1)] / self.field_dimensions)
+
+        self.num_frames += len(frames)
+        first_time_stamp, last_time_stamp = time_stamps.min(), time_stamps.max()
+        if self.first_time_stamp is None or first_time_stamp < self.first_time_stamp:
+            self.first_time_stamp = float(first_time_stamp)
+        if self.last_time_stamp is None or last_time_stamp > self.last_time_stamp:
+            self.last_time_stamp = float(last_time_stamp)
+
+
+    def merge(self, other):
+        """
+            Add the statistics of another aggregator (other file, worker process)
+            :param other: FrameAggregator with the same max_players, field_dimensions and bins
+            :return: self
+        """
+        if (other.max_players, other.field_dimensions, other.bins) != \
+                (self.max_players, self.field_dimensions, self.bins):
+            raise ValueError("Can not merge aggregators with different maxPlayers, fieldDimensions or bins: {}, {}"
+                             .format((self.max_players, self.field_dimensions, self.bins),
+                                     (other.max_players, other.field_dimensions, other.bins)))
+        self.num_frames += other.num_frames
+        for time_stamp in (other.first_time_stamp, other.last_time_stamp):
+            if time_stamp is not None:
+                self.first_time_stamp = time_stamp if self.first_time_stamp is None else \
+                    min(self.first_time_stamp, time_stamp)
+                self.last_time_stamp = time_stamp if self.last_time_stamp is None else \
+                    max(self.last_time_stamp, time_stamp)
+        self.player_heatmap += other.player_heatmap
+        self.ball_heatmap += other.ball_heatmap
+        self.player_counts += other.player_counts
+        self.slot_counts += other.slot_counts
+        self.slot_sums += other.slot_sums
+        self.slot_mins = np.minimum(self.slot_mins, other.slot_mins)
+        self.slot_maxs = np.maximum(self.slot_maxs, other.slot_maxs)
+        return self
+
+
+    def getEdges(self):
+        """
+            :return: (x edges, y edges) of the heatmap bins, in meters
+        """
+        return (np.linspace(-self.field_dimensions[0], self.field_dimensions[0], self.bins[0] + 1),
+                np.linspace(-self.field_dimensions[1], self.field_dimensions[1], self.bins[1] + 1))
+
+
+    def getSlotMeans(self):
+        """
+            :return: array (max_players x 3) with mean x, y and weight per player slot (nan: slot never used)
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.slot_sums / self.slot_counts[:, np.newaxis]
+
+
+    def asDict(self):
+        """
+            :return: dict with all statistics (lists, nan/inf of unused slots as None), e.g. for json reports
+        """
+        def toList(array):
+            return [toList(item) for item in array] if np.ndim(array) > 1 else \
+                [float(value) if np.isfinite(value) else None for value in array]
+
+        return {"numFrames": self.num_frames,
+                "firstTimeStamp": self.first_time_stamp,
+                "lastTimeStamp": self.last_time_stamp,
+                "fieldDimensions": list(self.field_dimensions),
+                "bins": list(self.bins),
+                "playerHeatmap": self.player_heatmap.tolist(),
+                "ballHeatmap": self.ball_heatmap.tolist(),
+                "playerCounts": self.player_counts.tolist(),
+                "meanPlayers": float(np.dot(np.arange(self.max_players + 1), self.player_counts) / self.num_frames)
+                if self.num_frames else None,
+                "slotCounts": self.slot_counts.tolist(),
+                "slotMeans": toList(self.getSlotMeans()),
+                "slotMins": toList(self.slot_mins),
+                "slotMaxs": toList(self.slot_maxs)}
+
+
+    def __histogram(self, positions):
+        """
+            2-D histogram of normalised positions (bin indices are computed directly, cheaper than np.histogram2d)
+            :param positions: array (number of positions x 2), normalised (-1 - 1)
+            :return: array (bins[0] x bins[1]) with counts
+        """
+        bins = np.array(self.bins)
+        indices = np.clip(np.floor((positions + 1.0) / 2.0 * bins).astype(np.int64), 0, bins - 1)
+        return np.bincount(indices[:, 0] * self.bins[1] + indices[:, 1],
+                           minlength=self.bins[0] * self.bins[1]).reshape(self.bins)
@@ -0,0 +1,162 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import json
+import shutil
+import numpy as np
+
+__author__ = 'jleuven'
+
+
+class FrameCache(object):
+    """
+        Columnar cache of processed frames: a directory with one uncompressed .npy file per column and a manifest.
+        Columns are opened with np.load(mmap_mode='r'), so opening is near-instant, only the parts that are used are
+        read and processes that open the same cache share the page cache.
+
+        Columns (N frames, P = maxPlayers):
+            positions   (N, P, 2) normalised player positions per slot
+            weights     (N, P)    player weights per slot
+            ball        (N, 3)    ball x, y and value
+            timestamps  (N,)      (normalised) timestamps
+    """
+    VERSION = 1
+    MANIFEST_FILE_NAME = "manifest.json"
+    COLUMNS = ("positions", "weights", "ball", "timestamps")
+
+    def __init__(self, cache_dir_name, mmap_mode="r"):
+        """
+            Open an existing cache
+            :param cache_dir_name: Name of the cache directory
+            :param mmap_mode: mmap_mode for np.load (None: load columns into memory)
+        """
+        self.cache_dir_name = cache_dir_name
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(cache_dir_name, self.MANIFEST_FILE_NAME), "r") as manifest_file:
+            self.manifest = json.load(manifest_file)
+        if self.manifest.get("version") != self.VERSION:
+            raise ValueError("Unsupported frame cache version: {}".format(self.manifest.get("version")))
+        self.__columns = {}
+
+
+    @classmethod
+    def write(cls, cache_dir_name, data, max_players, header=None, footer=None, options=None):
+        """
+            Write frames (in the row layout of MsgPackWrapper) to a new cache. The cache is written next to the target
+            first and renamed when complete
+            :param cache_dir_name: Name of the cache directory
+            :param data: 2-D array with one frame per row
+            :param max_players: maxPlayers from header
+            :param header: Header to store in the manifest
+            :param footer: Footer to store in the manifest
+            :param options: Options used to create the data (stored in the manifest)
+            :return: FrameCache
+        """
+        data = np.asarray(data)
+        if data.ndim != 2:
+            data = data.reshape((0, max_players * 3 + 4))
+        columns = {"positions": np.stack([data[:, 0:max_players * 3:3], data[:, 1:max_players * 3:3]], axis=2),
+                   "weights": data[:, 2:max_players * 3:3],
+                   "ball": data[:, max_players * 3:max_players * 3 + 3],
+                   "timestamps": data[:, -1]}
+
+        temp_cache_dir_name = "{}.tmp-{}".format(cache_dir_name.rstrip(os.path.sep), os.getpid())
+        if os.path.isdir(temp_cache_dir_name):
+            shutil.rmtree(temp_cache_dir_name)
+        os.makedirs(temp_cache_dir_name)
+        manifest = {"version": cls.VERSION,
+                    "numFrames": len(data),
+                    "maxPlayers": max_players,
+                    "dtype": data.dtype.str,
+                    "timeStampsSorted": bool(np.all(np.diff(columns["timestamps"]) >= 0)),
+                    "columns": {},
+                    "header": header,
+                    "footer": footer,
+                    "options": options}
+        for column_name, column in columns.items():
+            file_name = "{}.npy".format(column_name)
+            np.save(os.path.join(temp_cache_dir_name, file_name), np.ascontiguousarray(column))
+            manifest["columns"][column_name] = {"file": file_name, "shape": list(column.shape)}
+        with open(os.path.join(temp_cache_dir_name, cls.MANIFEST_FILE_NAME), "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+        if os.path.isdir(cache_dir_name):
+            shutil.rmtree(cache_dir_name)
+        os.rename(temp_cache_dir_name, cache_dir_name)
+        return cls(cache_dir_name)
+
+
+    def __len__(self):
+        return self.manifest["numFrames"]
+
+
+    def __getitem__(self, column_name):
+        """
+            Get a complete column (memory-mapped)
+            :param column_name: Name of the column
+            :return: array
+        """
+        if column_name not in self.__columns:
+            if column_name not in self.manifest["columns"]:
+                raise KeyError("Unknown column: {}".format(column_name))
+            self.__columns[column_name] = np.load(
+                os.path.join(self.cache_dir_name, self.manifest["columns"][column_name]["file"]),
+                mmap_mode=self.mmap_mode)
+        return self.__columns[column_name]
+
+
+    def getFrames(self, from_timestamp=None, to_timestamp=None):
+        """
+            Get the frames between two (normalised) timestamps (exclusive, like the selections in MsgPackWrapper)
+            :param from_timestamp: Timestamp at the beginning of selection (seconds, None: from the beginning)
+            :param to_timestamp: Timestamp at the end of the selection (seconds, None: to the end)
+            :return: slice (sorted timestamps) or index array
+        """
+        if from_timestamp is None and to_timestamp is None:
+            return slice(0, len(self))
+        time_stamps = self["timestamps"]
+        from_timestamp = -np.inf if from_timestamp is None else from_timestamp
+        to_timestamp = np.inf if to_timestamp is None else to_timestamp
+        if self.manifest["timeStampsSorted"]:
+            begin = int(np.searchsorted(time_stamps, from_timestamp, side="right"))
+            end = int(np.searchsorted(time_stamps, to_timestamp, side="left"))
+            return slice(begin, max(begin, end))
+        return np.flatnonzero((time_stamps > from_timestamp) & (time_stamps < to_timestamp))
+
+
+    def select(self, columns=None, from_timestamp=None, to_timestamp=None):
+        """
+            Get columns for a time range. With sorted timestamps the result are views on the memory-mapped files
+            :param columns: Names of columns (None: all)
+            :param from_timestamp: Timestamp at the beginning of selection (seconds)
+            :param to_timestamp: Timestamp at the end of the selection (seconds)
+            :return: dict with column name -> array
+        """
+        frames = self.getFrames(from_timestamp=from_timestamp, to_timestamp=to_timestamp)
+        return dict((column_name, self[column_name][frames]) for column_name in (columns or self.COLUMNS))
+
+
+    def toFrameMatrix(self, frames=slice(None)):
+        """
+            Rebuild frames in the row layout of MsgPackWrapper (this copies the data)
+            :param frames: slice/index array of frames (see getFrames)
+            :return: 2-D array with one frame per row
+        """
+        max_players = self.manifest["maxPlayers"]
+        positions = self["positions"][frames]
+        data = np.zeros((len(positions), max_players * 3 + 4), dtype=np.dtype(self.manifest["dtype"]))
+        data[:, 0:max_players * 3:3] = positions[:, :, 0]
+        data[:, 1:max_players * 3:3] = positions[:, :, 1]
+        data[:, 2:max_players * 3:3] = self["weights"][frames]
+        data[:, max_players * 3:max_players * 3 + 3] = self["ball"][frames]
+        data[:, -1] = self["timestamps"][frames]
+        return data
+
+
+    @property
+    def header(self):
+        return self.manifest["header"]
+
+
+    @property
+    def footer(self):
+        return self.manifest["footer"]
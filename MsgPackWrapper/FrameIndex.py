@@ -0,0 +1,206 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import msgpack
+import numpy as np
+from lz4tools import Lz4File
+
+__author__ = 'jleuven'
+
+
+class FrameIndex(object):
+    """
+        Sidecar index for a PlayerData recording. Every 'interval' frames a checkpoint is stored with the (decompressed)
+        stream offset and the player-mapping state, so decoding can be resumed from the nearest checkpoint. The lz4
+        block offsets are stored as well, so the input does not have to be decompressed completely to make it seekable.
+    """
+    VERSION = 2
+
+    def __init__(self, skip_frames=1, interval=1000):
+        """
+            Constructor
+            :param skip_frames: skip_frames option the index is built for (frame ordinals depend on it)
+            :param interval: Number of frames between checkpoints
+        """
+        self.skip_frames = skip_frames
+        self.interval = interval
+        self.input_size = self.input_mtime = None
+        self.blocks = []
+        self.end = 0
+        self.checkpoints = []
+        self.__time_stamps = []
+
+
+    @staticmethod
+    def getFileName(input_file_name):
+        """
+            Get file name of the sidecar index for an input file
+            :param input_file_name: Name of the (lz4) input file
+            :return: file name
+        """
+        return "{}.idx".format(input_file_name)
+
+
+    @classmethod
+    def load(cls, file_name):
+        """
+            Load index from file
+            :param file_name: Name of the index file
+            :return: FrameIndex
+        """
+        with open(file_name, "rb") as index_file:
+            index_dict = msgpack.unpackb(index_file.read(), use_list=True)
+        if index_dict.get("version") != cls.VERSION:
+            raise ValueError("Unsupported frame index version: {}".format(index_dict.get("version")))
+        frame_index = cls(skip_frames=index_dict["skipFrames"], interval=index_dict["interval"])
+        frame_index.input_size = index_dict["inputSize"]
+        frame_index.input_mtime = index_dict["inputMTime"]
+        frame_index.blocks = index_dict["blocks"]
+        frame_index.end = index_dict["end"]
+        frame_index.checkpoints = index_dict["checkpoints"]
+        frame_index.__time_stamps = np.frombuffer(index_dict["timeStamps"], dtype=np.float64)
+        return frame_index
+
+
+    def save(self, file_name):
+        """
+            Store index to file
+            :param file_name: Name of the index file
+            :return: None
+        """
+        index_dict = {"version": self.VERSION,
+                      "skipFrames": self.skip_frames,
+                      "interval": self.interval,
+                      "inputSize": self.input_size,
+                      "inputMTime": self.input_mtime,
+                      "blocks": self.blocks,
+                      "end": self.end,
+                      "checkpoints": self.checkpoints,
+                      "timeStamps": self.time_stamps.tobytes()}
+        with open(file_name, "wb") as index_file:
+            index_file.write(msgpack.packb(index_dict, use_bin_type=True))
+
+
+    def isValidFor(self, input_file_name, skip_frames):
+        """
+            Check if the index (still) belongs to an input file
+            :param input_file_name: Name of the input file
+            :param skip_frames: Current skip_frames option
+            :return: Boolean
+        """
+        stat = os.stat(input_file_name)
+        return self.skip_frames == skip_frames and self.input_size == stat.st_size and \
+            self.input_mtime == stat.st_mtime
+
+
+    def setInputFile(self, input_file_name, lz4_file):
+        """
+            Store input file properties and lz4 block offsets
+            :param input_file_name: Name of the input file (None: input data in memory, the index is not saved)
+            :param lz4_file: Lz4File with loaded block-dict
+            :return: None
+        """
+        if input_file_name is not None:
+            stat = os.stat(input_file_name)
+            self.input_size = stat.st_size
+            self.input_mtime = stat.st_mtime
+        self.blocks = [[block["comp_begin"], block["decomp_e"], block["blkSize"]]
+                       for _, block in sorted(lz4_file.blkDict.items())]
+        self.end = lz4_file.end
+
+
+    def needsCheckpoint(self):
+        """
+            :return: True if the next frame should start with a checkpoint
+        """
+        return len(self.__time_stamps) % self.interval == 0
+
+
+    def addCheckpoint(self, offset, raw_frame, player_state, first_frame_timestamp):
+        """
+            Add checkpoint before the next frame
+            :param offset: Offset in the decompressed msg-pack stream
+            :param raw_frame: Number of msg-pack-frames read (excluding header)
+            :param player_state: Player-mapping state (see MsgPackWrapper)
+            :param first_frame_timestamp: Timestamp of the first frame (to normalise timestamps)
+            :return: None
+        """
+        self.checkpoints.append({"frame": len(self.__time_stamps),
+                                 "rawFrame": raw_frame,
+                                 "offset": offset,
+                                 "playerState": player_state,
+                                 "firstFrameTimeStamp": first_frame_timestamp})
+
+
+    def addTimeStamp(self, time_stamp):
+        """
+            Register the next frame (only while building the index)
+            :param time_stamp: (normalised) timestamp of the frame
+            :return: None
+        """
+        if not isinstance(self.__time_stamps, list):
+            self.__time_stamps = self.__time_stamps.tolist()
+        self.__time_stamps.append(time_stamp)
+
+
+    def getCheckpoint(self, frame):
+        """
+            Get last checkpoint at or before a frame
+            :param frame: frame ordinal
+            :return: checkpoint dict
+        """
+        return self.checkpoints[min(frame // self.interval, len(self.checkpoints) - 1)]
+
+
+    def getFrame(self, time_stamp):
+        """
+            Get the first frame at or after a timestamp
+            :param time_stamp: (normalised) timestamp
+            :return: frame ordinal
+        """
+        return int(np.searchsorted(self.time_stamps, time_stamp, side="left"))
+
+
+    def openLz4File(self, input_file):
+        """
+            Open an Lz4File using the stored block offsets (skips decompressing the whole input)
+            :param input_file: opened input file
+            :return: Lz4File
+        """
+        lz4_file = Lz4File("input", input_file, seekable=False)
+        lz4_file.blkDict = dict((block_idx, {"comp_begin": comp_begin, "decomp_e": decomp_e, "blkSize": blk_size})
+                                for block_idx, (comp_begin, decomp_e, blk_size) in enumerate(self.blocks))
+        lz4_file.end = self.end
+        self.seekLz4File(lz4_file, 0)
+        return lz4_file
+
+
+    def seekLz4File(self, lz4_file, offset):
+        """
+            Seek to an offset in the decompressed stream. With independent lz4-blocks the block is decompressed
+            directly. Linked lz4-blocks depend on the blocks before them and lz4f keeps no copy of that history, so the
+            preceding blocks are decompressed again (lz4 only, no msg-pack decoding, which is the expensive part)
+            :param lz4_file: Lz4File (opened with openLz4File)
+            :param offset: Offset in the decompressed stream
+            :return: None
+        """
+        block_idx = 0
+        while block_idx < len(self.blocks) - 1 and offset >= self.blocks[block_idx][1]:
+            block_idx += 1
+        previous_block = None
+        if not lz4_file.fileInfo.get("blkMode"):
+            for previous_block_idx in range(block_idx):
+                previous_block = lz4_file.read_block(blk=lz4_file.blkDict[previous_block_idx], setCur=False)
+        lz4_file.curBlk = None
+        lz4_file.seek(offset)
+        del previous_block
+
+
+    def __len__(self):
+        return len(self.__time_stamps)
+
+
+    @property
+    def time_stamps(self):
+        if isinstance(self.__time_stamps, list):
+            self.__time_stamps = np.asarray(self.__time_stamps, dtype=np.float64)
+        return self.__time_stamps
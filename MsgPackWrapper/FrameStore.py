@@ -0,0 +1,173 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import tempfile
+import numpy as np
+
+__author__ = 'jleuven'
+
+
+class FrameStore(object):
+    """
+        Growable 2-D frame matrix. Rows are written straight into a preallocated buffer that grows geometrically, so
+        appending is amortised O(1) and the stored frames are always available as one contiguous array (no stacking).
+        With a memory budget a buffer that would exceed the budget is a memory-mapped temporary file instead, so the
+        operating system can write older rows to disk and drop them from memory.
+    """
+
+    def __init__(self, width, dtype=np.float64, initial_rows=1024, growth_factor=2, memory_budget=None,
+                 spill_dir=None):
+        """
+            Constructor
+            :param width: Number of values per frame
+            :param dtype: numpy dtype of the matrix
+            :param initial_rows: Number of rows to preallocate
+            :param growth_factor: Factor to grow the buffer with when it is full
+            :param memory_budget: Maximum size of an in-memory buffer in bytes (None: no limit)
+            :param spill_dir: Directory for the memory-mapped buffer file (None: default temporary directory)
+        """
+        self.__width = width
+        self.__growth_factor = max(growth_factor, 1.5)
+        self.__memory_budget = memory_budget
+        self.__spill_dir = spill_dir
+        self.__spill_file = None
+        self.__buffer = self.__allocate(max(int(initial_rows), 1), np.dtype(dtype))
+        self.__buffer[:] = 0
+        self.__length = 0
+
+
+    @classmethod
+    def fromArray(cls, array, dtype=None):
+        """
+            Create a frame store holding (a copy of) an existing 2-D array
+            :param array: 2-D array with one frame per row
+            :param dtype: Optional dtype (defaults to the dtype of array)
+            :return: FrameStore
+        """
+        array = np.atleast_2d(np.asarray(array))
+        frame_store = cls(array.shape[1], dtype=array.dtype if dtype is None else dtype, initial_rows=len(array))
+        frame_store.extend(array)
+        return frame_store
+
+
+    def __len__(self):
+        return self.__length
+
+
+    def __getitem__(self, item):
+        return self.view[item]
+
+
+    def __iter__(self):
+        return iter(self.view)
+
+
+    def __array__(self, dtype=None):
+        if dtype is None:
+            return self.view
+        return self.view.astype(dtype)
+
+
+    def newRow(self):
+        """
+            Reserve the next row. The returned row is a zeroed view into the buffer, values can be written directly
+            :return: row (view)
+        """
+        if self.__length == len(self.__buffer):
+            self.__grow(self.__length + 1)
+        row = self.__buffer[self.__length]
+        row[:] = 0
+        self.__length += 1
+        return row
+
+
+    def append(self, frame):
+        """
+            Append a single frame
+            :param frame: list/array with 'width' values
+            :return: None
+        """
+        self.newRow()[:] = frame
+
+
+    def extend(self, frames):
+        """
+            Append multiple frames at once
+            :param frames: 2-D list/array with one frame per row
+            :return: None
+        """
+        frames = np.asarray(frames)
+        if len(frames) == 0:
+            return
+        if self.__length + len(frames) > len(self.__buffer):
+            self.__grow(self.__length + len(frames))
+        self.__buffer[self.__length:self.__length + len(frames)] = frames
+        self.__length += len(frames)
+
+
+    def clear(self):
+        """
+            Remove all frames (the buffer is kept for reuse)
+            :return: None
+        """
+        self.__length = 0
+
+
+    def __grow(self, min_rows):
+        """
+            Grow the buffer geometrically until it can hold min_rows
+            :param min_rows: Minimal number of rows needed
+            :return: None
+        """
+        new_rows = len(self.__buffer)
+        while new_rows < min_rows:
+            new_rows = int(new_rows * self.__growth_factor) + 1
+        spill_file = self.__spill_file
+        new_buffer = self.__allocate(new_rows, self.__buffer.dtype)
+        new_buffer[:self.__length] = self.__buffer[:self.__length]
+        self.__buffer = new_buffer
+        if spill_file is not None and spill_file is not self.__spill_file:
+            # Views on the old buffer stay valid, the mapping does not need the file object
+            spill_file.close()
+
+
+    def __allocate(self, num_rows, dtype):
+        """
+            Allocate a buffer (in memory, or memory-mapped when it exceeds the memory budget)
+            :param num_rows: Number of rows
+            :param dtype: numpy dtype
+            :return: 2-D array
+        """
+        num_bytes = num_rows * self.__width * dtype.itemsize
+        if self.__memory_budget is None or num_bytes <= self.__memory_budget:
+            return np.empty((num_rows, self.__width), dtype=dtype)
+        if self.__spill_dir is not None and not os.path.isdir(self.__spill_dir):
+            os.makedirs(self.__spill_dir)
+        self.__spill_file = tempfile.TemporaryFile(prefix="FrameStore-", dir=self.__spill_dir)
+        return np.memmap(self.__spill_file, dtype=dtype, mode="w+", shape=(num_rows, self.__width))
+
+
+    @property
+    def view(self):
+        """
+            Contiguous view on the stored frames (no copy)
+            :return: 2-D numpy array
+        """
+        return self.__buffer[:self.__length]
+
+
+    @property
+    def is_spilled(self):
+        """
+            :return: True when the buffer is memory-mapped
+        """
+        return self.__spill_file is not None
+
+
+    @property
+    def dtype(self):
+        return self.__buffer.dtype
+
+
+    @property
+    def width(self):
+        return self.__width
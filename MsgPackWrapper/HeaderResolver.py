@@ -0,0 +1,144 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import json
+import datetime
+
+__author__ = 'jleuven'
+
+
+class HeaderResolver(object):
+    """
+        Resolves header values that are missing in legacy recordings (currently the PTZ-position). Resolved values are
+        cached on disk per hostname and date, so the (slow) network lookup is done only once. In offline mode only the
+        cache and the default values are used.
+        Subclass and override requestPTZPosition to use another source.
+    """
+    DEFAULT_PTZ_POSITION = [0.0, -37.5, 10.0]
+
+    def __init__(self, cache_file_name=None, offline=None, timeout=2, default_ptz_position=None):
+        """
+            Constructor
+            :param cache_file_name: Name of cache file (None: ~/.cache/MsgPackWrapper/header_cache.json, "": no cache)
+            :param offline: Never use the network (None: environment variable MSGPACKWRAPPER_OFFLINE)
+            :param timeout: Timeout of the network requests (seconds)
+            :param default_ptz_position: PTZ-position to use when it can not be resolved
+        """
+        if cache_file_name is None:
+            cache_file_name = os.path.join(os.path.expanduser("~"), ".cache", "MsgPackWrapper", "header_cache.json")
+        if offline is None:
+            offline = os.environ.get("MSGPACKWRAPPER_OFFLINE", "") not in ("", "0")
+        self.cache_file_name = cache_file_name
+        self.offline = offline
+        self.timeout = timeout
+        self.default_ptz_position = list(default_ptz_position or self.DEFAULT_PTZ_POSITION)
+        self.__cache = None
+        self.__failed = set()
+
+
+    @staticmethod
+    def getCacheKey(hostname, start_date_time):
+        """
+            Cache key for a recording
+            :param hostname: hostname from header
+            :param start_date_time: startDateTime from header (integer format)
+            :return: key
+        """
+        return "{}/{}".format(hostname, datetime.datetime.utcfromtimestamp(start_date_time or 0).strftime("%Y-%m-%d"))
+
+
+    def getPTZPosition(self, hostname, start_date_time, warning=None):
+        """
+            Get PTZ-position for a recording: from cache, from the network (not in offline mode) or the default
+            :param hostname: hostname from header
+            :param start_date_time: startDateTime from header (integer format)
+            :param warning: Optional function to report failed lookups with
+            :return: ptz-position
+        """
+        key = self.getCacheKey(hostname, start_date_time)
+        cache = self.__getCache()
+        if key in cache:
+            return list(cache[key])
+        if self.offline or key in self.__failed:
+            return list(self.default_ptz_position)
+
+        try:
+            ptz_position = list(self.requestPTZPosition(hostname))
+        except Exception as e:
+            # Do not try again for this process, but do not store the default either (it may work later)
+            self.__failed.add(key)
+            if warning is not None:
+                warning(e)
+            return list(self.default_ptz_position)
+        cache[key] = ptz_position
+        self.__saveCache()
+        return ptz_position
+
+
+    def requestPTZPosition(self, hostname):
+        """
+            Ask the PTZ-position of a host over the network
+            :param hostname: hostname from header
+            :return: ptz-position
+        """
+        import requests
+        get_response = requests.get("http://{}.vpn:9999/world/moduleCam1".format(hostname), timeout=self.timeout).json()["response"]
+
+        post_response = requests.post("http://localhost:9999/command/world/moduleCam1", json={"calibrate": get_response["calibrate"]}, timeout=self.timeout).json()["response"]
+        return post_response["calibrate"]["position"]
+
+
+    def setPTZPosition(self, hostname, start_date_time, ptz_position):
+        """
+            Store a known PTZ-position in the cache (e.g. to prepare a cache for offline machines)
+            :param hostname: hostname
+            :param start_date_time: startDateTime (integer format)
+            :param ptz_position: ptz-position
+            :return: None
+        """
+        self.__getCache()[self.getCacheKey(hostname, start_date_time)] = list(ptz_position)
+        self.__saveCache()
+
+
+    def __getCache(self):
+        """
+            Load cache from disk (once)
+            :return: cache dict
+        """
+        if self.__cache is None:
+            self.__cache = {}
+            if self.cache_file_name and os.path.isfile(self.cache_file_name):
+                try:
+                    with open(self.cache_file_name, "r") as cache_file:
+                        self.__cache = json.load(cache_file)
+                except ValueError:
+                    pass
+        return self.__cache
+
+
+    def __saveCache(self):
+        """
+            Store cache on disk. Entries stored by other processes are merged in and the file is written to a temporary
+            file first, so concurrent processes never read half a file
+            :return: None
+        """
+        if not self.cache_file_name:
+            return
+        if os.path.isfile(self.cache_file_name):
+            try:
+                with open(self.cache_file_name, "r") as cache_file:
+                    stored_cache = json.load(cache_file)
+                stored_cache.update(self.__cache)
+                self.__cache = stored_cache
+            except ValueError:
+                pass
+        cache_dir = os.path.dirname(self.cache_file_name)
+        if cache_dir and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        temp_cache_file_name = "{}.{}".format(self.cache_file_name, os.getpid())
+        with open(temp_cache_file_name, "w") as cache_file:
+            json.dump(self.__cache, cache_file, indent=2, sort_keys=True)
+        os.rename(temp_cache_file_name, self.cache_file_name)
+
+
+# Resolver used when no resolver is given, shared so failed lookups are not repeated for every file
+default_header_resolver = HeaderResolver()
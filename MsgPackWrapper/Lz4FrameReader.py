@@ -0,0 +1,353 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import time
+import struct
+import bisect
+import threading
+from collections import deque
+import lz4f
+try:
+    import lz4.block as lz4_block
+except ImportError:
+    lz4_block = None
+
+__author__ = 'jleuven'
+
+FRAME_MAGIC = 0x184D2204
+# Skippable frames: 0x184D2A50 - 0x184D2A5F
+SKIPPABLE_MAGIC = 0x184D2A50
+
+# Frame descriptor flags (FLG byte)
+FLAG_DICT_ID = 0x01
+FLAG_CONTENT_CHECKSUM = 0x04
+FLAG_CONTENT_SIZE = 0x08
+FLAG_BLOCK_CHECKSUM = 0x10
+FLAG_BLOCK_INDEPENDENCE = 0x20
+
+
+def decompressUnit(header, blocks, independent, block_size_id, dctx=None):
+    """
+        Decompress lz4-blocks of one lz4-frame. Runs in the decompression threads: the python-lz4 package releases the
+        GIL (independent blocks only), lz4f (linked blocks and fallback) does not
+        :param header: frame header (magic, descriptor)
+        :param blocks: list of lz4-blocks (size field + block data [+ block checksum]), in order
+        :param independent: Blocks do not depend on each other
+        :param block_size_id: Block size id from the frame descriptor (4 - 7)
+        :param dctx: lz4f decompression context that already decompressed the blocks before these (linked blocks that
+                     are split over several units), it is not freed (None: new context)
+        :return: decompressed data
+    """
+    if independent and lz4_block is not None and dctx is None:
+        max_block_size = 1 << (8 + 2 * block_size_id)
+        decompressed_blocks = []
+        for block in blocks:
+            size, = struct.unpack("<I", block[:4])
+            if size & 0x80000000:
+                # Stored uncompressed
+                decompressed_blocks.append(block[4:4 + (size & 0x7FFFFFFF)])
+            else:
+                decompressed_blocks.append(lz4_block.decompress(block[4:4 + size], uncompressed_size=max_block_size))
+        return b"".join(decompressed_blocks)
+
+    # lz4f decompresses at most one block per call (and does not tell how much input it used), so blocks are passed
+    # one at a time, like Lz4File does. The context keeps the history that linked blocks refer to
+    own_dctx = dctx is None
+    if own_dctx:
+        dctx = lz4f.createDecompContext()
+        lz4f.getFrameInfo(header, dctx)
+    try:
+        decompressed_blocks = []
+        for block in blocks:
+            result = lz4f.decompressFrame(block, dctx, block_size_id)
+            if result is None:
+                raise IOError("Corrupt lz4-block")
+            decompressed_blocks.append(result["decomp"])
+        return b"".join(decompressed_blocks)
+    finally:
+        if own_dctx:
+            lz4f.freeDecompContext(dctx)
+
+
+class Lz4FrameReader(object):
+    """
+        File-like reader for lz4 files with one or more lz4-frames back to back (e.g. writeMsgPackFrameSelectionMulti
+        output or concatenated exports). The frame and block boundaries are found first (only the block size fields are
+        read) and the blocks are grouped in units of about 'unit_size' compressed bytes. Units of independent blocks are
+        decompressed in a thread pool and the data is returned in order; at most 'max_pending' units are decompressed
+        ahead. Units of linked blocks need the history of the units before them: they are decompressed one at a time,
+        in order, in the calling thread (continuing the lz4f context of the previous unit), so only one unit is kept in
+        memory.
+        Unlike Lz4File, the reader does not decompress the whole file on open, reads past the first lz4-frame, and
+        stops at a truncated block instead of failing.
+
+        With follow, the file is still being written: at the end of the data the reader waits for new lz4-blocks
+        (checking every 'poll_interval' seconds) instead of raising EOFError. The caller decides when the data ends
+        (stopFollowing, e.g. at the footer of a recording); 'timeout' ends it when the file stops growing.
+    """
+
+    def __init__(self, input_file, pool=None, max_pending=8, unit_size=4 << 20, follow=False, poll_interval=0.5,
+                 timeout=None):
+        """
+            Constructor
+            :param input_file: opened (binary) input file
+            :param pool: multiprocessing.pool.ThreadPool to decompress in (None: decompress in the calling thread)
+            :param max_pending: Maximum number of units decompressed ahead
+            :param unit_size: Compressed bytes of blocks that are decompressed together
+            :param follow: Wait for new data at the end of the file
+            :param poll_interval: Seconds between checks for new data (follow)
+            :param timeout: Seconds without new data before the data ends (follow, None: wait until stopFollowing)
+        """
+        self.input_file = input_file
+        self.pool = pool
+        self.max_pending = max_pending
+        self.unit_size = unit_size
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.num_frames = 0
+        self.units = []  # (header offset, header size, [(block offset, block size), ...], independent, size id)
+        self.__scan_offset = 0  # Offset where scanning continues
+        self.__scan_frame = None  # (header offset, header size, flags, size id) of the lz4-frame being scanned
+        self.__linked = None  # (header offset, unit, lz4f context) of the last unit of linked blocks
+        self.__stop_following = threading.Event()
+        self.__scanFrames()
+        self.__pending = deque()
+        self.__next_unit = 0  # Next unit to submit
+        self.__unit_offsets = []  # Decompressed offset of every unit that was read so far
+        self.__data = b""  # Decompressed data of the current unit
+        self.__data_offset = 0  # Decompressed offset of __data
+        self.__data_unit = -1
+        self.__pos = 0  # Position in __data
+
+
+    def read(self, size=None):
+        """
+            File read-like function (raises EOFError at the end of the data, like Lz4File)
+            :param size: Number of bytes (None: the rest of the current unit)
+            :return: decompressed data (less than size at the end of a unit)
+        """
+        while self.__pos >= len(self.__data):
+            if self.follow and self.__data_unit + 1 >= len(self.units):
+                self.__waitForUnits()
+            self.__loadUnit(self.__data_unit + 1)
+        if size is None or self.__pos + size > len(self.__data):
+            size = len(self.__data) - self.__pos
+        data = self.__data[self.__pos:self.__pos + size]
+        self.__pos += size
+        return data
+
+
+    def tell(self):
+        """
+            :return: Position in the decompressed data
+        """
+        return self.__data_offset + self.__pos
+
+
+    def seek(self, offset):
+        """
+            Seek in the decompressed data. Forward the units in between are decompressed; backward the reader restarts
+            at the unit that holds the offset
+            :param offset: Position in the decompressed data
+            :return: None
+        """
+        if offset < self.__data_offset:
+            self.__loadUnit(bisect.bisect_right(self.__unit_offsets, offset) - 1)
+        while offset > self.__data_offset + len(self.__data):
+            self.__loadUnit(self.__data_unit + 1)
+        self.__pos = offset - self.__data_offset
+
+
+    def refresh(self):
+        """
+            Look for lz4-blocks that were written after the last scan
+            :return: Number of new units
+        """
+        num_units = len(self.units)
+        self.__scanFrames()
+        return len(self.units) - num_units
+
+
+    def stopFollowing(self):
+        """
+            End the data at the blocks found so far (follow). Can be called from another thread: a waiting read wakes up
+            :return: None
+        """
+        self.__stop_following.set()
+
+
+    def close(self):
+        self.stopFollowing()
+        self.__pending.clear()
+        self.__freeLinked()
+        self.input_file.close()
+
+
+    def __freeLinked(self):
+        if self.__linked is not None:
+            lz4f.freeDecompContext(self.__linked[2])
+            self.__linked = None
+
+
+    def __getLinkedContext(self, unit):
+        """
+            lz4f context for a unit of linked blocks: the context of the previous unit, or (after a seek) a new context
+            that has decompressed the units of the lz4-frame before this one
+            :param unit: unit number
+            :return: lz4f decompression context
+        """
+        header_offset, header_size = self.units[unit][:2]
+        if self.__linked is not None and self.__linked[0] == header_offset and self.__linked[1] == unit - 1:
+            dctx = self.__linked[2]
+        else:
+            self.__freeLinked()
+            first_unit = unit
+            while first_unit > 0 and self.units[first_unit - 1][0] == header_offset:
+                first_unit -= 1
+            dctx = lz4f.createDecompContext()
+            lz4f.getFrameInfo(self.__readBytes(header_offset, header_size), dctx)
+            for previous_unit in range(first_unit, unit):
+                _, _, unit_blocks, _, block_size_id = self.units[previous_unit]
+                decompressUnit(None, [self.__readBytes(block_offset, block_size)
+                                      for block_offset, block_size in unit_blocks], False, block_size_id, dctx=dctx)
+        self.__linked = (header_offset, unit, dctx)
+        return dctx
+
+
+    def __loadUnit(self, unit):
+        """
+            Make a unit the current one (waits for its decompression and submits units ahead of it)
+            :param unit: unit number
+            :return: None
+        """
+        if unit >= len(self.units):
+            raise EOFError("Reached EOF")
+        if unit != self.__next_unit - len(self.__pending):
+            # Not the next unit in line (seek): results that are in progress are not needed
+            self.__pending.clear()
+            self.__next_unit = unit
+        # Only independent units are decompressed ahead (in the pool), linked units are decompressed when they are needed
+        while self.__next_unit < len(self.units) and \
+                (not self.__pending or len(self.__pending) < self.max_pending and self.pool is not None and
+                 self.units[self.__next_unit][3]):
+            self.__pending.append(self.__submitUnit(self.__next_unit))
+            self.__next_unit += 1
+
+        data = self.__pending.popleft()
+        if not isinstance(data, bytes):
+            data = data.get()
+        if unit == len(self.__unit_offsets):
+            self.__unit_offsets.append(self.__data_offset + len(self.__data))
+        self.__data = data
+        self.__data_offset = self.__unit_offsets[unit]
+        self.__data_unit = unit
+        self.__pos = 0
+
+
+    def __readBytes(self, offset, size):
+        """
+            Read raw bytes from the input file
+        """
+        self.input_file.seek(offset)
+        return self.input_file.read(size)
+
+
+    def __scanFrames(self):
+        """
+            Find lz4-frames and lz4-blocks, from where the last scan stopped (reads the frame headers and block size
+            fields only). Scanning stops at the end of the file or at a truncated block or header
+            :return: None
+        """
+        while True:
+            if self.__scan_frame is None:
+                offset = self.__scan_offset
+                magic_data = self.__readBytes(offset, 4)
+                if len(magic_data) < 4:
+                    return
+                magic, = struct.unpack("<I", magic_data)
+                if magic & 0xFFFFFFF0 == SKIPPABLE_MAGIC:
+                    skip_size_data = self.__readBytes(offset + 4, 4)
+                    if len(skip_size_data) < 4:
+                        return
+                    self.__scan_offset = offset + 8 + struct.unpack("<I", skip_size_data)[0]
+                    continue
+                if magic != FRAME_MAGIC:
+                    raise IOError("No lz4-frame at offset {}".format(offset))
+
+                descriptor = bytearray(self.__readBytes(offset + 4, 2))
+                if len(descriptor) < 2:
+                    return
+                flags, block_descriptor = descriptor
+                header_size = 7 + (8 if flags & FLAG_CONTENT_SIZE else 0) + (4 if flags & FLAG_DICT_ID else 0)
+                if len(self.__readBytes(offset + header_size - 1, 1)) < 1:
+                    return
+                self.__scan_frame = (offset, header_size, flags, (block_descriptor >> 4) & 0x07)
+                self.__scan_offset = offset + header_size
+                self.num_frames += 1
+
+            offset, header_size, flags, block_size_id = self.__scan_frame
+            block_checksum_size = 4 if flags & FLAG_BLOCK_CHECKSUM else 0
+            independent = bool(flags & FLAG_BLOCK_INDEPENDENCE)
+            blocks = []
+            unit_blocks = []
+            unit_size = 0
+            block_offset = self.__scan_offset
+            truncated = True
+            while True:
+                size_data = self.__readBytes(block_offset, 4)
+                if len(size_data) < 4:
+                    break
+                size, = struct.unpack("<I", size_data)
+                if size == 0:
+                    truncated = False
+                    break
+                block_size = 4 + (size & 0x7FFFFFFF) + block_checksum_size
+                if len(self.__readBytes(block_offset + block_size - 1, 1)) < 1:
+                    break
+                unit_blocks.append((block_offset, block_size))
+                unit_size += block_size
+                block_offset += block_size
+                if unit_size >= self.unit_size:
+                    blocks.append(unit_blocks)
+                    unit_blocks = []
+                    unit_size = 0
+            if unit_blocks:
+                blocks.append(unit_blocks)
+            self.units.extend((offset, header_size, unit_blocks, independent, block_size_id) for unit_blocks in blocks)
+            if truncated:
+                # Continue at this block when the file has grown (follow)
+                self.__scan_offset = block_offset
+                return
+            self.__scan_frame = None
+            self.__scan_offset = block_offset + 4 + (4 if flags & FLAG_CONTENT_CHECKSUM else 0)
+
+
+    def __submitUnit(self, unit):
+        """
+            Read the raw blocks of a unit and decompress them (in the pool, if any)
+            :param unit: unit number
+            :return: AsyncResult (pool) or decompressed data
+        """
+        header_offset, header_size, unit_blocks, independent, block_size_id = self.units[unit]
+        args = (self.__readBytes(header_offset, header_size),
+                [self.__readBytes(block_offset, block_size) for block_offset, block_size in unit_blocks],
+                independent, block_size_id)
+        if not independent:
+            # Each unit of linked blocks continues with the context of the previous one (decompressed in this thread,
+            # in order)
+            return decompressUnit(*args, dctx=self.__getLinkedContext(unit))
+        if self.pool is None:
+            return decompressUnit(*args)
+        return self.pool.apply_async(decompressUnit, args)
+
+
+    def __waitForUnits(self):
+        """
+            Wait until new units are written (follow). Returns without new units when following is stopped, or after
+            'timeout' seconds without new data
+            :return: None
+        """
+        begin = time.time()
+        while not self.refresh():
+            if self.__stop_following.is_set() or self.timeout is not None and time.time() - begin >= self.timeout:
+                return
+            self.__stop_following.wait(self.poll_interval)
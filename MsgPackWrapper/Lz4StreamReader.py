@@ -0,0 +1,134 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import struct
+import lz4f
+from .Lz4FrameReader import decompressUnit, FRAME_MAGIC, SKIPPABLE_MAGIC, FLAG_DICT_ID, FLAG_CONTENT_CHECKSUM, \
+    FLAG_CONTENT_SIZE, FLAG_BLOCK_CHECKSUM, FLAG_BLOCK_INDEPENDENCE
+
+__author__ = 'jleuven'
+
+
+class Lz4StreamReader(object):
+    """
+        File-like reader for lz4 data from a stream that can not seek (socket, pipe, http response, ...). lz4-frames and
+        lz4-blocks are read and decompressed one at a time, in order, so only the current block is kept in memory.
+        Like Lz4FrameReader it reads all lz4-frames and stops at a truncated block.
+    """
+
+    def __init__(self, input_stream):
+        """
+            Constructor
+            :param input_stream: readable binary stream (only read() is used)
+        """
+        self.input_stream = input_stream
+        self.num_frames = 0
+        self.__stream_offset = 0  # Number of bytes read from the stream
+        self.__frame = None  # (header, flags, size id, lz4f context) of the current lz4-frame
+        self.__data = b""  # Decompressed data of the current block
+        self.__data_offset = 0  # Decompressed offset of __data
+        self.__pos = 0  # Position in __data
+
+
+    def read(self, size=None):
+        """
+            File read-like function (raises EOFError at the end of the data, like Lz4File)
+            :param size: Number of bytes (None: the rest of the current block)
+            :return: decompressed data (less than size at the end of a block)
+        """
+        while self.__pos >= len(self.__data):
+            self.__data_offset += len(self.__data)
+            self.__data = self.__readBlock()
+            self.__pos = 0
+        if size is None or self.__pos + size > len(self.__data):
+            size = len(self.__data) - self.__pos
+        data = self.__data[self.__pos:self.__pos + size]
+        self.__pos += size
+        return data
+
+
+    def tell(self):
+        """
+            :return: Position in the decompressed data
+        """
+        return self.__data_offset + self.__pos
+
+
+    def close(self):
+        self.__freeFrame()
+        self.input_stream.close()
+
+
+    def __freeFrame(self):
+        if self.__frame is not None:
+            lz4f.freeDecompContext(self.__frame[3])
+            self.__frame = None
+
+
+    def __readExactly(self, size):
+        """
+            Read from the stream until 'size' bytes are read (streams may return less) or the stream ends
+            :param size: Number of bytes
+            :return: data (less than size at the end of the stream)
+        """
+        chunks = []
+        while size > 0:
+            chunk = self.input_stream.read(size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size -= len(chunk)
+            self.__stream_offset += len(chunk)
+        return b"".join(chunks)
+
+
+    def __readBlock(self):
+        """
+            Read and decompress the next lz4-block (frame headers, end marks and skippable frames are read on the way)
+            :return: decompressed data (raises EOFError at the end of the stream or at a truncated block)
+        """
+        while True:
+            if self.__frame is None:
+                magic_data = self.__readExactly(4)
+                if len(magic_data) < 4:
+                    raise EOFError("Reached EOF")
+                magic, = struct.unpack("<I", magic_data)
+                if magic & 0xFFFFFFF0 == SKIPPABLE_MAGIC:
+                    skip_size_data = self.__readExactly(4)
+                    if len(skip_size_data) < 4:
+                        raise EOFError("Reached EOF")
+                    skip_size, = struct.unpack("<I", skip_size_data)
+                    if len(self.__readExactly(skip_size)) < skip_size:
+                        raise EOFError("Reached EOF")
+                    continue
+                if magic != FRAME_MAGIC:
+                    raise IOError("No lz4-frame at offset {} of the stream".format(self.__stream_offset - 4))
+
+                descriptor = self.__readExactly(2)
+                if len(descriptor) < 2:
+                    raise EOFError("Truncated lz4-frame header")
+                flags, block_descriptor = bytearray(descriptor)
+                header_size = 7 + (8 if flags & FLAG_CONTENT_SIZE else 0) + (4 if flags & FLAG_DICT_ID else 0)
+                header = magic_data + descriptor + self.__readExactly(header_size - 6)
+                if len(header) < header_size:
+                    raise EOFError("Truncated lz4-frame header")
+                dctx = lz4f.createDecompContext()
+                lz4f.getFrameInfo(header, dctx)
+                self.__frame = (header, flags, (block_descriptor >> 4) & 0x07, dctx)
+                self.num_frames += 1
+
+            header, flags, block_size_id, dctx = self.__frame
+            size_data = self.__readExactly(4)
+            if len(size_data) < 4:
+                raise EOFError("Truncated lz4-frame")
+            size, = struct.unpack("<I", size_data)
+            if size == 0:
+                # End mark (followed by the content checksum)
+                if flags & FLAG_CONTENT_CHECKSUM:
+                    self.__readExactly(4)
+                self.__freeFrame()
+                continue
+            block_size = (size & 0x7FFFFFFF) + (4 if flags & FLAG_BLOCK_CHECKSUM else 0)
+            block = size_data + self.__readExactly(block_size)
+            if len(block) < 4 + block_size:
+                raise EOFError("Truncated lz4-block")
+            # The context of the frame keeps the history that linked blocks refer to
+            return decompressUnit(header, [block], bool(flags & FLAG_BLOCK_INDEPENDENCE), block_size_id, dctx=dctx)
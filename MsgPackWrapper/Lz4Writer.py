@@ -0,0 +1,183 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import struct
+from collections import deque
+import lz4f
+try:
+    import lz4.block as lz4_block
+except ImportError:
+    lz4_block = None
+from .StageStats import timer
+from .Lz4FrameReader import FLAG_DICT_ID, FLAG_CONTENT_CHECKSUM, FLAG_CONTENT_SIZE
+
+__author__ = 'jleuven'
+
+# Blocks are only compressed in parallel with python-lz4: lz4f holds the GIL, so compression threads are slower than
+# compressing while writing
+PARALLEL_COMPRESSION = lz4_block is not None
+# Largest lz4-block (blockSizeID 7, the lz4f default). lz4f.compressFrame has no preferences and cuts data into linked
+# blocks of 64 KB, so without python-lz4 blocks are kept at 64 KB
+MAX_BLOCK_SIZE = 4 << 20 if lz4_block is not None else 64 << 10
+# lz4-frame end mark (a block size of 0)
+END_MARK = b"\x00\x00\x00\x00"
+
+
+def compressBlock(data):
+    """
+        Compress data into one independent lz4-block (size field + block data). Runs in the compression threads: the
+        python-lz4 package releases the GIL, lz4f (fallback) does not, so only python-lz4 compresses in parallel
+        :param data: at most MAX_BLOCK_SIZE bytes (64 KB without python-lz4)
+        :return: (lz4-block, seconds)
+    """
+    begin = timer()
+    if lz4_block is not None:
+        compressed_data = lz4_block.compress(data, store_size=False)
+        if len(compressed_data) < len(data):
+            block = struct.pack("<I", len(compressed_data)) + compressed_data
+        else:
+            # Incompressible data is stored as it is (highest bit of the size field set)
+            block = struct.pack("<I", len(data) | 0x80000000) + data
+    else:
+        # A frame with at most 64 KB of data holds exactly one independent block: cut off the header and the end mark
+        # (and content checksum)
+        frame = lz4f.compressFrame(data)
+        flags = bytearray(frame[4:5])[0]
+        header_size = 7 + (8 if flags & FLAG_CONTENT_SIZE else 0) + (4 if flags & FLAG_DICT_ID else 0)
+        block = frame[header_size:-len(END_MARK) - (4 if flags & FLAG_CONTENT_CHECKSUM else 0)]
+    return block, timer() - begin
+
+
+class Lz4Writer(object):
+    """
+        Writes packed msg-pack data to an lz4 compressed file. Data is collected until 'flush_size' bytes are buffered
+        and then pushed through the lz4 compression context, so memory usage is bounded by flush_size (plus one
+        lz4-block). An lz4-frame is started on the first write and ended with endFrame (the next write starts a new one).
+
+        With a thread pool (and independent blocks) every 'flush_size' bytes are compressed into their own lz4-block in
+        the pool, and the blocks are written in order. At most 'max_pending' blocks are in progress, so memory usage is
+        bounded by max_pending * flush_size. The output has the same layout (one lz4-frame with independent blocks per
+        endFrame) and is read by Lz4File as before.
+    """
+
+    def __init__(self, output_file, flush_size=1 << 20, independent_blocks=True, stats=None, pool=None,
+                 max_pending=8):
+        """
+            Constructor
+            :param output_file: opened (binary) output file
+            :param flush_size: Number of packed bytes to collect before they are compressed
+            :param independent_blocks: Compress with independent lz4-blocks (so the output can be seeked with a frame
+                                       index)
+            :param stats: StageStats to add the compression time to (None: no stats)
+            :param pool: multiprocessing.pool.ThreadPool to compress blocks in (None: compress in the calling thread,
+                         only used with independent_blocks)
+            :param max_pending: Maximum number of blocks in the pool at once
+        """
+        self.output_file = output_file
+        self.flush_size = flush_size
+        self.independent_blocks = independent_blocks
+        self.stats = stats
+        self.pool = pool if independent_blocks else None
+        self.max_pending = max_pending
+        self.__lz4_ctx = None
+        self.__buffer = []
+        self.__buffer_size = 0
+        self.__pending = deque()
+
+
+    def write(self, packed_data):
+        """
+            Write packed msg-pack data, starting a new lz4-frame if needed
+            :param packed_data: packed msg-pack data
+            :return: None
+        """
+        if self.__lz4_ctx is None:
+            self.__lz4_ctx = lz4f.createCompContext()
+            self.output_file.write(lz4f.compressBegin(self.__lz4_ctx,
+                                                      lz4f.makePrefs(blockMode=int(self.independent_blocks))))
+        self.__buffer.append(packed_data)
+        self.__buffer_size += len(packed_data)
+        if self.__buffer_size >= self.flush_size:
+            if self.pool is None:
+                self.flush()
+            else:
+                self.__submitBuffer()
+
+
+    def flush(self):
+        """
+            Push buffered packed data through the lz4 compression context (or the thread pool) and write the result
+            :return: None
+        """
+        if self.pool is not None:
+            self.__submitBuffer()
+            self.__writePending(wait=True)
+        elif self.__buffer:
+            data = b"".join(self.__buffer)
+            begin = timer()
+            compressed_data = lz4f.compressUpdate(data, self.__lz4_ctx)
+            if self.stats is not None:
+                self.stats.add("compress", timer() - begin, len(data))
+            self.output_file.write(compressed_data)
+            self.__buffer = []
+            self.__buffer_size = 0
+
+
+    def endFrame(self):
+        """
+            Flush remaining data and close the current lz4-frame (if one was started)
+            :return: None
+        """
+        if self.__lz4_ctx is None:
+            return
+        self.flush()
+        if self.pool is not None:
+            # The blocks did not go through the context, so it has nothing to flush
+            self.output_file.write(END_MARK)
+        else:
+            begin = timer()
+            compressed_data = lz4f.compressEnd(self.__lz4_ctx)
+            if self.stats is not None:
+                self.stats.add("compress", timer() - begin, 0)
+            self.output_file.write(compressed_data)
+        lz4f.freeCompContext(self.__lz4_ctx)
+        self.__lz4_ctx = None
+
+
+    def close(self):
+        """
+            End the current lz4-frame and close the output file
+            :return: None
+        """
+        self.endFrame()
+        self.output_file.flush()
+        self.output_file.close()
+
+
+    def __submitBuffer(self):
+        """
+            Pass the buffered packed data to the thread pool (in blocks of at most MAX_BLOCK_SIZE bytes)
+            :return: None
+        """
+        if not self.__buffer:
+            return
+        data = b"".join(self.__buffer)
+        self.__buffer = []
+        self.__buffer_size = 0
+        for begin in range(0, len(data), MAX_BLOCK_SIZE):
+            block_data = data[begin:begin + MAX_BLOCK_SIZE]
+            self.__pending.append((len(block_data), self.pool.apply_async(compressBlock, (block_data,))))
+            self.__writePending(wait=False)
+
+
+    def __writePending(self, wait):
+        """
+            Write compressed blocks in order: the finished blocks at the front of the queue, and wait for the oldest
+            while too many blocks are in progress
+            :param wait: Wait for all blocks
+            :return: None
+        """
+        while self.__pending and (wait or self.__pending[0][1].ready() or len(self.__pending) > self.max_pending):
+            size, result = self.__pending.popleft()
+            block, seconds = result.get()
+            if self.stats is not None:
+                self.stats.add("compress", seconds, size)
+            self.output_file.write(block)
@@ -0,0 +1,149 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import tempfile
+import msgpack
+
+__author__ = 'jleuven'
+
+
+class MsgPackStore(object):
+    """
+        List of msg-pack-frames with a memory budget. Frames are kept in memory until the frames in memory exceed
+        'memory_budget' (packed) bytes; then the oldest frames are packed into a temporary spill file and released, and
+        read back from it when they are accessed. The size of the frames in memory is estimated from the packed size of
+        a sample of the frames (every SIZE_SAMPLE_INTERVAL-th appended frame and the spilled frames), so frames that stay
+        in memory are not packed.
+    """
+    SIZE_SAMPLE_INTERVAL = 100
+
+    def __init__(self, memory_budget, spill_dir=None, use_list=False):
+        """
+            Constructor
+            :param memory_budget: Maximum number of (packed) bytes of frames kept in memory
+            :param spill_dir: Directory for the spill file (None: default temporary directory)
+            :param use_list: Read arrays back from the spill file as lists (like the appended frames, e.g. processed
+                             frames) instead of tuples (like msg-pack-frames of an Unpacker with use_list=False)
+        """
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.use_list = use_list
+        self.__packer = msgpack.Packer(use_single_float=False, use_bin_type=True)
+        self.__spill_file = None
+        self.__offsets = []  # Offset of every spilled frame in the spill file
+        self.__spill_size = 0
+        self.__frames = []  # Frames (frames before __first_frame are released, they are in the spill file)
+        self.__first_frame = 0
+        self.__sampled_size = 0  # Packed size of the sampled frames
+        self.__num_sampled = 0
+
+
+    def __len__(self):
+        return len(self.__frames)
+
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[frame] for frame in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if item < 0 or item >= len(self):
+            raise IndexError("Frame {} not in msg-pack-store".format(item))
+        if item >= self.__first_frame:
+            return self.__frames[item]
+        return self.__readFrame(item)
+
+
+    def __iter__(self):
+        for item in range(len(self)):
+            yield self[item]
+
+
+    def append(self, frame):
+        """
+            Append a frame (spilling old frames when the memory budget is exceeded)
+            :param frame: msg-pack-frame
+            :return: None
+        """
+        if len(self.__frames) % self.SIZE_SAMPLE_INTERVAL == 0:
+            self.__addSample(len(self.__packer.pack(frame)))
+        self.__frames.append(frame)
+
+        # Spill the oldest frames to disk and release them from memory
+        while self.memory_size > self.memory_budget and self.__first_frame < len(self.__frames) - 1:
+            self.__spillFrame()
+
+
+    def close(self):
+        """
+            Remove the spill file (and all frames)
+            :return: None
+        """
+        if self.__spill_file is not None:
+            self.__spill_file.close()
+            self.__spill_file = None
+        self.__offsets = []
+        self.__spill_size = 0
+        self.__frames = []
+        self.__first_frame = 0
+        self.__sampled_size = 0
+        self.__num_sampled = 0
+
+
+    def __addSample(self, packed_size):
+        """
+            Add the packed size of a frame to the size estimate
+            :param packed_size: Number of bytes
+            :return: None
+        """
+        self.__sampled_size += packed_size
+        self.__num_sampled += 1
+
+
+    def __getPackedSize(self, item):
+        """
+            :param item: frame number (of a spilled frame)
+            :return: Size of the packed frame in the spill file
+        """
+        end = self.__offsets[item + 1] if item + 1 < len(self.__offsets) else self.__spill_size
+        return end - self.__offsets[item]
+
+
+    def __readFrame(self, item):
+        """
+            Read a frame from the spill file
+            :param item: frame number
+            :return: msg-pack-frame
+        """
+        self.__spill_file.seek(self.__offsets[item])
+        return msgpack.unpackb(self.__spill_file.read(self.__getPackedSize(item)), use_list=self.use_list)
+
+
+    def __spillFrame(self):
+        """
+            Pack the oldest frame in memory into the spill file and release it
+            :return: None
+        """
+        if self.__spill_file is None:
+            dir_name = self.spill_dir
+            if dir_name is not None and not os.path.isdir(dir_name):
+                os.makedirs(dir_name)
+            self.__spill_file = tempfile.TemporaryFile(prefix="MsgPackStore-", dir=dir_name)
+        packed_data = self.__packer.pack(self.__frames[self.__first_frame])
+        self.__addSample(len(packed_data))
+        # Reads move the file position
+        self.__spill_file.seek(self.__spill_size)
+        self.__spill_file.write(packed_data)
+        self.__offsets.append(self.__spill_size)
+        self.__spill_size += len(packed_data)
+        self.__frames[self.__first_frame] = None
+        self.__first_frame += 1
+
+
+    @property
+    def memory_size(self):
+        """
+            :return: Estimated number of (packed) bytes of frames in memory
+        """
+        if not self.__num_sampled:
+            return 0
+        return (len(self.__frames) - self.__first_frame) * self.__sampled_size // self.__num_sampled
@@ -1,17 +1,35 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 from pprint import pprint
 import os
+import io
+import logging
 from lz4tools import Lz4File
 import msgpack
 import sys
 import time
+import threading
+from multiprocessing.pool import ThreadPool
 import datetime
 import numpy as np
-import lz4f
 from enum import IntEnum, unique
+from .FrameStore import FrameStore
+from .MsgPackStore import MsgPackStore
+from .FrameCache import FrameCache
+from .FrameAggregator import FrameAggregator
+from .FrameIndex import FrameIndex
+from .HeaderResolver import default_header_resolver
+from .PlayerTracker import PlayerTracker
+from .Prefetcher import Prefetcher
+from .RawFrameReader import RawFrameReader
+from .Lz4Writer import Lz4Writer, PARALLEL_COMPRESSION
+from .Lz4FrameReader import Lz4FrameReader
+from .Lz4StreamReader import Lz4StreamReader
+from .StageStats import StageStats, TimedReader, timer
 
 __author__ = 'jleuven'
 
+logger = logging.getLogger(__name__)
+
 
 @unique
 class DEBUGLEVEL(IntEnum):
@@ -22,48 +40,114 @@ class DEBUGLEVEL(IntEnum):
 
 class MsgPackWrapper(object):
 
-    begin_time_stamp = lz4_file = unpacker = header = __max_players = __free_player_positions = __player_mapping = \
-    __data = __msg_pack_data = __lz4_ctx = __output_packer = footer = None
+    begin_time_stamp = lz4_file = unpacker = header = __max_players = __player_tracker = \
+    __data = __msg_pack_data = __output_writer = __output_packer = __frame_index = __prefetcher = __stats = \
+    __compress_pool = __decompress_pool = __precision_errors = __input_data = __input_stream = __start_date_time = \
+    __host_name = footer = None
 
 
     def __init__(self, input_file_name=None, output_file_name=None, use_iterator=True, skip_frames=5, as_numpy=False,
-                 all_life_matters=False, min_life=5, debug_level=DEBUGLEVEL.ERROR, pass_through_only=False):
+                 all_life_matters=False, min_life=5, debug_level=DEBUGLEVEL.ERROR, pass_through_only=False,
+                 flush_size=1 << 20, use_frame_index=False, header_resolver=None, fast_skip=False,
+                 prefetch=0, prefetch_batch=16, collect_stats=False, memory_budget=None, spill_dir=None,
+                 retain_data=True, retain_msg_pack_data=True, fast_repair=False, compress_threads=0,
+                 decode_threads=0, dtype=np.float64, single_float=False, check_precision=False, follow=False,
+                 follow_interval=0.5, follow_timeout=None, input_data=None, start_date_time=None, host_name=None):
         """
             Constructor
-            :param input_file_name: Name of input file (optional) --> openInputFile
+            :param input_file_name: Name of input file (optional, with input_data only the name) --> openInputFile
             :param output_file_name: Name of output file (optional) --> openOutputFile
             :param use_iterator: Use class as iterator (do not pre-load into memory)
             :param skip_frames: Use one in every 'skip_frames' for output data
             :param as_numpy: Store output data in a numpy array
             :param all_life_matters: No minimal life-threshold for players
             :param min_life: minimal life-threshold for players
-            :param debug_level: Debug level
+            :param debug_level: Debug level (messages are logged to the 'MsgPackWrapper' logger, INFO messages only when
+                                debug_level is INFO and the logger is enabled for INFO)
             :param pass_through_only: Do not load stuff in memory. Read -> fix -> write
+            :param flush_size: Number of packed bytes to collect before they are pushed through lz4 compression
+            :param use_frame_index: Load (or build) a sidecar frame index for random access --> loadFrameIndex
+            :param header_resolver: HeaderResolver for missing header values (None: shared default resolver)
+            :param fast_skip: Only decode what is needed for the player mapping from skipped frames (skipped frames are
+                              not stored in msg-pack-data then)
+            :param prefetch: Number of frames to decode ahead in a background thread when used as iterator (0: off;
+                             passThrough and splitClips can not be used while it reads ahead)
+            :param prefetch_batch: Number of frames the background thread passes at once
+            :param collect_stats: Measure time and counts per stage (decompress, unpack, ...) --> getStats
+            :param memory_budget: Maximum number of bytes kept in memory for processed frames and for msg-pack-frames
+                                  (each), older data is spilled to disk (None: no limit)
+            :param spill_dir: Directory for spilled data (None: default temporary directory)
+            :param retain_data: Keep processed frames in internal storage
+            :param retain_msg_pack_data: Keep msg-pack-frames in internal storage (needed for selections)
+            :param fast_repair: passThrough copies frames that need no fixes as raw msg-pack bytes (only the timestamp
+                                is re-encoded)
+            :param compress_threads: Number of threads that compress output blocks in parallel (0: compress while
+                                     writing; parallel compression needs the python-lz4 package, without it the
+                                     output is compressed while writing)
+            :param decode_threads: Number of threads that decompress the input in parallel; the whole input is read
+                                   (all lz4-frames, e.g. concatenated selections) instead of the first lz4-frame only
+                                   (0: Lz4File; parallel decompression needs the python-lz4 package and independent
+                                   blocks or several lz4-frames)
+            :param dtype: numpy dtype of the frames (as_numpy), output node data, npz/cache output and window batches
+                          (np.float32 halves memory and output size)
+            :param single_float: Pack floats in lz4 output as 32 bit floats (fast_repair frames are decoded then)
+            :param check_precision: Keep the largest error introduced by dtype and single_float --> getPrecisionErrors
+            :param follow: The input is still being written (live recording): at the end of the data wait for new
+                           lz4-blocks, the input ends at the footer (or stopFollowing)
+            :param follow_interval: Seconds between checks for new data (follow)
+            :param follow_timeout: Seconds without new data before the input ends (follow, None: wait for the footer)
+            :param input_data: Recording in memory or readable binary stream instead of the file --> openInputFile
+            :param start_date_time: startDateTime for headers without it (None: from input_file_name) --> openInputFile
+            :param host_name: hostname for headers without it (None: from input_file_name) --> openInputFile
         """
         self.__options_dict = {"debug_level": debug_level,
                                 "skip_frames": skip_frames,
                                 "as_numpy": as_numpy,
                                 "all_life_matters": all_life_matters,
-                                "min_life": min_life}
+                                "min_life": min_life,
+                                "flush_size": flush_size,
+                                "use_frame_index": use_frame_index,
+                                "fast_skip": fast_skip,
+                                "prefetch": prefetch,
+                                "prefetch_batch": prefetch_batch,
+                                "collect_stats": collect_stats,
+                                "memory_budget": memory_budget,
+                                "spill_dir": spill_dir,
+                                "retain_data": retain_data,
+                                "retain_msg_pack_data": retain_msg_pack_data,
+                                "fast_repair": fast_repair,
+                                "compress_threads": compress_threads,
+                                "decode_threads": decode_threads,
+                                "dtype": dtype,
+                                "single_float": single_float,
+                                "check_precision": check_precision,
+                                "follow": follow,
+                                "follow_interval": follow_interval,
+                                "follow_timeout": follow_timeout}
         # self.__debug_level = debug_level
+        self.__log_info = False
+        self.__applyOptions()
         if self.__options_dict["as_numpy"]:
             np.set_printoptions(suppress=True)
-        self.__output_packer = msgpack.Packer(use_single_float=False, use_bin_type=True)
+        self.__header_resolver = header_resolver or default_header_resolver
         self.__input_file_name = input_file_name
         self.__output_file_name = output_file_name
-        self.__output_file = None
+        self.__output_writer = None
         self.__input_file = None
+        self.__reader_lock = threading.Lock()
         # self.__skip_frames = skip_frames
         # self.__as_numpy = as_numpy
         # self.__all_life_matters = all_life_matters
         # self.__min_life = min_life
         self.__output_node_data = None
+        self.__frame_time_stamps = None
         self.__first_frame_timestamp = None
-        if self.__input_file_name is None:
+        if self.__input_file_name is None and input_data is None:
             self.done = True
         else:
-            if os.path.isfile(self.__input_file_name):
-                self.openInputFile(self.__input_file_name, use_iterator=use_iterator or pass_through_only)
+            if input_data is not None or os.path.isfile(self.__input_file_name):
+                self.openInputFile(self.__input_file_name, use_iterator=use_iterator or pass_through_only,
+                                   input_data=input_data, start_date_time=start_date_time, host_name=host_name)
             else:
                 self.error("invalid file")
                 self.done = True
@@ -76,13 +160,31 @@ class MsgPackWrapper(object):
 
     def __getitem__(self, item):
         """
-            Make class act as a list
-            :param item: Index of line in array/list
+            Make class act as a list. Frames that are not loaded yet are decoded from the nearest checkpoint when a
+            frame index is loaded, otherwise all frames up to item are loaded
+            :param item: Index (or slice) of line in array/list
             :return: data-line
         """
-
-        while item > len(self):
-            self.next()
+        frame_index = self.__getFrameIndex()
+        if isinstance(item, slice):
+            if frame_index is None:
+                if item.stop is None or item.stop < 0 or (item.start or 0) < 0:
+                    self.getAllFrames()
+                else:
+                    self.__loadFrames(item.stop)
+                return self.all_data[item]
+            frames = self.__readFrames(range(*item.indices(len(frame_index))))
+            if self.__options_dict["as_numpy"]:
+                return np.vstack(frames) if frames else np.zeros((0, self.__max_players * 3 + 4),
+                                                                 self.__options_dict["dtype"])
+            return frames
+
+        if frame_index is not None and item < 0:
+            item += len(frame_index)
+        if item >= len(self):
+            if frame_index is not None:
+                return self.__readFrames([item])[0]
+            self.__loadFrames(item + 1)
         if self.__options_dict["as_numpy"]:
             return self.__data[item, :]
         else:
@@ -116,20 +218,14 @@ class MsgPackWrapper(object):
             raise StopIteration
 
         try:
-            msg_pack_frame = None
-            for _ in range(self.__options_dict["skip_frames"]):  # Skip x frames before we return 1
-                msg_pack_frame = self.__getNextMsgPackFrame()
-
-            # Correct frame found, proccess it.
-            new_frame = self.__processFrame(msg_pack_frame)
-
-            # Add new frame to internal storage (so it can be reused, without reading from disk)
-            self.__data.append(new_frame)
-            self.info("NEXT Complete")
+            new_frame = self.__getNextFrame()
+            if self.__log_info:
+                self.info("NEXT Complete")
             return new_frame
         except EOFError:
             # Itterator stuff
             self.done = True
+            self.__stopPrefetching()
             raise StopIteration
 
 
@@ -142,6 +238,7 @@ class MsgPackWrapper(object):
         """
         if option_name in self.__options_dict:
             self.__options_dict[option_name] = value
+            self.__applyOptions()
         else:
             self.error("unknown option")
 
@@ -160,27 +257,45 @@ class MsgPackWrapper(object):
 
     def generateEmptyOutputNodeData(self, num_output_values=1):
         if self.__options_dict["as_numpy"]:
-            self.__output_node_data = np.zeros((len(self.__data), num_output_values))
+            self.__output_node_data = np.zeros((len(self.__data), num_output_values), self.__options_dict["dtype"])
 
 
     def setOutputNodeData(self, from_timestamp, to_timestamp, values):
-        if self.__output_node_data is None:
-            self.generateEmptyOutputNodeData()
-        from_timestamp_with_offset = self.__determineTimestampOffset(from_timestamp)
-        to_timestamp_with_offset = self.__determineTimestampOffset(to_timestamp)
+        self.setOutputNodeDataIntervals(from_timestamps=[from_timestamp], to_timestamps=[to_timestamp], values=[values])
 
-        selection = self.__getSelection(from_timestamp=from_timestamp_with_offset, to_timestamp=to_timestamp_with_offset)
 
-        self.__output_node_data[selection] = values
+    def setOutputNodeDataIntervals(self, from_timestamps, to_timestamps, values=1):
+        """
+            Set output node data for many intervals at once. Timestamps are converted vectorised and the frames of all
+            intervals are found with a binary search on the timestamp column
+            :param from_timestamps: list/array of beginning timestamps (datetime/datetime64/seconds)
+            :param to_timestamps: list/array of ending timestamps (datetime/datetime64/seconds)
+            :param values: value for all intervals or a list with a value per interval (later intervals overwrite)
+            :return: output node data
+        """
+        if self.__output_node_data is None:
+            self.generateEmptyOutputNodeData()
+        begins, ends = self.__getFrameRanges(from_timestamps=from_timestamps, to_timestamps=to_timestamps)
+        time_stamps, order = self.__getFrameTimeStamps()
+
+        if np.isscalar(values):
+            # Same value everywhere -> mark all frames within any interval in one go
+            selected = np.cumsum(np.bincount(begins, minlength=len(time_stamps) + 1) -
+                                 np.bincount(ends, minlength=len(time_stamps) + 1))[:-1] > 0
+            self.__output_node_data[selected if order is None else order[selected]] = values
+        else:
+            for begin, end, value in zip(begins, ends, values):
+                self.__output_node_data[slice(begin, end) if order is None else order[begin:end]] = value
+        return self.__output_node_data
 
 
     def generateOutputNodeDataFromCSV(self, csv_file_name):
 
         if csv_file_name is None:
-            self.error("No file specified".format(csv_file_name))
+            self.error("No file specified")
         abs_csv_file_name = os.path.abspath(csv_file_name)
         if not os.path.isfile(abs_csv_file_name):
-            self.error("No such file or directory {}".format(abs_csv_file_name))
+            self.error("No such file or directory %s", abs_csv_file_name)
 
         text = open(csv_file_name, 'rb').read().replace(';\r\n', '\n')
         import pandas as pd
@@ -190,51 +305,137 @@ class MsgPackWrapper(object):
         temp_file.seek(0)
 
         csv_file = pd.DataFrame.from_csv(temp_file, sep=",", parse_dates=True)
-        self.info(csv_file[["StartTime", "EndTime"]])
+        self.info("%s", csv_file[["StartTime", "EndTime"]])
 
-        from dateutil import parser
-        for row_idx, row in csv_file[["StartTime", "EndTime"]].iterrows():
-            start_time = parser.parse(row[0])
-            end_time = parser.parse(row[1])
-            self.setOutputNodeData(from_timestamp=start_time, to_timestamp=end_time, values=1)
-
-        return self.__output_node_data
+        return self.setOutputNodeDataIntervals(from_timestamps=pd.to_datetime(csv_file["StartTime"]).values,
+                                               to_timestamps=pd.to_datetime(csv_file["EndTime"]).values,
+                                               values=1)
 
 
-    def info(self, message=""):
+    def info(self, message="", *args):
+        """
+            Log info message (only with debug_level INFO). Arguments are merged into the message by logging, only when
+            the message is actually emitted
+            :param message: message (%-format)
+            :param args: message arguments
+            :return: None
+        """
         if self.__options_dict["debug_level"] <= DEBUGLEVEL.INFO:
-            print("INFO: {}".format(message))
+            logger.info(message, *args)
 
 
-    def warning(self, message=""):
+    def warning(self, message="", *args):
+        """
+            Log warning message
+            :param message: message (%-format)
+            :param args: message arguments
+            :return: None
+        """
         if self.__options_dict["debug_level"] <= DEBUGLEVEL.ERROR:
-            print("WARNING: {}".format(message))
+            logger.warning(message, *args)
 
 
-    def error(self, message=""):
+    def error(self, message="", *args):
+        """
+            Log error message and raise an Exception
+            :param message: message (%-format)
+            :param args: message arguments
+            :return: None
+        """
         if self.__options_dict["debug_level"] <= DEBUGLEVEL.ERROR:
-            raise Exception("ERROR: {}".format(message))
+            logger.error(message, *args)
+            raise Exception("ERROR: {}".format(message % args if args else message))
 
 
-    def openInputFile(self, input_file_name, use_iterator=True):
+    def getStats(self):
+        """
+            Get time and counts per stage (collect_stats option)
+            :return: dict with stage -> {"seconds": ..., "count": ..., "perSecond": ...} (None: stats not collected)
+        """
+        if self.__stats is None:
+            return None
+        return self.__stats.asDict()
 
-        self.__input_file_name = input_file_name
 
-        if self.__input_file_name is None:
-            self.warning("Empty input_file_name")
-        elif not os.path.isfile(self.__input_file_name):
-            self.warning("File does not exist: {}".format(self.__input_file_name))
+    def resetStats(self):
+        """
+            Clear the stage counters (collect_stats option)
+            :return: None
+        """
+        if self.__stats is not None:
+            self.__stats.reset()
 
+
+    def getPrecisionErrors(self):
+        """
+            Get the largest absolute error introduced so far by the dtype option (frame values and timestamps) and by
+            the single_float option (all floats written to lz4 output) (check_precision option)
+            :return: dict with "data", "timeStamp" and "output" -> error (None: precision not checked)
+        """
+        if self.__precision_errors is None:
+            return None
+        return dict(self.__precision_errors)
+
+
+    def openInputFile(self, input_file_name, use_iterator=True, input_data=None, start_date_time=None, host_name=None):
+        """
+            Open a recording and read its header
+            :param input_file_name: Name of input file. With input_data it is only used as name: startDateTime,
+                                    hostname, begin_time_stamp and default output file names are derived from it (None:
+                                    unknown)
+            :param use_iterator: Use class as iterator (do not pre-load into memory)
+            :param input_data: Recording in memory (bytes, bytearray, memoryview) or a readable binary stream (socket
+                               file, pipe, ...; only read() is used, closed by closeInputFile). A stream is read once,
+                               in order: random access (frame index, slices of frames not loaded yet) and the
+                               fast_repair raw copy need a file or data in memory
+            :param start_date_time: startDateTime (seconds) for headers without it (None: from input_file_name)
+            :param host_name: hostname for headers without it (None: from input_file_name)
+            :return: None
+        """
         if self.__input_file is not None:
             self.closeInputFile()
-        self.info("opening {}".format(self.__input_file_name))
-        self.__input_file = open(self.__input_file_name, "rb")
+        self.__input_file_name = input_file_name
+        self.__input_data = self.__input_stream = None
+        self.__start_date_time = start_date_time
+        self.__host_name = host_name
+        if isinstance(input_data, (bytes, bytearray, memoryview)):
+            self.__input_data = input_data if isinstance(input_data, bytes) else memoryview(input_data).tobytes()
+        elif input_data is not None:
+            self.__input_stream = input_data
+        elif self.__input_file_name is None:
+            self.warning("Empty input_file_name")
+        elif not os.path.isfile(self.__input_file_name):
+            self.warning("File does not exist: %s", self.__input_file_name)
+
+        self.info("opening %s", self.__input_file_name)
+        self.__input_file = self.__input_stream if self.__input_stream is not None else self.__openInput()
 
         self.info("creating lz4")
 
-        self.lz4_file = Lz4File("input", self.__input_file)
+        # A valid frame index already knows the lz4 block offsets (no need to decompress everything to find them)
+        self.__frame_index = None
+        if self.__options_dict["use_frame_index"]:
+            self.loadFrameIndex(build=False)
+        begin = timer()
+        if self.__input_stream is not None:
+            # Streams are read once, in order
+            self.lz4_file = Lz4StreamReader(self.__input_file)
+        elif self.__options_dict["decode_threads"] > 0 or self.__options_dict["follow"]:
+            if self.__options_dict["decode_threads"] > 0:
+                self.__decompress_pool = ThreadPool(self.__options_dict["decode_threads"])
+            self.lz4_file = Lz4FrameReader(self.__input_file, pool=self.__decompress_pool,
+                                           follow=self.__options_dict["follow"],
+                                           poll_interval=self.__options_dict["follow_interval"],
+                                           timeout=self.__options_dict["follow_timeout"])
+        elif self.__frame_index is not None:
+            self.lz4_file = self.__frame_index.openLz4File(self.__input_file)
+        else:
+            self.lz4_file = Lz4File("input", self.__input_file)
+        if self.__stats is not None:
+            # Lz4File decompresses the blocks once on open to find the block offsets
+            self.__stats.add("decompress", timer() - begin, 0)
         self.info("creating unpacker")
-        self.unpacker = msgpack.Unpacker(self.lz4_file, use_list=False)
+        self.unpacker = self.__createUnpacker()
         self.done = False
 
         self.info("open header")
@@ -242,42 +443,76 @@ class MsgPackWrapper(object):
         self.__fixHeader()
 
         self.__max_players = self.header["maxPlayers"]
-        self.__free_player_positions = range(self.__max_players)
-        self.__player_mapping = []
-        self.__data = []
-        self.__msg_pack_data = []
+        self.__player_tracker = PlayerTracker(self.__max_players)
+        memory_budget = self.__options_dict["memory_budget"]
+        if self.__options_dict["as_numpy"]:
+            self.__data = FrameStore(self.__max_players * 3 + 4, dtype=self.__options_dict["dtype"],
+                                     memory_budget=memory_budget, spill_dir=self.__options_dict["spill_dir"])
+        elif memory_budget is not None:
+            self.__data = MsgPackStore(memory_budget, spill_dir=self.__options_dict["spill_dir"], use_list=True)
+        else:
+            self.__data = []
+        if memory_budget is not None:
+            self.__msg_pack_data = MsgPackStore(memory_budget, spill_dir=self.__options_dict["spill_dir"])
+        else:
+            self.__msg_pack_data = []
+        self.__msg_pack_time_stamps = []
+        self.__time_stamp_index = None
+        self.__frame_time_stamps = None
         try:
             self.begin_time_stamp = datetime.datetime.fromtimestamp(time.mktime(time.strptime(os.path.split(self.__input_file_name)[-1].replace("_PlayerData.lz4", "").replace("_PlayerData-selection.lz4", "")[:-1], "%Y_%m_%d-%H.%M.%S.%f")))
         except:
             self.begin_time_stamp = None
-        self.info(self.header)
+        if self.begin_time_stamp is None and self.__start_date_time is not None:
+            self.begin_time_stamp = datetime.datetime.fromtimestamp(self.__start_date_time)
+        self.info("%s", self.header)
+        if self.__options_dict["use_frame_index"] and self.__frame_index is None:
+            self.buildFrameIndex()
         if not use_iterator:
             self.getAllFrames()
 
 
+    def stopFollowing(self):
+        """
+            End a followed input at the data written so far (follow option), e.g. when the recording stopped without a
+            footer. Can be called from another thread while next() waits for new data
+            :return: None
+        """
+        if isinstance(self.lz4_file, Lz4FrameReader):
+            self.lz4_file.stopFollowing()
+
+
     def closeInputFile(self, load_remaining=False):
         if load_remaining:
             self.getAllFrames()
+        self.__stopPrefetching()
         self.__input_file.close()
+        if self.__decompress_pool is not None:
+            self.__decompress_pool.close()
+            self.__decompress_pool.join()
+            self.__decompress_pool = None
         self.done = True
         self.__first_frame_timestamp = None
 
 
     def openOutputFile(self, output_file_name):
-        if self.__output_file is not None:
+        if self.__output_writer is not None:
             self.closeOutputFile()
-        # self.__lz4_ctx = lz4f.createCompContext()
-        self.info("opening {} for writing".format(output_file_name))
-        self.__output_file = open(output_file_name, "wb")
-        # self.output_file.write(lz4f.compressBegin(self.__lz4_ctx))
+        self.info("opening %s for writing", output_file_name)
+        # Independent blocks, so the output can be seeked with a frame index
+        self.__compress_pool = self.__createCompressPool()
+        self.__output_writer = Lz4Writer(open(output_file_name, "wb"), flush_size=self.__options_dict["flush_size"],
+                                         stats=self.__stats, pool=self.__compress_pool)
 
 
     def closeOutputFile(self):
-        if self.__output_file is not None:
-            # self.output_file.write(lz4f.compressEnd(self.__lz4_ctx))
-            self.__output_file.flush()
-            self.__output_file.close()
-            self.__output_file = None
+        if self.__output_writer is not None:
+            self.__output_writer.close()
+            self.__output_writer = None
+        if self.__compress_pool is not None:
+            self.__compress_pool.close()
+            self.__compress_pool.join()
+            self.__compress_pool = None
 
 
     def savez(self, npz_output_file_name="output.npz"):
@@ -287,7 +522,7 @@ class MsgPackWrapper(object):
             :return: None
         """
         with open(str(npz_output_file_name), str("w")) as output_file:
-            np.savez_compressed(output_file, data=self.__data)
+            np.savez_compressed(output_file, data=self.all_data)
 
 
     def loadz(self, npz_input_file_name="", append_new_data=False):
@@ -299,13 +534,46 @@ class MsgPackWrapper(object):
         """
         if os.path.isfile(npz_input_file_name):
             with open(str(npz_input_file_name), str("r")) as input_file:
-                self.__data = np.load(input_file)["data"]
+                self.__data = FrameStore.fromArray(np.load(input_file)["data"], dtype=self.__options_dict["dtype"])
+                self.__frame_time_stamps = None
                 self.__options_dict["as_numpy"] = True  # Data is no completely numpy
                 self.done = not append_new_data  # No more reading... (may need)
         else:
             raise Exception("No such file")
 
 
+    def saveCache(self, cache_dir_name="output.cache"):
+        """
+            Store internal data to a memory-mapped columnar cache (successor of savez) --> FrameCache
+            :param cache_dir_name: Name of the cache directory
+            :return: FrameCache
+        """
+        options = dict((option_name, self.__options_dict[option_name])
+                       for option_name in ("skip_frames", "all_life_matters", "min_life", "fast_skip"))
+        return FrameCache.write(cache_dir_name, self.all_data, self.__max_players, header=self.header,
+                                footer=self.footer, options=options)
+
+
+    def loadCache(self, cache_dir_name="output.cache", columns=None, from_timestamp=None, to_timestamp=None):
+        """
+            Open a cache written by saveCache. Only the requested columns and time range are read from disk; unlike
+            loadz the internal data is not replaced
+            :param cache_dir_name: Name of the cache directory
+            :param columns: Names of columns (None: all) --> FrameCache.COLUMNS
+            :param from_timestamp: Timestamp at the beginning of selection (seconds or datetime)
+            :param to_timestamp: Timestamp at the end of the selection (seconds or datetime)
+            :return: dict with column name -> array (memory-mapped views)
+        """
+        frame_cache = FrameCache(cache_dir_name)
+        if self.header is None:
+            self.header = frame_cache.header
+            self.footer = frame_cache.footer
+            self.__max_players = frame_cache.manifest["maxPlayers"]
+        return frame_cache.select(columns=columns,
+                                  from_timestamp=self.__determineTimestampOffset(from_timestamp),
+                                  to_timestamp=self.__determineTimestampOffset(to_timestamp))
+
+
     def getAllFrames(self):
         """
             Use te self iterator to load all the data
@@ -314,10 +582,7 @@ class MsgPackWrapper(object):
         for _ in self:
             pass
 
-        if self.__options_dict["as_numpy"]:
-            return np.vstack(self.__data)
-        else:
-            return self.__data
+        return self.all_data
 
 
     def getInputNodeLength(self):
@@ -326,8 +591,63 @@ class MsgPackWrapper(object):
 
     def getInputNodeData(self):
         if self.__options_dict["as_numpy"]:
-            data = np.vstack(self.__data)
-            return data[:, :-1]
+            return self.all_data[:, :-1]
+
+
+    def getWindowBatches(self, window_length, stride=1, batch_size=32, streaming=False):
+        """
+            Generate batches of windows of consecutive frames (e.g. to train a network). The windows are strided views on
+            the frame matrix (without timestamps), so nothing is copied. The labels are the matching windows of the output
+            node data (None when no output node data is generated)
+            :param window_length: Number of frames per window
+            :param stride: Number of frames between the first frames of two windows
+            :param batch_size: Number of windows per batch (the last batch can be smaller)
+            :param streaming: Decode frames while generating batches instead of loading all frames first. Frames are
+                              kept in a buffer of one batch and are not stored, so a batch is only valid until the next
+                              batch is generated (copy it to keep it)
+            :return: generator of (inputs [batch, window_length, input nodes], labels [batch, window_length, outputs])
+        """
+        if window_length < 1 or stride < 1 or batch_size < 1:
+            self.error("window_length, stride and batch_size should be at least 1")
+        if streaming:
+            return self.__generateStreamingWindowBatches(window_length, stride, batch_size)
+        return self.__generateWindowBatches(window_length, stride, batch_size)
+
+
+    def aggregate(self, aggregator=None, bins=(100, 60), batch_size=1024):
+        """
+            Aggregate all frames (heatmaps, player counts, statistics per slot) in one pass: the frames in internal
+            storage and the rest of the input, which is decoded like next() does but not stored (neither are its
+            msg-pack-frames, also with prefetch). Memory usage is bounded by batch_size frames
+            :param aggregator: FrameAggregator to add the frames to (e.g. of the previous file, None: new aggregator)
+            :param bins: Number of heatmap bins (length, width of the field) of a new aggregator
+            :param batch_size: Number of frames that are aggregated at once
+            :return: FrameAggregator
+        """
+        if self.__input_file is None:
+            self.error("No input file opened")
+        if aggregator is None:
+            aggregator = FrameAggregator.fromHeader(self.header, bins=bins)
+        batch = np.zeros((batch_size, self.__max_players * 3 + 4), self.__options_dict["dtype"])
+        num_rows = 0
+        for frame in self.__data:
+            batch[num_rows] = frame
+            num_rows += 1
+            if num_rows == batch_size:
+                aggregator.add(batch)
+                num_rows = 0
+        while not self.done:
+            try:
+                batch[num_rows] = self.__getNextFrame(store=False)
+                num_rows += 1
+            except EOFError:
+                self.done = True
+                self.__stopPrefetching()
+            if num_rows == batch_size:
+                aggregator.add(batch)
+                num_rows = 0
+        aggregator.add(batch[:num_rows])
+        return aggregator
 
 
     def getMsgPackFrame(self, item):
@@ -336,25 +656,104 @@ class MsgPackWrapper(object):
             :param item: index for frame
             :return: frame
         """
+        if not self.__options_dict["retain_msg_pack_data"]:
+            self.error("msg-pack-frames are not retained (retain_msg_pack_data option)")
         if item < len(self.__msg_pack_data):
             return self.__msg_pack_data[item]
         else:
-            self.error("Item: {} not loaded in msg-pack-data".format(item))
+            self.error("Item: %s not loaded in msg-pack-data", item)
+
+
+    def buildFrameIndex(self, interval=1000, save=True):
+        """
+            Decode the input file once to build a frame index (checkpoints for random access)
+            :param interval: Number of frames between checkpoints
+            :param save: Store index next to the input file (not for input data in memory)
+            :return: FrameIndex
+        """
+        frame_index = FrameIndex(skip_frames=self.__options_dict["skip_frames"], interval=interval)
+        # The prefetch thread must not use the reader while it is replaced
+        self.__reader_lock.acquire()
+        reader_state = self.__getReaderState()
+        input_file = self.__openInput()
+        try:
+            self.__input_file = input_file
+            self.lz4_file = Lz4File("input", input_file)
+            frame_index.setInputFile(self.__getInputPath(), self.lz4_file)
+            self.unpacker = self.__createUnpacker()
+            self.unpacker.next()  # Header
+            self.__player_tracker = PlayerTracker(self.__max_players)
+            self.__first_frame_timestamp = None
+            while True:
+                if frame_index.needsCheckpoint():
+                    frame_index.addCheckpoint(offset=self.unpacker.tell(),
+                                              raw_frame=len(frame_index) * max(self.__options_dict["skip_frames"], 1),
+                                              player_state=self.__getPlayerState(),
+                                              first_frame_timestamp=self.__first_frame_timestamp)
+                try:
+                    msg_pack_frame = self.__getNextSelectedMsgPackFrame(save_data=False)
+                except EOFError:
+                    break
+                frame_index.addTimeStamp(self.__processFrame(msg_pack_frame, store=False)[-1])
+        finally:
+            input_file.close()
+            self.__setReaderState(reader_state)
+            self.__reader_lock.release()
+
+        if save and self.__getInputPath() is not None:
+            frame_index.save(FrameIndex.getFileName(self.__input_file_name))
+        self.__frame_index = frame_index
+        return frame_index
+
+
+    def loadFrameIndex(self, build=True):
+        """
+            Load the sidecar frame index of the input file (if it is still valid)
+            :param build: Build (and store) the index if no valid index exists
+            :return: FrameIndex or None
+        """
+        if self.__getInputPath() is None:
+            # Input data in memory: there is no sidecar index
+            return self.buildFrameIndex(save=False) if build else None
+        index_file_name = FrameIndex.getFileName(self.__input_file_name)
+        if os.path.isfile(index_file_name):
+            try:
+                frame_index = FrameIndex.load(index_file_name)
+                if frame_index.isValidFor(self.__input_file_name, self.__options_dict["skip_frames"]):
+                    self.__frame_index = frame_index
+                    return frame_index
+            except Exception as e:
+                self.warning(e)
+        if build:
+            return self.buildFrameIndex()
+        return None
+
+
+    def getFrameAtTimeStamp(self, time_stamp):
+        """
+            Get the first frame at (or after) a timestamp using the frame index
+            :param time_stamp: datetime/seconds
+            :return: data-line
+        """
+        if self.__getFrameIndex() is None:
+            self.loadFrameIndex()
+        return self[self.__frame_index.getFrame(self.__determineTimestampOffset(time_stamp))]
 
 
     def writeMsgPackFrameSelectionMulti(self, output_file_name=None, from_timestamps=None, to_timestamps=None):
         """
-            Write multiple selections from data to file
+            Write multiple selections from data to file (in a single pass, frames shared by selections are packed once)
             :param output_file_name: Optional output file_name
             :param from_timestamps: list of beginning timestamps
             :param to_timestamps: list of ending timestamps
             :return: None
         """
         if isinstance(from_timestamps, list) and isinstance(to_timestamps, list):
-            for from_timestamp, to_timestamp in zip(from_timestamps, to_timestamps):
-                self.writeMsgPackFrameSelectionSingle(output_file_name=output_file_name,
-                                                      from_timestamp=from_timestamp,
-                                                      to_timestamp=to_timestamp)
+            if self.begin_time_stamp is None:
+                return False
+            selections = [self.__getMsgPackSelection(from_timestamp=from_timestamp, to_timestamp=to_timestamp)
+                          for from_timestamp, to_timestamp in zip(from_timestamps, to_timestamps)]
+            self.__writeMsgPackSelections(output_file_name=output_file_name, selections=selections)
 
 
     def writeMsgPackFrameSelectionSingle(self, output_file_name=None, from_timestamp=None, to_timestamp=None):
@@ -369,85 +768,226 @@ class MsgPackWrapper(object):
         if self.begin_time_stamp is None:
             return False
 
-        # Create temporary file
-        import StringIO
-        temp_output_file = StringIO.StringIO()
+        selection = self.__getMsgPackSelection(from_timestamp=from_timestamp, to_timestamp=to_timestamp)
+        self.__writeMsgPackSelections(output_file_name=output_file_name, selections=[selection])
 
-        # Convert timestamps
-        from_timestamp_with_offset = self.__determineTimestampOffset(from_timestamp)
-        to_timestamp_with_offset = self.__determineTimestampOffset(to_timestamp)
-        if from_timestamp_with_offset is None:
-            from_timestamp_with_offset = 0
-        if to_timestamp_with_offset is None:
-            to_timestamp_with_offset = np.inf
 
-        # Determine output-filename
-        if output_file_name is None:
-            output_file_name = self.__input_file_name.replace(".lz4", "-selection.lz4")
-
-        # If no output file -> open it
-        if self.__output_file is None:
-            self.openOutputFile(output_file_name=output_file_name)
-
-        # Write msg-pack-header
-        temp_output_file.write(self.__output_packer.pack(self.header))
-
-        # Write all frames within selection
-        for frame in self.__msg_pack_data:
-            if from_timestamp_with_offset < frame["timeStamp"] < to_timestamp_with_offset:
-                temp_output_file.write(self.__output_packer.pack(frame))
-                # compressed_string = lz4f.compressUpdate(self.__output_packer.pack(frame), self.__lz4_ctx)
-                # self.output_file.write(compressed_string)
-
-        # If it exists: write footer
-        if self.footer is not None:
-            temp_output_file.write(self.__output_packer.pack(self.footer))
-
-
-        temp_output_file.seek(0)
-        self.__output_file.write(lz4f.compressFrame(temp_output_file.read()))
+    def splitClips(self, from_timestamps, to_timestamps, output_file_names=None):
+        """
+            Cut clips out of the input while reading it once (from the current position), without loading it into
+            memory. Every frame is written to the clips it belongs to as soon as it is read; a clip gets the same
+            content as writeMsgPackFrameSelectionSingle would write (header, frames between the timestamps, footer).
+            Clips are flushed when the input passes their end, so memory usage is bounded by the number of clips in
+            progress. Clip files stay open until the footer is read.
+            :param from_timestamps: list of timestamps at the beginning of the clips (datetime/seconds)
+            :param to_timestamps: list of timestamps at the end of the clips (datetime/seconds)
+            :param output_file_names: list of output file names (None: <input>-clip-<nr>.lz4)
+            :return: list of (output file name, number of frames)
+        """
+        if self.__input_file is None:
+            self.error("No input file opened")
+        if len(from_timestamps) != len(to_timestamps):
+            self.error("from_timestamps and to_timestamps should have the same length")
+        self.__checkNotPrefetching("splitClips")
+        if output_file_names is None:
+            if self.__input_file_name is None:
+                self.error("No input file name to derive output file names from")
+            output_file_names = [self.__input_file_name.replace(".lz4", "-clip-{:03d}.lz4".format(clip_nr))
+                                 for clip_nr in range(len(from_timestamps))]
+        from_time_stamps = self.__determineTimestampOffsets(from_timestamps, default=0.0)
+        to_time_stamps = self.__determineTimestampOffsets(to_timestamps, default=np.inf)
+
+        packed_header = self.__pack(self.header)
+        compress_pool = self.__createCompressPool()
+        clip_writers = {}
+        num_clip_frames = np.zeros(len(output_file_names), dtype=np.int64)
+        in_progress = np.zeros(len(output_file_names), dtype=bool)
+        try:
+            while True:
+                try:
+                    msg_pack_frame = self.__getNextMsgPackFrame(save_data=False)
+                except EOFError:
+                    break
+                time_stamp = msg_pack_frame["timeStamp"]
+                in_clip = (from_time_stamps < time_stamp) & (time_stamp < to_time_stamps)
+
+                # Release the buffers of clips the input has passed
+                for clip_nr in np.flatnonzero(in_progress & (time_stamp >= to_time_stamps)):
+                    clip_writers[clip_nr].flush()
+                    in_progress[clip_nr] = False
+
+                clip_nrs = np.flatnonzero(in_clip)
+                if not len(clip_nrs):
+                    continue
+                packed_frame = self.__pack(msg_pack_frame)
+                for clip_nr in clip_nrs:
+                    if clip_nr not in clip_writers:
+                        self.info("opening %s for writing", output_file_names[clip_nr])
+                        clip_writers[clip_nr] = Lz4Writer(open(output_file_names[clip_nr], "wb"),
+                                                          flush_size=self.__options_dict["flush_size"],
+                                                          stats=self.__stats, pool=compress_pool)
+                        clip_writers[clip_nr].write(packed_header)
+                    clip_writers[clip_nr].write(packed_frame)
+                    in_progress[clip_nr] = True
+                num_clip_frames[clip_nrs] += 1
+
+            # Clips without frames still get a header (and footer)
+            packed_footer = self.__pack(self.footer) if self.footer is not None else None
+            for clip_nr, output_file_name in enumerate(output_file_names):
+                if clip_nr not in clip_writers:
+                    clip_writers[clip_nr] = Lz4Writer(open(output_file_name, "wb"),
+                                                      flush_size=self.__options_dict["flush_size"], stats=self.__stats,
+                                                      pool=compress_pool)
+                    clip_writers[clip_nr].write(packed_header)
+                if packed_footer is not None:
+                    clip_writers[clip_nr].write(packed_footer)
+        finally:
+            for clip_writer in clip_writers.values():
+                clip_writer.close()
+            if compress_pool is not None:
+                compress_pool.close()
+                compress_pool.join()
+        return list(zip(output_file_names, num_clip_frames.tolist()))
 
 
     def passThrough(self):
         """
-            Function to load skip loading all data into memory
+            Function to load skip loading all data into memory. Frames are compressed and written while reading, so
+            memory usage is bounded by the 'flush_size' option (plus one lz4-block)
             :return:
         """
-        if self.__input_file is None or self.__output_file is None:
+        if self.__input_file is None or self.__output_writer is None:
             self.error("No input or outputfile opened")
             return False
-
-        # Temporary file
-        import StringIO
-        temp_output_file = StringIO.StringIO()
+        self.__checkNotPrefetching("passThrough")
 
         # Write header
-        packed_header = self.__output_packer.pack(self.header)
-        temp_output_file.write(packed_header)
+        self.__output_writer.write(self.__pack(self.header))
         frame_count = 0
 
-        # Write all frames
-        while True:
-            try:
-                msg_pack_frame = self.__getNextMsgPackFrame(save_data=False)
-                temp_output_file.write(self.__output_packer.pack(msg_pack_frame))
-                frame_count += 1
-            except EOFError:
-                self.info("DONE. Frames: {}".format(frame_count))
-                break
+        # Write all frames (single floats need every float re-encoded, so raw frames can not be copied; a stream can not
+        # be moved back to the first frame the unpacker has not returned)
+        if self.__options_dict["fast_repair"] and not self.__options_dict["single_float"] and \
+                self.__input_stream is None:
+            frame_count = self.__passThroughRawFrames()
+        else:
+            while True:
+                try:
+                    msg_pack_frame = self.__getNextMsgPackFrame(save_data=False)
+                    self.__output_writer.write(self.__pack(msg_pack_frame))
+                    frame_count += 1
+                except EOFError:
+                    break
+        self.info("DONE. Frames: %s", frame_count)
 
         # If it exists -> write footer
         if self.footer is not None:
-            temp_output_file.write(self.__output_packer.pack(self.footer))
-
-        # Write temporary file through lz4 compression
-        temp_output_file.seek(0)
-        self.__output_file.write(lz4f.compressFrame(temp_output_file.read()))
+            self.__output_writer.write(self.__pack(self.footer))
 
         self.closeOutputFile()
         return True
 
 
+    def __addPrecisionError(self, name, values, stored_values):
+        """
+            Keep the largest difference between values and their stored (converted) versions (check_precision option)
+            :param name: "data", "timeStamp" or "output"
+            :param values: original values
+            :param stored_values: stored values
+            :return: None
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.size:
+            error = float(np.max(np.abs(values - np.asarray(stored_values, dtype=np.float64))))
+            if error > self.__precision_errors[name]:
+                self.__precision_errors[name] = error
+
+
+    def __applyOptions(self):
+        """
+            Apply options that need more than storing the value (after init and setOption)
+            :return: None
+        """
+        # Checked once, so hot paths do not build messages that are thrown away
+        self.__log_info = self.__options_dict["debug_level"] <= DEBUGLEVEL.INFO and logger.isEnabledFor(logging.INFO)
+        if not self.__options_dict["collect_stats"]:
+            self.__stats = None
+        elif self.__stats is None:
+            self.__stats = StageStats()
+        self.__output_packer = msgpack.Packer(use_single_float=self.__options_dict["single_float"], use_bin_type=True)
+        if not self.__options_dict["check_precision"]:
+            self.__precision_errors = None
+        elif self.__precision_errors is None:
+            self.__precision_errors = {"data": 0.0, "timeStamp": 0.0, "output": 0.0}
+
+
+    def __checkFollowedFooter(self):
+        """
+            A followed recording (follow option) ends at its footer: nothing is written after it
+            :return: None
+        """
+        if self.__options_dict["follow"]:
+            raise EOFError("Footer of followed recording")
+
+
+    def __checkNotPrefetching(self, function_name):
+        """
+            Check that no prefetch thread is reading ahead: functions that read the msg-pack-frames from the current
+            position would skip the frames it already decoded (they are not returned to the reader)
+            :param function_name: Name of the function, for the error message
+            :return: None
+        """
+        if self.__prefetcher is not None:
+            self.error("%s can not be used while iterating with prefetch (the prefetched frames would be skipped)",
+                       function_name)
+
+
+    def __checkSelectionHeader(self, header):
+        """
+            Check the header of a next selection in the input (files with concatenated selections/exports)
+            :param header: msg-pack-header
+            :return: None
+        """
+        if header["maxPlayers"] != self.__max_players:
+            self.error("Selections with different maxPlayers in one file: %s, %s", self.__max_players,
+                       header["maxPlayers"])
+
+
+    def __createCompressPool(self):
+        """
+            Create the thread pool for output compression (compress_threads option)
+            :return: ThreadPool or None
+        """
+        if self.__options_dict["compress_threads"] <= 0:
+            return None
+        if not PARALLEL_COMPRESSION:
+            self.warning("compress_threads needs the python-lz4 package (pip install MsgPackWrapper[threads]), "
+                         "compressing while writing")
+            return None
+        return ThreadPool(self.__options_dict["compress_threads"])
+
+
+    def __createUnpacker(self):
+        """
+            Create msg-pack unpacker for the lz4 input (with collect_stats the decompression is measured separately)
+            :return: Unpacker
+        """
+        if self.__stats is None:
+            return msgpack.Unpacker(self.lz4_file, use_list=False)
+        return msgpack.Unpacker(TimedReader(self.lz4_file, self.__stats), use_list=False)
+
+
+    def __decodeNextFrame(self):
+        """
+            Read, fix and process the next selected frame without storing it (produce function of the prefetch thread).
+            The msg-pack-frames that were read are returned too: the consumer decides whether they are saved
+            :return: (list/array, list of msg-pack-frames or None when msg-pack-frames are not retained)
+        """
+        read_frames = [] if self.__options_dict["retain_msg_pack_data"] else None
+        msg_pack_frame = self.__getNextSelectedMsgPackFrame(save_data=False, read_frames=read_frames)
+        return self.__processFrame(msg_pack_frame, store=False), read_frames
+
+
     def __determineTimestampOffset(self, time_stamp):
         """
             Convert datetime to integer notation
@@ -468,6 +1008,29 @@ class MsgPackWrapper(object):
         return time_stamp
 
 
+    def __determineTimestampOffsets(self, time_stamps, default=0.0):
+        """
+            Vectorised version of __determineTimestampOffset
+            :param time_stamps: list/array of timestamps (datetime/datetime64/seconds, None -> default)
+            :param default: Value for missing timestamps
+            :return: array with converted timestamps
+        """
+        time_stamps = np.asarray(time_stamps)
+        if time_stamps.dtype == object:
+            if not all(isinstance(time_stamp, datetime.datetime) for time_stamp in time_stamps):
+                return np.array([default if time_stamp is None else self.__determineTimestampOffset(time_stamp)
+                                 for time_stamp in time_stamps], dtype=np.float64)
+            time_stamps = time_stamps.astype("datetime64[us]")
+        if np.issubdtype(time_stamps.dtype, np.datetime64):
+            if self.begin_time_stamp is None:
+                begin_time_stamp = np.datetime64("1970-01-01", "us") + \
+                                   np.timedelta64(int(self.header["startDateTime"] * 1e6), "us")
+            else:
+                begin_time_stamp = np.datetime64(self.begin_time_stamp, "us")
+            return (time_stamps - begin_time_stamp) / np.timedelta64(1, "s")
+        return time_stamps.astype(np.float64)
+
+
     def __fixHeader(self):
         """
             Fix header (if needed)
@@ -482,6 +1045,21 @@ class MsgPackWrapper(object):
         return self.header
 
 
+    def __fixMsgPackFrame(self, msg_pack_frame):
+        """
+            Apply all frame fixes (timestamp, players, ballLines)
+            :param msg_pack_frame: input frame
+            :return: fixed frame
+        """
+        measurement = self.__startMeasurement() if self.__stats is not None else None
+        msg_pack_frame = self.__fixTimeStamp(msg_pack_frame)
+        msg_pack_frame = self.__fixPlayers(msg_pack_frame)
+        msg_pack_frame = self.__fixBallLines(msg_pack_frame)
+        if measurement is not None:
+            self.__stopMeasurement("fix", measurement)
+        return msg_pack_frame
+
+
     def __fixPlayers(self, frame):
         """
             Fix players in frame (if needed)
@@ -496,11 +1074,15 @@ class MsgPackWrapper(object):
                 new_players.append({"normPosition": player, "weight": 1})
         if players_converted:
             frame["players"] = new_players
-            self.info("Players converted")
+            if self.__log_info:
+                self.info("Players converted")
         return frame
 
 
     def __fixBallLines(self, frame):
+        if "ballLines" not in frame:
+            # Legacy frame with 'balls'
+            return frame
         new_ballLines = []
         ballLines_converted = False
         for ballLine in frame["ballLines"]:
@@ -510,7 +1092,9 @@ class MsgPackWrapper(object):
                                       'probability': 1})
         if ballLines_converted:
             frame["ballLines"] = new_ballLines
-            self.info("ballLines converted")
+            if self.__log_info:
+                self.info("ballLines converted")
+        return frame
 
 
     def __fixTimeStamp(self, frame):
@@ -524,19 +1108,130 @@ class MsgPackWrapper(object):
         if frame["timeStamp"] >= self.__first_frame_timestamp:
             frame["timeStamp"] = frame["timeStamp"] - self.__first_frame_timestamp
         else:
-            self.info("{} {}".format(frame["timeStamp"], self.__first_frame_timestamp))
+            self.info("%s %s", frame["timeStamp"], self.__first_frame_timestamp)
         return frame
 
 
-    def __freePlayer(self, index):
+    def __getFloats(self, value, floats=None):
         """
-            Player with mapping index is declared free. Append it to the list of free mappings
-            :param index:
-            :return: None
+            Collect all floats in a msg-pack-frame (or header/footer)
+            :param value: msg-pack value
+            :param floats: list to add the floats to
+            :return: list of floats
+        """
+        if floats is None:
+            floats = []
+        if isinstance(value, float):
+            floats.append(value)
+        elif isinstance(value, dict):
+            for item in value.values():
+                self.__getFloats(item, floats)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                self.__getFloats(item, floats)
+        return floats
+
+
+    def __getFrameIndex(self):
         """
-        if index is None:  # This should not be happening
-            self.error("Trying to free a non-existent player mapping")
-        self.__free_player_positions.append(index)
+            Get the loaded frame index (only if it matches the current skip_frames option)
+            :return: FrameIndex or None
+        """
+        if self.__frame_index is not None and self.__frame_index.skip_frames == self.__options_dict["skip_frames"]:
+            return self.__frame_index
+        return None
+
+
+    def __getFrameRanges(self, from_timestamps, to_timestamps):
+        """
+            Find the frames (in the sorted timestamp column) between pairs of timestamps (exclusive)
+            :param from_timestamps: list/array of beginning timestamps (None: from the beginning)
+            :param to_timestamps: list/array of ending timestamps (None: to the end)
+            :return: array with begins, array with ends
+        """
+        time_stamps, _ = self.__getFrameTimeStamps()
+        begins = np.searchsorted(time_stamps, self.__determineTimestampOffsets(from_timestamps, default=-np.inf),
+                                 side="right")
+        ends = np.searchsorted(time_stamps, self.__determineTimestampOffsets(to_timestamps, default=np.inf),
+                               side="left")
+        return begins, np.maximum(begins, ends)
+
+
+    def __getFrameTimeStamps(self):
+        """
+            Get the sorted timestamp column of the internal data (rebuilt when new frames have been added)
+            :return: sorted timestamps, order of frames (None if frames are already sorted)
+        """
+        if self.__frame_time_stamps is None or self.__frame_time_stamps[0] != len(self.__data):
+            if isinstance(self.__data, FrameStore):
+                time_stamps = self.__data.view[:, -1]
+            else:
+                time_stamps = np.array([frame[-1] for frame in self.__data], dtype=np.float64)
+            order = None
+            if np.any(np.diff(time_stamps) < 0):
+                order = np.argsort(time_stamps, kind="mergesort")
+                time_stamps = time_stamps[order]
+            self.__frame_time_stamps = (len(self.__data), time_stamps, order)
+        return self.__frame_time_stamps[1:]
+
+
+    def __generateStreamingWindowBatches(self, window_length, stride, batch_size):
+        """
+            Generator for getWindowBatches in streaming mode
+        """
+        num_buffer_rows = (batch_size - 1) * stride + window_length
+        buffer = np.zeros((num_buffer_rows, self.__max_players * 3 + 4), self.__options_dict["dtype"])
+        first_frame = len(self.__data)  # Frame ordinal of the first row in the buffer
+        num_rows = 0
+        num_skip_frames = 0
+        while not self.done:
+            try:
+                for _ in range(num_skip_frames):
+                    self.__getNextFrame(store=False)
+                num_skip_frames = 0
+                while num_rows < num_buffer_rows:
+                    buffer[num_rows] = self.__getNextFrame(store=False)
+                    num_rows += 1
+            except EOFError:
+                self.done = True
+                self.__stopPrefetching()
+            if num_rows < window_length:
+                break
+
+            num_windows = (num_rows - window_length) // stride + 1
+            inputs = self.__getWindows(buffer[:num_rows, :-1], window_length, stride)
+            labels = None
+            if self.__output_node_data is not None and len(self.__output_node_data) >= first_frame + num_rows:
+                labels = self.__getWindows(self.__output_node_data[first_frame:first_frame + num_rows],
+                                           window_length, stride)
+            yield inputs, labels
+
+            # Keep the frames that are needed for the next batch
+            num_consumed_rows = num_windows * stride
+            if num_consumed_rows < num_rows:
+                buffer[:num_rows - num_consumed_rows] = buffer[num_consumed_rows:num_rows]
+                num_rows -= num_consumed_rows
+            else:
+                num_skip_frames = num_consumed_rows - num_rows
+                num_rows = 0
+            first_frame += num_consumed_rows
+
+
+    def __generateWindowBatches(self, window_length, stride, batch_size):
+        """
+            Generator for getWindowBatches over all frames
+        """
+        if not self.done:
+            self.getAllFrames()
+        data = np.asarray(self.all_data)
+        inputs = self.__getWindows(data[:, :-1], window_length, stride)
+        labels = None
+        if self.__output_node_data is not None:
+            if len(self.__output_node_data) < len(data):
+                self.error("Output node data has %s frames, expected %s", len(self.__output_node_data), len(data))
+            labels = self.__getWindows(self.__output_node_data[:len(data)], window_length, stride)
+        for begin in range(0, len(inputs), batch_size):
+            yield inputs[begin:begin + batch_size], None if labels is None else labels[begin:begin + batch_size]
 
 
     def __getHostName(self):
@@ -544,7 +1239,9 @@ class MsgPackWrapper(object):
             Get hostname (for header fix)
             :return: Hostname
         """
-        split_file_name = self.__input_file_name.split(os.path.sep)
+        if self.__host_name is not None:
+            return self.__host_name
+        split_file_name = (self.__input_file_name or "").split(os.path.sep)
         host_name = "unkown"
         for file_name_part in split_file_name:
             if ".vpn" in file_name_part:
@@ -552,41 +1249,142 @@ class MsgPackWrapper(object):
         return host_name
 
 
-    def __getNextMsgPackFrame(self, save_data=True):
+    def __getInputPath(self):
+        """
+            :return: Path of the input file (None: input data in memory or stream)
+        """
+        if self.__input_data is None and self.__input_stream is None:
+            return self.__input_file_name
+        return None
+
+
+    def __getMsgPackSelection(self, from_timestamp=None, to_timestamp=None):
+        """
+            Look up the msg-pack-frames within a selection using the timestamp index
+            :param from_timestamp: Timestamp at the beginning of selection (datetime/seconds)
+            :param to_timestamp: Timestamp at the end of the selection (datetime/seconds)
+            :return: indices in msg-pack-data (in file order)
+        """
+        from_timestamp_with_offset = self.__determineTimestampOffset(from_timestamp)
+        to_timestamp_with_offset = self.__determineTimestampOffset(to_timestamp)
+        if from_timestamp_with_offset is None:
+            from_timestamp_with_offset = 0
+        if to_timestamp_with_offset is None:
+            to_timestamp_with_offset = np.inf
+
+        time_stamps, order = self.__getTimeStampIndex()
+        begin = np.searchsorted(time_stamps, from_timestamp_with_offset, side="right")
+        end = np.searchsorted(time_stamps, to_timestamp_with_offset, side="left")
+        if order is None:
+            return np.arange(begin, max(begin, end))
+        return np.sort(order[begin:end])
+
+
+    def __getNextMsgPackFrame(self, save_data=True, read_frames=None):
         """
             Helper function to get next msg-pack-frame
             :param save_data: Boolean option to save data to internal structure
+            :param read_frames: list to append the msg-pack-frame to (to save it later), None: not collected
             :return: msg-pack-frame (fixed)
         """
+        measurement = self.__startMeasurement() if self.__stats is not None else None
         msg_pack_frame = self.unpacker.next()
+        if measurement is not None:
+            self.__stopMeasurement("unpack", measurement)
         if "endLogTime" in msg_pack_frame:
+            # Footer is the last msg-pack-frame (files with concatenated selections continue with the next one)
             self.footer = msg_pack_frame
-            return self.footer
-        msg_pack_frame = self.__fixTimeStamp(msg_pack_frame)
-        msg_pack_frame = self.__fixPlayers(msg_pack_frame)
-        msg_pack_frame = self.__fixBallLines(msg_pack_frame)
+            self.__checkFollowedFooter()
+            return self.__getNextMsgPackFrame(save_data=save_data, read_frames=read_frames)
+        if "maxPlayers" in msg_pack_frame:
+            # Header of the next selection
+            self.__checkSelectionHeader(msg_pack_frame)
+            return self.__getNextMsgPackFrame(save_data=save_data, read_frames=read_frames)
+
+        msg_pack_frame = self.__fixMsgPackFrame(msg_pack_frame)
 
         if self.__first_frame_timestamp is None:
             self.__setFirstFrameTimeStamp(msg_pack_frame)
         if save_data:
-            self.__msg_pack_data.append(msg_pack_frame)
+            self.__saveMsgPackFrame(msg_pack_frame)
+        if read_frames is not None:
+            read_frames.append(msg_pack_frame)
         return msg_pack_frame
 
 
+    def __getNextSelectedMsgPackFrame(self, save_data=True, read_frames=None):
+        """
+            Read the next 'skip_frames' msg-pack-frames and return the last one. The skipped frames only update the
+            player mapping (with the fast_skip option they are not decoded completely)
+            :param save_data: Boolean option to save data to internal structure
+            :param read_frames: list to append the msg-pack-frames that are read to, None: not collected
+            :return: msg-pack-frame (fixed)
+        """
+        for _ in range(self.__options_dict["skip_frames"] - 1):
+            if self.__options_dict["fast_skip"]:
+                self.__skipMsgPackFrame()
+            else:
+                msg_pack_frame = self.__getNextMsgPackFrame(save_data=save_data, read_frames=read_frames)
+                self.__updatePlayerMapping(msg_pack_frame["playersRemovedIndices"], len(msg_pack_frame["players"]))
+        return self.__getNextMsgPackFrame(save_data=save_data, read_frames=read_frames)
+
+
+    def __getNextFrame(self, store=True):
+        """
+            Get the next processed frame from the input (from the prefetch thread or decoded here)
+            :param store: Store frame (and msg-pack-frames) in internal storage
+            :return: list/array (raises EOFError at the end of the input)
+        """
+        store_data = store and self.__options_dict["retain_data"]
+        if self.__options_dict["prefetch"] > 0:
+            # Frame is already decoded and processed by the prefetch thread
+            new_frame, msg_pack_frames = self.__getPrefetcher().get()
+            if store and msg_pack_frames:
+                for msg_pack_frame in msg_pack_frames:
+                    self.__saveMsgPackFrame(msg_pack_frame)
+            if store_data:
+                self.__data.append(new_frame)
+            return new_frame
+
+        # Skip x frames before we return 1
+        msg_pack_frame = self.__getNextSelectedMsgPackFrame(save_data=store)
+
+        # Correct frame found, proccess it.
+        new_frame = self.__processFrame(msg_pack_frame, store=store_data)
+
+        # Add new frame to internal storage (so it can be reused, without reading from disk)
+        # numpy frames are already written into the frame store by __processFrame
+        if store_data and not self.__options_dict["as_numpy"]:
+            self.__data.append(new_frame)
+        return new_frame
+
+
+    def __getPlayerState(self):
+        """
+            Get (a copy of) the player-mapping state, needed to resume __processFrame
+            :return: [player_mapping, free_player_positions]
+        """
+        return self.__player_tracker.getState()
+
+
+    def __getPrefetcher(self):
+        """
+            Get the prefetch thread of the iterator (started on first use)
+            :return: Prefetcher
+        """
+        if self.__prefetcher is None:
+            self.__prefetcher = Prefetcher(self.__decodeNextFrame, queue_size=self.__options_dict["prefetch"],
+                                           batch_size=self.__options_dict["prefetch_batch"], lock=self.__reader_lock)
+        return self.__prefetcher
+
+
     def __getPTZPosition(self):
         """
-            Get ptz-position for in header
+            Get ptz-position for in header (through the header resolver, cached per hostname and date)
             :return: ptz-position or default ptz-position
         """
-        try:
-            import requests
-            get_response = requests.get("http://{}.vpn:9999/world/moduleCam1".format(self.header["hostname"]), timeout=2).json()["response"]
-
-            post_response = requests.post("http://localhost:9999/command/world/moduleCam1", json={"calibrate": get_response["calibrate"]}, timeout=2).json()["response"]
-            return post_response["calibrate"]["position"]
-        except Exception as e:
-            self.warning(e)
-            return [0.0, -37.5, 10.0]
+        return self.__header_resolver.getPTZPosition(self.header["hostname"], self.header["startDateTime"],
+                                                     warning=self.warning)
 
 
     def __getStartDateTime(self):
@@ -594,107 +1392,297 @@ class MsgPackWrapper(object):
             Get startTime from input_file_name
             :return: start_time (integer format)
         """
-        input_file_name_without_path = os.path.split(self.__input_file_name)[-1]
+        if self.__start_date_time is not None:
+            return self.__start_date_time
+        input_file_name_without_path = os.path.split(self.__input_file_name or "")[-1]
         # We assume that the first 24 characters contain a timestamp
         time_stamp_in_file_name = input_file_name_without_path[:24]
         try:
             return int(time.mktime(time.strptime(time_stamp_in_file_name, "%Y_%m_%d-%H.%M.%S.%f")))
         except Exception as e:
-            self.warning(unicode(e))
+            self.warning("%s", e)
             return 0
 
 
-    def __nextFreePlayerPosition(self):
+    def __getTimeStampIndex(self):
+        """
+            Get the sorted timestamps of all loaded msg-pack-frames (rebuilt when new frames have been loaded)
+            :return: sorted timestamps, order of frames (None if frames are already sorted)
+        """
+        if self.__time_stamp_index is None or self.__time_stamp_index[0] != len(self.__msg_pack_time_stamps):
+            time_stamps = np.array(self.__msg_pack_time_stamps, dtype=np.float64)
+            order = None
+            if np.any(np.diff(time_stamps) < 0):
+                order = np.argsort(time_stamps, kind="mergesort")
+                time_stamps = time_stamps[order]
+            self.__time_stamp_index = (len(self.__msg_pack_time_stamps), time_stamps, order)
+        return self.__time_stamp_index[1:]
+
+
+    def __getWindows(self, data, window_length, stride):
+        """
+            Get windows of consecutive rows as a strided (read-only) view
+            :param data: 2-D array
+            :param window_length: Number of rows per window
+            :param stride: Number of rows between the first rows of two windows
+            :return: 3-D array [window, row, column]
+        """
+        num_windows = (len(data) - window_length) // stride + 1 if len(data) >= window_length else 0
+        return np.lib.stride_tricks.as_strided(data, shape=(num_windows, window_length) + data.shape[1:],
+                                               strides=(data.strides[0] * stride,) + data.strides, writeable=False)
+
+
+    def __loadFrames(self, num_frames):
+        """
+            Load frames with the iterator until num_frames are in internal storage
+            :param num_frames: Number of frames needed
+            :return: None
+        """
+        if not self.__options_dict["retain_data"]:
+            self.error("Frames are not retained (retain_data option)")
+        try:
+            while len(self) < num_frames:
+                self.next()
+        except StopIteration:
+            raise IndexError("Frame {} not in {}".format(num_frames - 1, self.__input_file_name))
+
+
+    def __pack(self, msg_pack_frame):
         """
-            Wrapper function to shield the list with free array indices
-            :return: index of empty array spot
+            Pack msg-pack-frame (or header/footer) for output
+            :param msg_pack_frame: msg-pack-frame
+            :return: packed data
         """
-        return_value = self.__free_player_positions.pop(0)
-        return return_value
+        if self.__precision_errors is not None and self.__options_dict["single_float"]:
+            floats = np.array(self.__getFloats(msg_pack_frame), dtype=np.float64)
+            self.__addPrecisionError("output", floats, floats.astype(np.float32))
+        if self.__stats is None:
+            return self.__output_packer.pack(msg_pack_frame)
+        measurement = self.__startMeasurement()
+        packed_data = self.__output_packer.pack(msg_pack_frame)
+        self.__stopMeasurement("pack", measurement)
+        return packed_data
+
+
+    def __openInput(self):
+        """
+            Open the input (again, for random access): the file or the data in memory. A stream is read only once
+            :return: opened (binary) input file
+        """
+        if self.__input_data is not None:
+            return io.BytesIO(self.__input_data)
+        if self.__input_stream is not None:
+            self.error("A stream input can only be read once, in order (random access needs a file or data in memory)")
+        return open(self.__input_file_name, "rb")
+
 
+    def __passThroughRawFrames(self):
+        """
+            Write the remaining msg-pack-frames as raw bytes (fast_repair option). Frames are only inspected, not
+            decoded: the timestamp value is replaced in the raw bytes and everything else is copied. Once a frame needs
+            more fixes (legacy players) the frames are decoded, fixed and packed again
+            :return: Number of frames written
+        """
+        # The unpacker reads ahead, so the lz4 input is moved back to the first frame it has not returned yet
+        if isinstance(self.lz4_file, Lz4FrameReader):
+            self.lz4_file.seek(self.unpacker.tell())
+        else:
+            frame_index = self.__frame_index
+            if frame_index is None:
+                frame_index = FrameIndex()
+                frame_index.setInputFile(self.__getInputPath(), self.lz4_file)
+            frame_index.seekLz4File(self.lz4_file, self.unpacker.tell())
+        raw_reader = RawFrameReader(self.lz4_file if self.__stats is None else TimedReader(self.lz4_file, self.__stats))
+
+        frame_count = 0
+        # A recording is written by one virtcam version: after the first legacy frame all frames are decoded directly
+        decode_frames = False
+        while True:
+            measurement = self.__startMeasurement() if self.__stats is not None else None
+            try:
+                if decode_frames:
+                    msg_pack_frame = raw_reader.unpack()
+                else:
+                    raw_frame, time_stamp, time_stamp_span, decode_frames, footer = raw_reader.next()
+                    msg_pack_frame = None
+            except EOFError:
+                break
+            if measurement is not None:
+                self.__stopMeasurement("unpack", measurement)
+            if msg_pack_frame is None and (footer or decode_frames or time_stamp_span is None):
+                msg_pack_frame = msgpack.unpackb(raw_frame, use_list=False)
+            if msg_pack_frame is not None and "endLogTime" in msg_pack_frame:
+                # Footer is the last msg-pack-frame (files with concatenated selections continue with the next one)
+                self.footer = msg_pack_frame
+                if self.__options_dict["follow"]:
+                    break
+                continue
+            if msg_pack_frame is not None and "maxPlayers" in msg_pack_frame:
+                # Header of the next selection
+                self.__checkSelectionHeader(msg_pack_frame)
+                continue
 
-    def __processFrame(self, input_frame):
+            if msg_pack_frame is not None:
+                self.__output_writer.write(self.__pack(self.__fixMsgPackFrame(msg_pack_frame)))
+            else:
+                if self.__first_frame_timestamp is None:
+                    self.__first_frame_timestamp = time_stamp
+                if time_stamp >= self.__first_frame_timestamp:
+                    begin, end = time_stamp_span
+                    raw_frame = b"".join((raw_frame[:begin], self.__pack(time_stamp - self.__first_frame_timestamp),
+                                          raw_frame[end:]))
+                else:
+                    self.info("%s %s", time_stamp, self.__first_frame_timestamp)
+                self.__output_writer.write(raw_frame)
+            frame_count += 1
+        return frame_count
+
+
+    def __processFrame(self, input_frame, store=True):
         """
             Convert msg-pack frame to list/array for fast proccessing
             :param input_frame: msg-pack frame
+            :param store: Write numpy frame into internal storage
             :return: list/array
         """
         if input_frame is None:
             return
+        measurement = self.__startMeasurement() if self.__stats is not None else None
 
-        # Create empty array/list
+        # Create empty array/list (numpy rows are written straight into the frame store)
         if self.__options_dict["as_numpy"]:
-            return_frame = np.zeros(((self.__max_players * 3) + 4))
+            if store:
+                return_frame = self.__data.newRow()
+            else:
+                return_frame = np.zeros(((self.__max_players * 3) + 4), self.__options_dict["dtype"])
         else:
             return_frame = [0] * ((self.__max_players * 3) + 4)
 
 
-        # Remove players from previous frame that were deleted in virtcam
-        for remove_index in input_frame["playersRemovedIndices"]:
-            if remove_index == -1:  # Special index to remove all
-                raise Exception("remove all")
-            elif remove_index >= (self.__max_players - len(self.__free_player_positions) - 1):
-                # We don't care about players that were removed that only existed in current frame
-                continue
-            else:
-                # Release mapping for current player
-                self.__freePlayer(self.__player_mapping.pop(remove_index)[0])
-
-        # Extract data for players
-        for player_idx, player in enumerate(input_frame["players"]):
-            if player_idx == len(self.__player_mapping):  # No mapping for this player exist -> create it
-                self.__player_mapping.append([self.__nextFreePlayerPosition(), 0])
-            elif player_idx > len(self.__player_mapping):  # This can only happen when a player is skipped...
-                raise Exception("This should not be happening more players are in mapping")
-
-            # Get mapping
-            player_mapping_idx, life = self.__player_mapping[player_idx]
+        # Remove deleted players and create mappings for new players
+        self.__updatePlayerMapping(input_frame["playersRemovedIndices"], len(input_frame["players"]))
 
-            # Increase life
-            self.__player_mapping[player_idx][1] = life + 1
+        # Get mapping and increase life. Either a player should have a minimal life (life > min_life) or we don't
+        # care how old a player is
+        players = input_frame["players"]
+        player_slots, players_alive = self.__player_tracker.age(
+            len(players), None if self.__options_dict["all_life_matters"] else self.__options_dict["min_life"])
+        if self.__log_info:
+            for player in players:
+                self.info("%s", player)
 
-            # Either a player should have a minimal life (life > min_life) or we don't care how old a player is
-            self.info(player)
-            if life > self.__options_dict["min_life"] or self.__options_dict["all_life_matters"]:
-                return_frame[player_mapping_idx * 3 + 0] = player["normPosition"][0]
-                return_frame[player_mapping_idx * 3 + 1] = player["normPosition"][1]
-                return_frame[player_mapping_idx * 3 + 1] = player["weight"]
+        # Extract data for players
+        if self.__options_dict["as_numpy"]:
+            if players_alive.any():
+                player_data = np.array([(player["normPosition"][0], player["normPosition"][1], player["weight"])
+                                        for player in players])
+                return_frame[:self.__max_players * 3].reshape(self.__max_players, 3)[player_slots[players_alive]] = \
+                    player_data[players_alive]
+                if self.__precision_errors is not None:
+                    self.__addPrecisionError("data", player_data[players_alive], return_frame[:self.__max_players * 3]
+                                             .reshape(self.__max_players, 3)[player_slots[players_alive]])
+        else:
+            for player_idx in np.flatnonzero(players_alive):
+                player = players[player_idx]
+                player_slot = player_slots[player_idx]
+                return_frame[player_slot * 3 + 0] = player["normPosition"][0]
+                return_frame[player_slot * 3 + 1] = player["normPosition"][1]
+                return_frame[player_slot * 3 + 2] = player["weight"]
 
 
         # Extract ball/ballLine data (currently only main ballLine or first ball)
         if "ballLines" in input_frame:
-            return_frame[self.__max_players * 2] = input_frame["ballLines"][input_frame["mainBall"]][0]
-            return_frame[self.__max_players * 2 + 1] = input_frame["ballLines"][input_frame["mainBall"]][1]
-            return_frame[-1] = input_frame["timeStamp"]
+            ball_values = input_frame["ballLines"][input_frame["mainBall"]][:2]
         else:
-            return_frame[self.__max_players * 2] = input_frame["balls"][0][0]
-            return_frame[self.__max_players * 2 + 1] = input_frame["balls"][0][1]
-            return_frame[self.__max_players * 2 + 2] = input_frame["balls"][0][3]
-            return_frame[-1] = input_frame["timeStamp"]
-
+            ball_values = (input_frame["balls"][0][0], input_frame["balls"][0][1], input_frame["balls"][0][3])
+        ball_index = self.__max_players * 3
+        return_frame[ball_index:ball_index + len(ball_values)] = ball_values
+        return_frame[-1] = input_frame["timeStamp"]
+        if self.__precision_errors is not None and self.__options_dict["as_numpy"]:
+            self.__addPrecisionError("data", ball_values, return_frame[ball_index:ball_index + len(ball_values)])
+            self.__addPrecisionError("timeStamp", input_frame["timeStamp"], return_frame[-1])
+
+        if measurement is not None:
+            self.__stopMeasurement("process", measurement)
         return return_frame
 
 
+    def __getReaderState(self):
+        """
+            Get the state of the sequential reader (so it can be restored after reading somewhere else)
+            :return: reader state
+        """
+        return (self.__input_file, self.lz4_file, self.unpacker, self.footer, self.done,
+                self.__player_tracker, self.__first_frame_timestamp)
+
+
     def __getSelection(self, from_timestamp=None, to_timestamp=None):
-        from_timestamp_with_offset = self.__determineTimestampOffset(from_timestamp)
-        to_timestamp_with_offset = self.__determineTimestampOffset(to_timestamp)
+        begins, ends = self.__getFrameRanges(from_timestamps=[from_timestamp], to_timestamps=[to_timestamp])
+        _, order = self.__getFrameTimeStamps()
 
-        if isinstance(self.__data, list):
-            temp_data = np.vstack(self.__data)
-        else:
-            temp_data = np.copy(self.__data)
+        if order is None:
+            return (np.arange(begins[0], ends[0]),)
+        return (np.sort(order[begins[0]:ends[0]]),)
 
-        if from_timestamp is not None and to_timestamp is not None:
-            select = np.where((temp_data[:, -1] > from_timestamp_with_offset) &
-                              (temp_data[:, -1] < to_timestamp_with_offset))
-        elif from_timestamp is not None:  # only a beginning
-            select = np.where((temp_data[:, -1] > from_timestamp_with_offset))
-        elif to_timestamp is not None:  # only an end
-            select = np.where((temp_data[:, -1] < to_timestamp_with_offset))
-        else:  # No selection given -> return all
-            select = (range(len(self)),)
 
-        return select
+    def __readFrames(self, ordinals):
+        """
+            Decode frames (without storing them) starting at the nearest checkpoint of the frame index
+            :param ordinals: frame ordinals
+            :return: list of data-lines
+        """
+        frame_index = self.__getFrameIndex()
+        frames = {}
+        # The prefetch thread must not use the reader while it is replaced
+        self.__reader_lock.acquire()
+        reader_state = self.__getReaderState()
+        input_file = self.__openInput()
+        try:
+            self.__input_file = input_file
+            self.lz4_file = None
+            current_frame = None
+            frame = None
+            for ordinal in sorted(set(ordinals)):
+                if ordinal < 0 or ordinal >= len(frame_index):
+                    raise IndexError("Frame {} not in {}".format(ordinal, self.__input_file_name))
+                if ordinal < len(self.__data):
+                    frames[ordinal] = self.__data[ordinal]
+                    continue
+
+                # Jump to checkpoint when it is closer than the current position
+                checkpoint = frame_index.getCheckpoint(ordinal)
+                if current_frame is None or current_frame > ordinal or checkpoint["frame"] > current_frame:
+                    if self.lz4_file is None:
+                        self.lz4_file = frame_index.openLz4File(input_file)
+                    frame_index.seekLz4File(self.lz4_file, checkpoint["offset"])
+                    self.unpacker = self.__createUnpacker()
+                    self.__setPlayerState(checkpoint["playerState"])
+                    self.__first_frame_timestamp = checkpoint["firstFrameTimeStamp"]
+                    current_frame = checkpoint["frame"]
+
+                while current_frame <= ordinal:
+                    msg_pack_frame = self.__getNextSelectedMsgPackFrame(save_data=False)
+                    frame = self.__processFrame(msg_pack_frame, store=False)
+                    current_frame += 1
+                frames[ordinal] = frame
+        except EOFError:
+            raise IndexError("Unexpected end of {}".format(self.__input_file_name))
+        finally:
+            input_file.close()
+            self.__setReaderState(reader_state)
+            self.__reader_lock.release()
+        return [frames[ordinal] for ordinal in ordinals]
+
+
+    def __saveMsgPackFrame(self, msg_pack_frame):
+        """
+            Save a msg-pack-frame in internal storage (when msg-pack-frames are retained)
+            :param msg_pack_frame: msg-pack-frame (fixed)
+            :return: None
+        """
+        if self.__options_dict["retain_msg_pack_data"]:
+            self.__msg_pack_data.append(msg_pack_frame)
+            self.__msg_pack_time_stamps.append(msg_pack_frame["timeStamp"])
 
 
     def __selectData(self, from_timestamp=None, to_timestamp=None):
@@ -715,19 +1703,170 @@ class MsgPackWrapper(object):
             :param frame: Frame to save timestamp from
             :return: None
         """
-        if self.__first_frame_timestamp is not None and self.__debug_level:
+        if self.__first_frame_timestamp is not None:
             self.warning("Warning overwriting first frame")
         self.__first_frame_timestamp = frame["timeStamp"]
 
 
+    def __setPlayerState(self, player_state):
+        """
+            Restore the player-mapping state (see __getPlayerState)
+            :param player_state: [player_mapping, free_player_positions]
+            :return: None
+        """
+        self.__player_tracker = PlayerTracker.fromState(self.__max_players, player_state)
+
+
+    def __setReaderState(self, reader_state):
+        """
+            Restore the state of the sequential reader (see __getReaderState)
+            :param reader_state: reader state
+            :return: None
+        """
+        (self.__input_file, self.lz4_file, self.unpacker, self.footer, self.done,
+         self.__player_tracker, self.__first_frame_timestamp) = reader_state
+
+
+    def __stopPrefetching(self):
+        """
+            Stop the prefetch thread (frames that were prefetched but not returned yet are lost)
+            :return: None
+        """
+        if self.__prefetcher is not None:
+            self.__prefetcher.stop()
+            self.__prefetcher = None
+
+
+    def __skipMsgPackFrame(self):
+        """
+            Skip the next msg-pack-frame without decoding it completely. Players and balls are skipped in the stream,
+            only the small values (playersRemovedIndices, timeStamp, ...) are unpacked to keep the player mapping correct
+            :return: None
+        """
+        measurement = self.__startMeasurement() if self.__stats is not None else None
+        msg_pack_frame = {}
+        num_players = 0
+        try:
+            for _ in range(self.unpacker.read_map_header()):
+                key = self.unpacker.unpack()
+                if key == "players":
+                    num_players = self.unpacker.read_array_header()
+                    for _ in range(num_players):
+                        self.unpacker.skip()
+                elif key in ("ballLines", "ballLineValues", "balls"):
+                    self.unpacker.skip()
+                else:
+                    msg_pack_frame[key] = self.unpacker.unpack()
+        except msgpack.OutOfData:
+            raise EOFError("Unexpected end of msg-pack data")
+        if measurement is not None:
+            self.__stopMeasurement("unpack", measurement)
+
+        if "endLogTime" in msg_pack_frame:
+            # Footer is the last msg-pack-frame (files with concatenated selections continue with the next one)
+            self.footer = msg_pack_frame
+            self.__checkFollowedFooter()
+            return self.__skipMsgPackFrame()
+        if "maxPlayers" in msg_pack_frame:
+            # Header of the next selection
+            self.__checkSelectionHeader(msg_pack_frame)
+            return self.__skipMsgPackFrame()
+        if self.__first_frame_timestamp is None:
+            self.__setFirstFrameTimeStamp(msg_pack_frame)
+        self.__updatePlayerMapping(msg_pack_frame["playersRemovedIndices"], num_players)
+
+
+    def __startMeasurement(self):
+        """
+            Start measuring a stage (collect_stats option)
+            :return: measurement --> __stopMeasurement
+        """
+        return timer(), self.__stats.seconds["decompress"]
+
+
+    def __stopMeasurement(self, stage, measurement, count=1):
+        """
+            Add the time since __startMeasurement to a stage. Decompression triggered in between (by the unpacker
+            reading from the lz4 input) is not counted twice
+            :param stage: Name of stage
+            :param measurement: Result of __startMeasurement
+            :param count: Number of items handled
+            :return: None
+        """
+        begin, decompress_seconds = measurement
+        self.__stats.add(stage, timer() - begin - (self.__stats.seconds["decompress"] - decompress_seconds), count)
+
+
+    def __updatePlayerMapping(self, players_removed_indices, num_players):
+        """
+            Release mappings of players that were deleted in virtcam and create mappings for new players
+            :param players_removed_indices: playersRemovedIndices of frame
+            :param num_players: Number of players in frame
+            :return: None
+        """
+        self.__player_tracker.update(players_removed_indices, num_players)
+
+
+    def __writeMsgPackSelections(self, output_file_name=None, selections=()):
+        """
+            Write selections of msg-pack-frames to the output file, every selection as its own lz4-frame
+            :param output_file_name: Optional output file name
+            :param selections: list of index arrays (from __getMsgPackSelection)
+            :return: None
+        """
+        if not self.__options_dict["retain_msg_pack_data"]:
+            self.error("msg-pack-frames are not retained (retain_msg_pack_data option)")
+        # Determine output-filename
+        if output_file_name is None:
+            if self.__input_file_name is None:
+                self.error("No input file name to derive the output file name from")
+            output_file_name = self.__input_file_name.replace(".lz4", "-selection.lz4")
+
+        # If no output file -> open it
+        if self.__output_writer is None:
+            self.openOutputFile(output_file_name=output_file_name)
+
+        packed_header = self.__pack(self.header)
+        packed_footer = self.__pack(self.footer) if self.footer is not None else None
+
+        # Frames that are part of more than one selection are only packed once
+        shared = None
+        if len(selections) > 1:
+            shared = np.bincount(np.concatenate(selections).astype(np.intp)) > 1
+        packed_frames = {}
+
+        for selection in selections:
+            # Write msg-pack-header
+            self.__output_writer.write(packed_header)
+
+            # Write all frames within selection
+            for frame_idx in selection:
+                if shared is not None and shared[frame_idx]:
+                    if frame_idx not in packed_frames:
+                        packed_frames[frame_idx] = self.__pack(self.__msg_pack_data[frame_idx])
+                    self.__output_writer.write(packed_frames[frame_idx])
+                else:
+                    self.__output_writer.write(self.__pack(self.__msg_pack_data[frame_idx]))
+
+            # If it exists: write footer
+            if packed_footer is not None:
+                self.__output_writer.write(packed_footer)
+
+            # Every selection is stored as its own lz4-frame
+            self.__output_writer.endFrame()
+
+
     @property
     def all_data(self):
         """
             Wrapper for internal data.
             :return: list/numpy-arrays
         """
-        if self.__options_dict["as_numpy"] and isinstance(self.__data, list):
-            return np.vstack(self.__data)
+        if isinstance(self.__data, FrameStore):
+            return self.__data.view
+        elif isinstance(self.__data, MsgPackStore):
+            # Spilled frames are read back from the spill file
+            return list(self.__data)
         else:
             return self.__data
 
@@ -0,0 +1,112 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+from collections import deque
+import numpy as np
+
+__author__ = 'jleuven'
+
+
+class PlayerTracker(object):
+    """
+        Maps virtcam players (index in the players list of a frame) to fixed slots in the output data and keeps track
+        of their life (number of frames seen). Mapping and life are stored in numpy arrays, free slots in a deque
+        (freed slots are reused first-in first-out)
+    """
+
+    def __init__(self, max_players):
+        """
+            Constructor
+            :param max_players: Number of slots (maxPlayers from header)
+        """
+        self.max_players = max_players
+        self.__slots = np.zeros(max_players, dtype=np.intp)
+        self.__lives = np.zeros(max_players, dtype=np.int64)
+        self.__num_players = 0
+        self.__free_slots = deque(range(max_players))
+
+
+    @classmethod
+    def fromState(cls, max_players, state):
+        """
+            Create tracker from a state (see getState)
+            :param max_players: Number of slots
+            :param state: [[[slot, life], ...], free_slots]
+            :return: PlayerTracker
+        """
+        player_tracker = cls(max_players)
+        player_tracker.setState(state)
+        return player_tracker
+
+
+    def __len__(self):
+        return self.__num_players
+
+
+    def update(self, players_removed_indices, num_players):
+        """
+            Release slots of players that were deleted in virtcam and assign slots to new players
+            :param players_removed_indices: playersRemovedIndices of frame
+            :param num_players: Number of players in frame
+            :return: None
+        """
+        # Remove players from previous frame that were deleted in virtcam
+        for remove_index in players_removed_indices:
+            if remove_index == -1:  # Special index to remove all
+                raise Exception("remove all")
+            elif remove_index >= self.__num_players - 1:
+                # We don't care about players that were removed that only existed in current frame
+                continue
+            else:
+                # Release slot and shift the players after it
+                self.__free_slots.append(int(self.__slots[remove_index]))
+                self.__slots[remove_index:self.__num_players - 1] = self.__slots[remove_index + 1:self.__num_players]
+                self.__lives[remove_index:self.__num_players - 1] = self.__lives[remove_index + 1:self.__num_players]
+                self.__num_players -= 1
+
+        # No mapping for these players exist -> create it
+        if num_players > self.__num_players:
+            if num_players - self.__num_players > len(self.__free_slots):
+                raise Exception("More players than maxPlayers ({})".format(self.max_players))
+            for player_idx in range(self.__num_players, num_players):
+                self.__slots[player_idx] = self.__free_slots.popleft()
+                self.__lives[player_idx] = 0
+            self.__num_players = num_players
+
+
+    def age(self, num_players, min_life=None):
+        """
+            Increase life of the players in a frame
+            :param num_players: Number of players in frame
+            :param min_life: minimal life-threshold (None: all players count)
+            :return: slots of players, mask of players that lived longer than min_life (before this frame)
+        """
+        lives = self.__lives[:num_players]
+        if min_life is None:
+            alive = np.ones(num_players, dtype=bool)
+        else:
+            alive = lives > min_life
+        lives += 1
+        return self.__slots[:num_players], alive
+
+
+    def getState(self):
+        """
+            Get state (plain lists, so it can be stored)
+            :return: [[[slot, life], ...], free_slots]
+        """
+        return [[[int(slot), int(life)] for slot, life in zip(self.__slots[:self.__num_players],
+                                                               self.__lives[:self.__num_players])],
+                list(self.__free_slots)]
+
+
+    def setState(self, state):
+        """
+            Restore state (see getState)
+            :param state: [[[slot, life], ...], free_slots]
+            :return: None
+        """
+        player_mapping, free_slots = state
+        self.__num_players = len(player_mapping)
+        for player_idx, (slot, life) in enumerate(player_mapping):
+            self.__slots[player_idx] = slot
+            self.__lives[player_idx] = life
+        self.__free_slots = deque(free_slots)
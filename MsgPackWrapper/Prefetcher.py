@@ -0,0 +1,105 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+from collections import deque
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+__author__ = 'jleuven'
+
+
+class Prefetcher(object):
+    """
+        Runs a produce function in a background thread and collects the results in a bounded queue, so producing the
+        next items overlaps with the work of the consumer. Results are passed in batches to keep the queue overhead
+        low. EOFError of the produce function ends the stream, other exceptions are raised again in the consumer.
+    """
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, produce, queue_size=256, batch_size=16, lock=None):
+        """
+            Constructor (starts the thread)
+            :param produce: Function without arguments that returns the next item (raises EOFError at the end)
+            :param queue_size: Maximum number of items waiting for the consumer (rounded up to whole batches)
+            :param batch_size: Number of items per batch
+            :param lock: Lock held while producing a batch (hold it to use the producer's state from another thread)
+        """
+        self.__produce = produce
+        self.__batch_size = max(1, batch_size)
+        self.__lock = lock if lock is not None else threading.Lock()
+        self.__queue = queue.Queue(maxsize=max(1, -(-queue_size // self.__batch_size)))
+        self.__items = deque()
+        self.__stop = threading.Event()
+        self.__finished = False
+        self.__exception = EOFError("Prefetcher stopped")
+        self.__thread = threading.Thread(target=self.__run, name="MsgPackWrapper-prefetch")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+
+    def get(self):
+        """
+            Get the next item
+            :return: item (raises EOFError at the end of the stream)
+        """
+        while not self.__items:
+            if self.__finished:
+                raise self.__exception
+            batch, exception = self.__queue.get()
+            self.__items.extend(batch)
+            if exception is not None:
+                # Items produced before the exception are returned first
+                self.__finished = True
+                self.__exception = exception
+        return self.__items.popleft()
+
+
+    def stop(self):
+        """
+            Stop the thread (items that were not consumed yet are dropped)
+            :return: None
+        """
+        self.__stop.set()
+        while self.__thread.is_alive():
+            try:
+                self.__queue.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        self.__thread.join()
+        self.__items.clear()
+        self.__finished = True
+
+
+    def __put(self, batch, exception=None):
+        """
+            Put a batch in the queue (waits for room, unless the prefetcher is stopped)
+            :param batch: list of items
+            :param exception: Exception that ended the stream (None: more items follow)
+            :return: Boolean: batch was queued
+        """
+        while not self.__stop.is_set():
+            try:
+                self.__queue.put((batch, exception), timeout=self.POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+
+    def __run(self):
+        """
+            Thread function
+            :return: None
+        """
+        while not self.__stop.is_set():
+            batch = []
+            exception = None
+            with self.__lock:
+                try:
+                    while len(batch) < self.__batch_size:
+                        batch.append(self.__produce())
+                except Exception as e:
+                    exception = e
+            if not self.__put(batch, exception) or exception is not None:
+                return
@@ -0,0 +1,108 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import msgpack
+
+__author__ = 'jleuven'
+
+# First bytes of msg-pack arrays (fixarray, array 16, array 32)
+ARRAY_TYPES = frozenset(list(range(0x90, 0xa0)) + [0xdc, 0xdd])
+# Size of the array header (fixarray: 1)
+ARRAY_HEADER_SIZES = {0xdc: 3, 0xdd: 5}
+
+
+class RawFrameReader(object):
+    """
+        Reads msg-pack-frames from a decompressed stream as raw bytes. Frames are not decoded: only the keys, the
+        timestamp and the type of the first player are inspected, everything else is skipped by the unpacker. This is
+        enough to decide whether a frame can be copied as it is (apart from its timestamp). Frames that need fixes can
+        be decoded with unpack instead.
+    """
+
+    def __init__(self, input_file, stream_offset=0, read_size=1 << 20):
+        """
+            Constructor
+            :param input_file: file-like object with the msg-pack stream (read() raises EOFError at the end, like Lz4File)
+            :param stream_offset: Offset of input_file in the stream (only used for the returned offsets)
+            :param read_size: Number of bytes to read at once
+        """
+        self.input_file = input_file
+        self.stream_offset = stream_offset
+        self.__unpacker = msgpack.Unpacker(self, use_list=False, read_size=read_size)
+        self.__buffer = bytearray()
+        self.__buffer_offset = 0  # unpacker offset of the first byte in __buffer
+
+
+    def read(self, size=None):
+        """
+            read() for the unpacker: keeps a copy of the data, so frames can be returned as raw bytes
+        """
+        data = self.input_file.read(size)
+        self.__buffer.extend(data)
+        return data
+
+
+    def next(self):
+        """
+            Read the next frame
+            :return: (raw frame, timestamp, (begin, end) of the timestamp in raw frame, legacy players, footer)
+                     (raises EOFError at the end of the stream)
+        """
+        try:
+            begin = self.__unpacker.tell()
+            time_stamp = time_stamp_span = None
+            legacy_players = footer = False
+            for _ in range(self.__unpacker.read_map_header()):
+                key = self.__unpacker.unpack()
+                if key == "timeStamp":
+                    value_begin = self.__unpacker.tell()
+                    time_stamp = self.__unpacker.unpack()
+                    time_stamp_span = (value_begin - begin, self.__unpacker.tell() - begin)
+                elif key == "players":
+                    value_begin = self.__unpacker.tell()
+                    self.__unpacker.skip()
+                    # Old virtcam versions stored players as [x, y] instead of a map: check the first player
+                    array_type = self.__buffer[value_begin - self.__buffer_offset]
+                    first_player = value_begin + ARRAY_HEADER_SIZES.get(array_type, 1)
+                    if first_player < self.__unpacker.tell():
+                        legacy_players = self.__buffer[first_player - self.__buffer_offset] in ARRAY_TYPES
+                else:
+                    if key == "endLogTime":
+                        footer = True
+                    self.__unpacker.skip()
+            end = self.__unpacker.tell()
+        except (msgpack.OutOfData, StopIteration):
+            raise EOFError("End of msg-pack stream")
+
+        raw_frame = bytes(self.__buffer[begin - self.__buffer_offset:end - self.__buffer_offset])
+        self.__releaseBuffer(end)
+        return raw_frame, time_stamp, time_stamp_span, legacy_players, footer
+
+
+    def unpack(self):
+        """
+            Read and decode the next frame
+            :return: msg-pack-frame (raises EOFError at the end of the stream)
+        """
+        try:
+            msg_pack_frame = self.__unpacker.unpack()
+        except (msgpack.OutOfData, StopIteration):
+            raise EOFError("End of msg-pack stream")
+        self.__releaseBuffer(self.__unpacker.tell())
+        return msg_pack_frame
+
+
+    def __releaseBuffer(self, end):
+        """
+            Drop the data before 'end' now and then (not after every frame, that would move the buffer every time)
+            :param end: unpacker offset of the end of the returned frame
+            :return: None
+        """
+        if end - self.__buffer_offset > len(self.__buffer) // 2:
+            del self.__buffer[:end - self.__buffer_offset]
+            self.__buffer_offset = end
+
+
+    def tell(self):
+        """
+            :return: Offset of the next frame in the stream
+        """
+        return self.stream_offset + self.__unpacker.tell()
@@ -0,0 +1,73 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import time
+
+__author__ = 'jleuven'
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+class StageStats(object):
+    """
+        Accumulates time and counts per stage of the decode/encode pipeline:
+            decompress  lz4 decompression of the input (bytes)
+            unpack      msg-pack decoding (frames, without the decompression it triggers)
+            fix         header/frame fixes (frames)
+            process     conversion to list/array (frames)
+            pack        msg-pack encoding of output (frames)
+            compress    lz4 compression of output (bytes)
+    """
+    STAGES = ("decompress", "unpack", "fix", "process", "pack", "compress")
+
+    def __init__(self):
+        self.seconds = self.counts = None
+        self.reset()
+
+
+    def reset(self):
+        """
+            Clear all counters
+            :return: None
+        """
+        self.seconds = dict.fromkeys(self.STAGES, 0.0)
+        self.counts = dict.fromkeys(self.STAGES, 0)
+
+
+    def add(self, stage, seconds, count=1):
+        """
+            Add a measurement
+            :param stage: Name of stage
+            :param seconds: Time spent
+            :param count: Number of items (frames/bytes) handled
+            :return: None
+        """
+        self.seconds[stage] += seconds
+        self.counts[stage] += count
+
+
+    def asDict(self):
+        """
+            :return: dict with stage -> {"seconds": ..., "count": ..., "perSecond": ...}
+        """
+        return dict((stage, {"seconds": self.seconds[stage],
+                             "count": self.counts[stage],
+                             "perSecond": self.counts[stage] / self.seconds[stage] if self.seconds[stage] else None})
+                    for stage in self.STAGES)
+
+
+class TimedReader(object):
+    """
+        File-like wrapper that adds the time spent in read() to a stage (used between Lz4File and the Unpacker to
+        separate decompression from msg-pack decoding)
+    """
+
+    def __init__(self, input_file, stats, stage="decompress"):
+        self.input_file = input_file
+        self.stats = stats
+        self.stage = stage
+
+
+    def read(self, size=None):
+        begin = timer()
+        data = self.input_file.read(size)
+        self.stats.add(self.stage, timer() - begin, len(data))
+        return data
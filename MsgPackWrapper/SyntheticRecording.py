@@ -0,0 +1,134 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import datetime
+import msgpack
+import numpy as np
+import lz4f
+
+__author__ = 'jleuven'
+
+
+def getRecordingFileName(start_date_time, sequence_number=1, suffix="_PlayerData.lz4"):
+    """
+        File name of a recording in the format virtcam uses (MsgPackWrapper derives begin_time_stamp and startDateTime
+        from it)
+        :param start_date_time: datetime of the start of the recording
+        :param sequence_number: Sequence number of the recording
+        :param suffix: File name suffix
+        :return: file name (without directory)
+    """
+    return "{:%Y_%m_%d-%H.%M.%S}.{:04d}{}".format(start_date_time, sequence_number, suffix)
+
+
+def generateFrames(num_frames=3000, max_players=10, legacy=False, frame_rate=30.0, num_balls=3, seed=0,
+                   first_time_stamp=1000.0):
+    """
+        Generate synthetic msg-pack-frames: players walk randomly over the field, appear and are deleted (with
+        playersRemovedIndices) like in virtcam
+        :param num_frames: Number of frames
+        :param max_players: maxPlayers of the header (the number of players in a frame stays below it)
+        :param legacy: Legacy format (players as [x, y], 'balls' instead of 'ballLines')
+        :param frame_rate: Frames per second
+        :param num_balls: Number of balls/ballLines per frame
+        :param seed: Seed of the random generator (same seed: same frames)
+        :param first_time_stamp: Timestamp of the first frame (virtcam clock, seconds)
+        :return: generator of frames
+    """
+    random_state = np.random.RandomState(seed)
+    positions = np.zeros((0, 2))
+    weights = np.zeros(0)
+    ball_positions = random_state.uniform(-1, 1, (num_balls, 2))
+    for frame_idx in range(num_frames):
+        # Delete a player every now and then, add players until the field is (almost) full
+        players_removed_indices = []
+        if len(positions) and random_state.rand() < 0.05:
+            remove_index = random_state.randint(len(positions))
+            players_removed_indices.append(remove_index)
+            positions = np.delete(positions, remove_index, axis=0)
+            weights = np.delete(weights, remove_index)
+        if len(positions) < max_players - 1 and random_state.rand() < 0.1:
+            positions = np.vstack([positions, random_state.uniform(-1, 1, (1, 2))])
+            weights = np.append(weights, random_state.rand())
+        positions = np.clip(positions + random_state.normal(0, 0.005, positions.shape), -1, 1)
+        weights = np.clip(weights + random_state.normal(0, 0.01, weights.shape), 0, 1)
+        ball_positions = np.clip(ball_positions + random_state.normal(0, 0.02, ball_positions.shape), -1, 1)
+        ball_values = random_state.uniform(0, 5, num_balls)
+
+        frame = {"playersRemovedIndices": players_removed_indices,
+                 "timeStamp": first_time_stamp + frame_idx / frame_rate + random_state.uniform(0, 0.001)}
+        if legacy:
+            frame["players"] = positions.tolist()
+            frame["balls"] = [[x, y, 0.0, value] for (x, y), value in zip(ball_positions.tolist(), ball_values.tolist())]
+        else:
+            frame["players"] = [{"normPosition": position, "weight": weight}
+                                for position, weight in zip(positions.tolist(), weights.tolist())]
+            frame["ballLines"] = ball_positions.tolist()
+            frame["ballLineValues"] = ball_values.tolist()
+            frame["mainBall"] = int(np.argmax(ball_values))
+        yield frame
+
+
+def generateRecording(output_file_name, num_frames=3000, max_players=10, legacy=False, frame_rate=30.0, num_balls=3,
+                      seed=0, hostname="synthetic", start_date_time=None, field_dimensions=(50.0, 30.0),
+                      independent_blocks=False, flush_size=1 << 20, block_size_id=7):
+    """
+        Write a synthetic PlayerData recording (lz4 compressed msg-pack: header, frames, endLogTime footer). The frames
+        are compressed while they are generated, so memory usage does not depend on num_frames
+        :param output_file_name: Name of the output file (use getRecordingFileName for a name MsgPackWrapper understands)
+        :param num_frames: Number of frames
+        :param max_players: maxPlayers of the header
+        :param legacy: Legacy format (no startDateTime/hostname/PTZPosition in header, players as [x, y], 'balls')
+        :param frame_rate: Frames per second
+        :param num_balls: Number of balls/ballLines per frame
+        :param seed: Seed of the random generator
+        :param hostname: hostname of the header
+        :param start_date_time: datetime of the start of the recording (None: taken from the file name)
+        :param field_dimensions: fieldDimensions of the header (half length, half width in meters)
+        :param independent_blocks: Compress with independent lz4-blocks (virtcam uses linked blocks)
+        :param flush_size: Number of packed bytes to collect before they are compressed
+        :param block_size_id: lz4 block size id (4: 64 KB, 5: 256 KB, 6: 1 MB, 7: 4 MB, the lz4f default virtcam uses)
+        :return: Number of uncompressed (msg-pack) bytes
+    """
+    if start_date_time is None:
+        try:
+            start_date_time = datetime.datetime.strptime(os.path.basename(output_file_name)[:19], "%Y_%m_%d-%H.%M.%S")
+        except ValueError:
+            start_date_time = datetime.datetime(2016, 11, 24, 16)
+    start_time = int((start_date_time - datetime.datetime(1970, 1, 1)).total_seconds())
+
+    header = {"maxPlayers": max_players,
+              "fieldDimensions": list(field_dimensions),
+              "playerEstimateLength": 1.8}
+    if not legacy:
+        header.update({"startDateTime": start_time,
+                       "hostname": hostname,
+                       "PTZPosition": [0.0, -37.5, 10.0]})
+    footer = {"endLogTime": start_time + int(num_frames / frame_rate)}
+
+    packer = msgpack.Packer(use_single_float=False, use_bin_type=True)
+    lz4_ctx = lz4f.createCompContext()
+    num_bytes = 0
+    try:
+        with open(output_file_name, "wb") as output_file:
+            output_file.write(lz4f.compressBegin(lz4_ctx, lz4f.makePrefs(blockSizeID=block_size_id,
+                                                                          blockMode=int(independent_blocks))))
+            buffer = [packer.pack(header)]
+            buffer_size = len(buffer[0])
+            frames = generateFrames(num_frames=num_frames, max_players=max_players, legacy=legacy,
+                                    frame_rate=frame_rate, num_balls=num_balls, seed=seed)
+            for frame in frames:
+                buffer.append(packer.pack(frame))
+                buffer_size += len(buffer[-1])
+                if buffer_size >= flush_size:
+                    output_file.write(lz4f.compressUpdate(b"".join(buffer), lz4_ctx))
+                    num_bytes += buffer_size
+                    buffer = []
+                    buffer_size = 0
+            buffer.append(packer.pack(footer))
+            buffer_size += len(buffer[-1])
+            output_file.write(lz4f.compressUpdate(b"".join(buffer), lz4_ctx))
+            num_bytes += buffer_size
+            output_file.write(lz4f.compressEnd(lz4_ctx))
+    finally:
+        lz4f.freeCompContext(lz4_ctx)
+    return num_bytes
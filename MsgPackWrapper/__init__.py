@@ -1,5 +1,50 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 from pprint import pprint
+import sys
+import types
+import logging
+import importlib
 
-from .MsgPackWrapper import MsgPackWrapper
+logging.getLogger(__name__).addHandler(logging.NullHandler())
 __author__ = 'jleuven'
+
+# Public name -> module. The modules are imported on first use, so importing the package (e.g. for the command line
+# tool) does not load numpy/lz4/msgpack
+_LAZY_ATTRIBUTES = {"MsgPackWrapper": ".MsgPackWrapper",
+                    "convertRecordings": ".BatchConverter",
+                    "HeaderResolver": ".HeaderResolver",
+                    "FrameCache": ".FrameCache",
+                    "FrameAggregator": ".FrameAggregator",
+                    "generateRecording": ".SyntheticRecording"}
+__all__ = sorted(_LAZY_ATTRIBUTES)
+
+
+class _LazyPackage(types.ModuleType):
+    """
+        Package module that imports the public names on first access. Most modules have the same name as their class;
+        when such a module is imported, the import system sets the module as attribute of the package, so that
+        attribute is replaced by the class again here
+    """
+
+    def __getattribute__(self, name):
+        try:
+            value = types.ModuleType.__getattribute__(self, name)
+        except AttributeError:
+            if name not in _LAZY_ATTRIBUTES:
+                raise
+            value = None
+        if name in _LAZY_ATTRIBUTES and (value is None or isinstance(value, types.ModuleType)):
+            value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+            setattr(self, name, value)
+        return value
+
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_LAZY_ATTRIBUTES))
+
+
+_package = _LazyPackage(__name__, __doc__)
+_package.__dict__.update(sys.modules[__name__].__dict__)
+# Keep the original module alive: the functions above use its globals (python 2 clears them when it is deleted)
+_package._module = sys.modules[__name__]
+sys.modules[__name__] = _package
@@ -30,6 +30,9 @@ setup(name='MsgPackWrapper',
       packages=find_packages(),
       include_package_data=True,
       install_requires=install_requires,
+      # python-lz4 releases the GIL: compress_threads/decode_threads only run in parallel with it
+      extras_require={"threads": ["lz4"]},
+      entry_points={"console_scripts": ["msgpackwrapper = MsgPackWrapper.CommandLine:main"]},
       zip_safe=False)
 
 # run "python setup.py bdist_wheel" to make .whl file (in dist folder)
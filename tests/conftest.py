@@ -0,0 +1,42 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import datetime
+import pytest
+from MsgPackWrapper import MsgPackWrapper, HeaderResolver, generateRecording
+from MsgPackWrapper.SyntheticRecording import getRecordingFileName
+
+__author__ = 'jleuven'
+
+NUM_FRAMES = 3000
+
+
+@pytest.fixture
+def header_resolver():
+    """
+        Resolver without network or cache file (legacy recordings have no PTZ-position)
+    """
+    return HeaderResolver(cache_file_name="", offline=True)
+
+
+@pytest.fixture(params=[(False, False), (True, False), (False, True)],
+                ids=["current-linked", "legacy-linked", "current-independent"])
+def recording(request, tmpdir):
+    """
+        Synthetic recording (current and legacy format, linked and independent lz4-blocks) with 64 KB lz4-blocks, so
+        the readers have many blocks to split and seek in
+    """
+    legacy, independent_blocks = request.param
+    file_name = str(tmpdir.join(getRecordingFileName(datetime.datetime(2016, 11, 24, 16))))
+    generateRecording(file_name, num_frames=NUM_FRAMES, legacy=legacy, independent_blocks=independent_blocks,
+                      flush_size=1 << 14, block_size_id=4)
+    return file_name
+
+
+@pytest.fixture
+def decode_plain(header_resolver):
+    """
+        Decode all frames with the plain path (Lz4File, no index, threads or prefetch): the reference for the fast paths
+    """
+    def decodePlain(input_file_name, skip_frames=1, **options):
+        return MsgPackWrapper(input_file_name, use_iterator=False, skip_frames=skip_frames, as_numpy=True,
+                              header_resolver=header_resolver, **options)
+    return decodePlain
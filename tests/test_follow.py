@@ -0,0 +1,75 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import threading
+import time
+import numpy as np
+import pytest
+from MsgPackWrapper import MsgPackWrapper
+
+__author__ = 'jleuven'
+
+
+@pytest.fixture
+def growing_recording(recording, tmpdir):
+    """
+        Copy of the recording that is written in chunks by a thread (started by calling the returned function)
+    """
+    with open(recording, "rb") as input_file:
+        data = input_file.read()
+    file_name = str(tmpdir.mkdir("live").join(os.path.basename(recording)))
+    with open(file_name, "wb") as output_file:
+        output_file.write(data[:100])
+    threads = []
+
+    def startWriting(end=len(data), chunk_size=20000):
+        def write():
+            with open(file_name, "ab") as output_file:
+                for begin in range(100, end, chunk_size):
+                    output_file.write(data[begin:min(begin + chunk_size, end)])
+                    output_file.flush()
+                    time.sleep(0.002)
+        threads.append(threading.Thread(target=write))
+        threads[-1].start()
+
+    yield file_name, startWriting
+    for thread in threads:
+        thread.join()
+
+
+def test_follow_reads_until_footer(growing_recording, header_resolver, decode_plain, recording):
+    file_name, startWriting = growing_recording
+    startWriting()
+    wrapper = MsgPackWrapper(file_name, skip_frames=1, as_numpy=True, follow=True, follow_interval=0.01,
+                             header_resolver=header_resolver)
+    frames = np.array([np.array(frame) for frame in wrapper])
+    np.testing.assert_array_equal(frames, decode_plain(recording).all_data)
+    assert wrapper.footer is not None
+
+
+def test_follow_pass_through(growing_recording, header_resolver, decode_plain, recording, tmpdir):
+    file_name, startWriting = growing_recording
+    startWriting()
+    output_file_name = str(tmpdir.join("followed.lz4"))
+    MsgPackWrapper(file_name, output_file_name, pass_through_only=True, follow=True, follow_interval=0.01,
+                   fast_repair=True, header_resolver=header_resolver)
+    np.testing.assert_array_equal(decode_plain(output_file_name).all_data, decode_plain(recording).all_data)
+
+
+def test_follow_timeout_and_stop(growing_recording, header_resolver, decode_plain, recording):
+    # Half of the file is written: no footer, the data ends after the timeout / stopFollowing
+    file_name, startWriting = growing_recording
+    with open(recording, "rb") as input_file:
+        size = len(input_file.read())
+    startWriting(end=size // 2)
+    wrapper = MsgPackWrapper(file_name, skip_frames=1, as_numpy=True, follow=True, follow_interval=0.01,
+                             follow_timeout=0.5, header_resolver=header_resolver)
+    frames = np.array([np.array(frame) for frame in wrapper])
+    reference = decode_plain(recording).all_data
+    assert 0 < len(frames) < len(reference)
+    np.testing.assert_array_equal(frames, reference[:len(frames)])
+    assert wrapper.footer is None
+
+    wrapper = MsgPackWrapper(file_name, skip_frames=1, as_numpy=True, follow=True, follow_interval=0.01,
+                             header_resolver=header_resolver)
+    threading.Timer(0.2, wrapper.stopFollowing).start()
+    assert sum(1 for _ in wrapper) == len(frames)
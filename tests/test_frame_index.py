@@ -0,0 +1,32 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import numpy as np
+import pytest
+from MsgPackWrapper import MsgPackWrapper
+from MsgPackWrapper.FrameIndex import FrameIndex
+
+__author__ = 'jleuven'
+
+
+@pytest.mark.parametrize("skip_frames", [1, 5])
+def test_random_access_matches_plain_decode(recording, header_resolver, decode_plain, skip_frames):
+    reference = decode_plain(recording, skip_frames=skip_frames).all_data
+    wrapper = MsgPackWrapper(recording, skip_frames=skip_frames, as_numpy=True, use_frame_index=True,
+                             header_resolver=header_resolver)
+    assert os.path.isfile(FrameIndex.getFileName(recording))
+    # Backwards, across checkpoints and at the checkpoints themselves (linked blocks are decompressed again)
+    for item in [len(reference) - 1, 3, len(reference) // 2, 1000 // skip_frames, 1000 // skip_frames - 1, 0, -1]:
+        np.testing.assert_array_equal(wrapper[item], reference[item])
+    np.testing.assert_array_equal(wrapper[190:215], reference[190:215])
+
+
+def test_saved_index_is_reused(recording, header_resolver, decode_plain):
+    reference = decode_plain(recording).all_data
+    MsgPackWrapper(recording, skip_frames=1, as_numpy=True, use_frame_index=True, header_resolver=header_resolver)
+    # The second wrapper opens the input with the stored block offsets
+    wrapper = MsgPackWrapper(recording, skip_frames=1, as_numpy=True, use_frame_index=True,
+                             header_resolver=header_resolver)
+    np.testing.assert_array_equal(wrapper[-10:], reference[-10:])
+    np.testing.assert_array_equal(wrapper[1234], reference[1234])
+    time_stamp = reference[2345, -1]
+    np.testing.assert_array_equal(wrapper.getFrameAtTimeStamp(time_stamp), reference[2345])
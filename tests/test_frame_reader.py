@@ -0,0 +1,83 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+from multiprocessing.pool import ThreadPool
+import numpy as np
+import pytest
+from lz4tools import Lz4File
+from MsgPackWrapper import MsgPackWrapper
+from MsgPackWrapper.Lz4FrameReader import Lz4FrameReader
+
+__author__ = 'jleuven'
+
+UNIT_SIZE = 1 << 16
+
+
+def readAll(reader, size=10000):
+    data = []
+    try:
+        while True:
+            data.append(reader.read(size))
+    except EOFError:
+        return b"".join(data)
+
+
+@pytest.fixture
+def pool():
+    pool = ThreadPool(2)
+    yield pool
+    pool.close()
+    pool.join()
+
+
+@pytest.fixture
+def reference(recording):
+    """
+        Decompressed data of the recording (Lz4File drops the last byte, the end of the footer)
+    """
+    with open(recording, "rb") as input_file:
+        data = readAll(Lz4File("input", input_file))
+    with open(recording, "rb") as input_file:
+        complete_data = readAll(Lz4FrameReader(input_file, unit_size=1 << 30))
+    assert complete_data[:-1] == data
+    return complete_data
+
+
+@pytest.mark.parametrize("use_pool", [False, True])
+def test_units_match_reference(recording, reference, pool, use_pool):
+    with open(recording, "rb") as input_file:
+        reader = Lz4FrameReader(input_file, pool=pool if use_pool else None, unit_size=UNIT_SIZE)
+        # Linked blocks are split into units too, so only one unit is decompressed at a time
+        assert len(reader.units) > 1
+        assert all(sum(block_size for _, block_size in unit_blocks) < UNIT_SIZE + (64 << 10) + 8
+                   for _, _, unit_blocks, _, _ in reader.units)
+        assert readAll(reader) == reference
+
+
+def test_seek_matches_reference(recording, reference, pool):
+    with open(recording, "rb") as input_file:
+        reader = Lz4FrameReader(input_file, pool=pool, unit_size=UNIT_SIZE)
+        # Forward, backward within a unit and to the start of the lz4-frame (linked blocks are decompressed again)
+        for offset in [len(reference) // 2, len(reference) - 100, 100, len(reference) // 2 + 10, 0]:
+            reader.seek(offset)
+            assert reader.tell() == offset
+            assert reader.read(1000) == reference[offset:offset + 1000]
+
+
+def test_decode_threads_matches_plain_decode(recording, header_resolver, decode_plain):
+    reference = decode_plain(recording)
+    wrapper = decode_plain(recording, decode_threads=2)
+    np.testing.assert_array_equal(wrapper.all_data, reference.all_data)
+    # The threaded reader does not lose the last byte
+    assert wrapper.footer is not None
+
+
+def test_concatenated_lz4_frames(recording, header_resolver, decode_plain, tmpdir):
+    reference = decode_plain(recording)
+    concatenated_file_name = str(tmpdir.join("concatenated.lz4"))
+    with open(recording, "rb") as input_file:
+        data = input_file.read()
+    with open(concatenated_file_name, "wb") as output_file:
+        output_file.write(data + data)
+    wrapper = decode_plain(concatenated_file_name, decode_threads=2)
+    assert len(wrapper) == 2 * len(reference)
+    np.testing.assert_array_equal(wrapper.all_data[:len(reference)], reference.all_data)
+    np.testing.assert_array_equal(wrapper.all_data[len(reference):, -1], reference.all_data[:, -1])
@@ -0,0 +1,81 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import io
+import msgpack
+import pytest
+from MsgPackWrapper import MsgPackWrapper
+from MsgPackWrapper.Lz4FrameReader import Lz4FrameReader
+from MsgPackWrapper.RawFrameReader import RawFrameReader
+
+__author__ = 'jleuven'
+
+
+def readObjects(file_name):
+    """
+        All msg-pack objects of an lz4 file (header, frames, footer)
+    """
+    objects = []
+    with open(file_name, "rb") as input_file:
+        unpacker = msgpack.Unpacker(Lz4FrameReader(input_file), use_list=False)
+        try:
+            for msg_pack_object in unpacker:
+                objects.append(msg_pack_object)
+        except EOFError:
+            pass
+    return objects
+
+
+def readDecompressed(file_name):
+    with open(file_name, "rb") as input_file:
+        lz4_reader = Lz4FrameReader(input_file)
+        data = []
+        try:
+            while True:
+                data.append(lz4_reader.read())
+        except EOFError:
+            return b"".join(data)
+
+
+@pytest.mark.parametrize("decode_threads", [0, 2])
+def test_fast_repair_matches_decoded_pass_through(recording, header_resolver, tmpdir, decode_threads):
+    output_file_names = []
+    for fast_repair in (False, True):
+        output_file_names.append(str(tmpdir.join("repaired-{}.lz4".format(int(fast_repair)))))
+        MsgPackWrapper(recording, output_file_names[-1], pass_through_only=True, fast_repair=fast_repair,
+                       decode_threads=decode_threads, header_resolver=header_resolver)
+    decoded, raw = [readObjects(output_file_name) for output_file_name in output_file_names]
+    assert len(raw) == len(decoded)
+    assert raw == decoded
+
+
+def test_fast_repair_continues_after_iteration(recording, header_resolver, tmpdir):
+    # The raw reader restarts at the first frame the unpacker has not returned yet
+    output_file_names = []
+    for fast_repair in (False, True):
+        wrapper = MsgPackWrapper(recording, skip_frames=1, fast_repair=fast_repair, header_resolver=header_resolver)
+        for _ in range(1234):
+            next(wrapper)
+        output_file_names.append(str(tmpdir.join("rest-{}.lz4".format(int(fast_repair)))))
+        wrapper.openOutputFile(output_file_names[-1])
+        wrapper.passThrough()
+    decoded, raw = [readObjects(output_file_name) for output_file_name in output_file_names]
+    assert raw == decoded
+
+
+def test_raw_frames_unpack_to_decoded_frames(recording):
+    data = readDecompressed(recording)
+    expected = list(msgpack.Unpacker(io.BytesIO(data), use_list=False))
+    # Small reads: frames span several reads and the buffer is released in between
+    raw_reader = RawFrameReader(io.BytesIO(data), read_size=1000)
+    raw_frames = []
+    while True:
+        try:
+            raw_frame, time_stamp, time_stamp_span, legacy_players, footer = raw_reader.next()
+        except EOFError:
+            break
+        msg_pack_frame = msgpack.unpackb(raw_frame, use_list=False)
+        if time_stamp_span is not None:
+            assert msgpack.unpackb(raw_frame[time_stamp_span[0]:time_stamp_span[1]]) == time_stamp
+            assert msg_pack_frame["timeStamp"] == time_stamp
+        assert footer == ("endLogTime" in msg_pack_frame)
+        raw_frames.append(msg_pack_frame)
+    assert raw_frames == expected
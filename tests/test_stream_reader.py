@@ -0,0 +1,131 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import socket
+import threading
+import msgpack
+import numpy as np
+import pytest
+from MsgPackWrapper import MsgPackWrapper
+from MsgPackWrapper.Lz4FrameReader import Lz4FrameReader
+
+__author__ = 'jleuven'
+
+
+class ChunkedStream(object):
+    """
+        Stream that returns at most 'chunk_size' bytes per read (like a socket or pipe)
+    """
+
+    def __init__(self, data, chunk_size=1000):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.offset = 0
+
+
+    def read(self, size=-1):
+        size = self.chunk_size if size is None or size < 0 else min(size, self.chunk_size)
+        data = self.data[self.offset:self.offset + size]
+        self.offset += len(data)
+        return data
+
+
+    def close(self):
+        pass
+
+
+def readObjects(file_name):
+    """
+        All msg-pack objects of an lz4 file (header, frames, footer)
+    """
+    objects = []
+    with open(file_name, "rb") as input_file:
+        unpacker = msgpack.Unpacker(Lz4FrameReader(input_file), use_list=False)
+        try:
+            for msg_pack_object in unpacker:
+                objects.append(msg_pack_object)
+        except EOFError:
+            pass
+    return objects
+
+
+@pytest.fixture
+def recording_data(recording):
+    with open(recording, "rb") as input_file:
+        return input_file.read()
+
+
+@pytest.fixture
+def serve():
+    """
+        Send data over a local TCP connection in chunks; returns the reading end as a file
+    """
+    threads = []
+
+    def serveData(data, chunk_size=1000):
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+
+        def send():
+            connection, _ = server.accept()
+            for begin in range(0, len(data), chunk_size):
+                connection.sendall(data[begin:begin + chunk_size])
+            connection.close()
+            server.close()
+        threads.append(threading.Thread(target=send))
+        threads[-1].start()
+        return socket.create_connection(server.getsockname()).makefile("rb")
+
+    yield serveData
+    for thread in threads:
+        thread.join()
+
+
+def test_tcp_stream_matches_file(recording, recording_data, header_resolver, decode_plain, serve):
+    reference = decode_plain(recording)
+    wrapper = MsgPackWrapper(os.path.basename(recording), input_data=serve(recording_data), use_iterator=False,
+                             skip_frames=1, as_numpy=True, header_resolver=header_resolver)
+    np.testing.assert_array_equal(wrapper.all_data, reference.all_data)
+    assert wrapper.header["startDateTime"] == reference.header["startDateTime"]
+    assert wrapper.footer is not None
+
+
+def test_chunked_stream_with_metadata(recording, recording_data, header_resolver, decode_plain):
+    # No file name: start time and host name are passed explicitly
+    reference = decode_plain(recording)
+    wrapper = MsgPackWrapper(input_data=ChunkedStream(recording_data, chunk_size=333), skip_frames=1, as_numpy=True,
+                             start_date_time=reference.header["startDateTime"], host_name="stream",
+                             header_resolver=header_resolver)
+    frames = np.array([np.array(frame) for frame in wrapper])
+    np.testing.assert_array_equal(frames, reference.all_data)
+    assert wrapper.header["startDateTime"] == reference.header["startDateTime"]
+
+
+def test_concatenated_stream(recording, recording_data, header_resolver, decode_plain):
+    reference = decode_plain(recording)
+    wrapper = MsgPackWrapper(os.path.basename(recording), input_data=ChunkedStream(recording_data * 2),
+                             use_iterator=False, skip_frames=1, as_numpy=True, header_resolver=header_resolver)
+    assert len(wrapper) == 2 * len(reference)
+    np.testing.assert_array_equal(wrapper.all_data[:len(reference)], reference.all_data)
+
+
+def test_stream_pass_through_matches_file(recording, recording_data, header_resolver, serve, tmpdir):
+    output_file_names = [str(tmpdir.join("from-file.lz4")), str(tmpdir.join("from-stream.lz4"))]
+    MsgPackWrapper(recording, output_file_names[0], pass_through_only=True, header_resolver=header_resolver)
+    # fast_repair falls back to decoding for streams
+    MsgPackWrapper(os.path.basename(recording), output_file_names[1], input_data=serve(recording_data),
+                   pass_through_only=True, fast_repair=True, header_resolver=header_resolver)
+    from_file, from_stream = [readObjects(output_file_name) for output_file_name in output_file_names]
+    # The stream reader keeps the footer, Lz4File loses its last byte
+    assert from_stream[:-1] == from_file
+    assert "endLogTime" in from_stream[-1]
+
+
+@pytest.mark.parametrize("buffer_type", [bytes, bytearray, memoryview])
+def test_buffer_random_access(recording, recording_data, header_resolver, decode_plain, buffer_type):
+    reference = decode_plain(recording).all_data
+    wrapper = MsgPackWrapper(os.path.basename(recording), input_data=buffer_type(recording_data), skip_frames=1,
+                             as_numpy=True, use_frame_index=True, header_resolver=header_resolver)
+    np.testing.assert_array_equal(wrapper[2500], reference[2500])
+    np.testing.assert_array_equal(wrapper[10:20], reference[10:20])
+    np.testing.assert_array_equal(wrapper[5], reference[5])
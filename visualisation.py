@@ -1,20 +1,126 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 from pprint import pprint
 import os
-os.environ["DISPLAY"] = ":0"
-
 import msgpack
 from lz4tools import Lz4File
-import visual as vis
 import traceback
 import sys
 import time
+import zlib
+import struct
 import datetime
+import argparse
 from enum import Enum
 import math
+import numpy as np
 
 __author__ = 'jleuven'
 
+# VPython, imported by the Visualiser: the offscreen renderer needs neither VPython nor a display
+vis = None
+
+# Goal: depth (along the length of the field), height, width
+GOAL_DIMENSIONS = (1.2, 2.14, 3.66)
+
+
+def importVisual():
+    """
+        Import VPython (on the display of the live visualisation)
+        :return: None
+    """
+    global vis
+    if vis is None:
+        os.environ["DISPLAY"] = ":0"
+        import visual as vis
+
+
+def getCircleCoords(radius, x_offset=0.0, z_offset=0.0, phase=0.0, period=2.0, num_points=100):
+    radians = ((math.pi * period) / num_points)
+    radians_offset = (math.pi * phase)
+    return [x_offset - math.cos(radians * x + radians_offset) * radius for x in xrange(0, num_points + 1)], \
+           [z_offset - math.sin(radians * z + radians_offset) * radius for z in xrange(0, num_points + 1)]
+
+
+def getFieldLines(field_dimensions):
+    """
+        Lines of the field (meters, x along the length, z along the width), drawn by the live visualisation and the
+        offscreen renderer
+        :param field_dimensions: fieldDimensions of the header (half length and width of the field)
+        :return: dict with name -> ([x values], [z values])
+    """
+    return {"middle_line": ([0, 0],
+                            [-field_dimensions[1], field_dimensions[1]]),
+            "field_edge": ([-field_dimensions[0], +field_dimensions[0],
+                            +field_dimensions[0], -field_dimensions[0],
+                            -field_dimensions[0],],
+                           [-field_dimensions[1], -field_dimensions[1],
+                            +field_dimensions[1], +field_dimensions[1],
+                            -field_dimensions[1],]),
+            "left_23": ([-field_dimensions[0] + 23, -field_dimensions[0] + 23],
+                        [-field_dimensions[1], field_dimensions[1]]),
+            "right_23": ([field_dimensions[0] - 23, +field_dimensions[0] - 23],
+                         [-field_dimensions[1], field_dimensions[1]])}
+
+
+def getSemiCircleLines(field_dimensions, radius, left, dotted=False):
+    """
+        Lines of a (dotted) shooting circle: quarter circles around the goal posts and the straight line in between
+        :param field_dimensions: fieldDimensions of the header
+        :param radius: Radius (meters)
+        :param left: Circle of the left goal
+        :param dotted: Dotted circle (quarter circles in parts)
+        :return: list of ([x values], [z values])
+    """
+    if left:
+        x_offset = -field_dimensions[0]
+        x_rad = +radius
+        period = 0.5
+        phase_1 = 0.5
+        phase_2 = 1.0
+    else:
+        x_offset = field_dimensions[0]
+        x_rad = -radius
+        period = 0.5
+        phase_1 = 0
+        phase_2 = 1.5
+
+    lines = _getCircleLines(radius=radius, x_offset=x_offset, z_offset=-GOAL_DIMENSIONS[2] / 2, period=period,
+                            phase=phase_1, dotted=dotted)
+    lines.append(([x_offset + x_rad, x_offset + x_rad],
+                  [-GOAL_DIMENSIONS[2] / (6 if dotted else 2), GOAL_DIMENSIONS[2] / (6 if dotted else 2)]))
+    lines.extend(_getCircleLines(radius=radius, x_offset=x_offset, z_offset=GOAL_DIMENSIONS[2] / 2, period=period,
+                                 phase=phase_2, dotted=dotted))
+    return lines
+
+
+def getCircleLines(field_dimensions):
+    """
+        :param field_dimensions: fieldDimensions of the header
+        :return: dict with name -> list of ([x values], [z values]) of the shooting circles (drawCircles)
+    """
+    return {"left_circle": getSemiCircleLines(field_dimensions, radius=14.63, left=True),
+            "right_circle": getSemiCircleLines(field_dimensions, radius=14.63, left=False),
+            "left_circle_dotted": getSemiCircleLines(field_dimensions, radius=19.63, left=True, dotted=True),
+            "right_circle_dotted": getSemiCircleLines(field_dimensions, radius=19.63, left=False, dotted=True)}
+
+
+def getFieldDots(field_dimensions):
+    """
+        :param field_dimensions: fieldDimensions of the header
+        :return: dict with name -> (x, z) of the penalty spots and the centre spot
+    """
+    return {"left_dot": (-field_dimensions[0] + 5, 0),
+            "middle_dot": (0, 0),
+            "right_dot": (field_dimensions[0] - 5, 0)}
+
+
+def _getCircleLines(dotted=False, **kwargs):
+    kwargs["num_points"] = 53 * 5
+    coords = getCircleCoords(**kwargs)
+    if dotted:
+        return [(coords[0][part * 5:part * 5 + 5], coords[1][part * 5:part * 5 + 5]) for part in range(0, 53 + 1, 2)]
+    return [coords]
+
 
 class Colours(tuple, Enum):
     # member_type = tuple
@@ -31,7 +137,7 @@ class Colours(tuple, Enum):
 class Goal(object):
 
     def __init__(self, pos):
-        self.dimensions = (1.2, 2.14, 3.66)
+        self.dimensions = GOAL_DIMENSIONS
         self.pos = (pos[0] + self.dimensions[0] / 2
                     if pos[0] > 0 else
                     pos[0] - self.dimensions[0] / 2,
@@ -156,6 +262,7 @@ class Visualiser(object):
         left_circle_dotted = right_circle_dotted = left_dot = middle_dot = right_dot = None
 
     def __init__(self, filename=None):
+        importVisual()
         self.input_file_name = filename
         file_name = os.path.split(self.input_file_name)[-1]
         print(file_name)
@@ -336,10 +443,8 @@ class Visualiser(object):
 
 
     def getCircleCoords(self, radius, x_offset=0.0, z_offset=0.0, phase=0.0, period=2.0, num_points=100):
-        radians = ((math.pi * period) / num_points)
-        radians_offset = (math.pi * phase)
-        return [x_offset - math.cos(radians * x + radians_offset) * radius for x in xrange(0, num_points + 1)], \
-               [z_offset - math.sin(radians * z + radians_offset) * radius for z in xrange(0, num_points + 1)]
+        return getCircleCoords(radius, x_offset=x_offset, z_offset=z_offset, phase=phase, period=period,
+                               num_points=num_points)
 
 
     def drawField(self):
@@ -351,58 +456,18 @@ class Visualiser(object):
 
         self.left_goal = Goal(pos=(-self.field_dimensions[0], 0, 0))
         self.right_goal = Goal(pos=(self.field_dimensions[0], 0, 0))
-        self.middle_line = vis.curve(x=[0, 0],
-                                     z=[-self.field_dimensions[1], self.field_dimensions[1]],
-                                     color=Colours.white)
-        self.field_edge = vis.curve(x=[-self.field_dimensions[0], +self.field_dimensions[0],
-                                       +self.field_dimensions[0], -self.field_dimensions[0],
-                                       -self.field_dimensions[0],],
-                                    z=[-self.field_dimensions[1], -self.field_dimensions[1],
-                                       +self.field_dimensions[1], +self.field_dimensions[1],
-                                       -self.field_dimensions[1],],
-                                    color=Colours.white)
+        lines = getFieldLines(self.field_dimensions)
+        self.middle_line = vis.curve(x=lines["middle_line"][0], z=lines["middle_line"][1], color=Colours.white)
+        self.field_edge = vis.curve(x=lines["field_edge"][0], z=lines["field_edge"][1], color=Colours.white)
 
-        self.left_23 = vis.curve(x=[-self.field_dimensions[0] + 23, -self.field_dimensions[0] + 23],
-                                 z=[-self.field_dimensions[1], self.field_dimensions[1]])
+        self.left_23 = vis.curve(x=lines["left_23"][0], z=lines["left_23"][1])
 
-        self.right_23 = vis.curve(x=[self.field_dimensions[0] - 23, +self.field_dimensions[0] - 23],
-                                  z=[-self.field_dimensions[1], self.field_dimensions[1]])
+        self.right_23 = vis.curve(x=lines["right_23"][0], z=lines["right_23"][1])
 
 
     def drawSemiCircle(self, radius, left, dotted=False):
-        if left:
-            x_offset = -self.field_dimensions[0]
-            x_rad = +radius
-            period = 0.5
-            phase_1 = 0.5
-            phase_2 = 1.0
-        else:
-            x_offset = self.field_dimensions[0]
-            x_rad = -radius
-            period = 0.5
-            phase_1 = 0
-            phase_2 = 1.5
-
-        semi_circle = []
-        semi_circle.append(self.__drawCircle(radius=radius,
-                                             x_offset=x_offset,
-                                             z_offset=-self.left_goal.dimensions[2] / 2,
-                                             period=period,
-                                             phase=phase_1,
-                                             dotted=dotted))
-
-        semi_circle.append(vis.curve(x=[x_offset + x_rad,
-                                        x_offset + x_rad],
-                                     z=[-self.left_goal.dimensions[2] / (6 if dotted else 2),
-                                        self.left_goal.dimensions[2] / (6 if dotted else 2)]))
-
-        semi_circle.append(self.__drawCircle(radius=radius,
-                                             x_offset=x_offset,
-                                             z_offset=self.left_goal.dimensions[2] / 2,
-                                             period=period,
-                                             phase=phase_2,
-                                             dotted=dotted))
-        return semi_circle
+        return [vis.curve(x=x, z=z, color=Colours.white)
+                for x, z in getSemiCircleLines(self.field_dimensions, radius, left, dotted=dotted)]
 
 
     def drawCircles(self):
@@ -415,31 +480,13 @@ class Visualiser(object):
         self.right_circle_dotted = self.drawSemiCircle(radius=19.63, left=False, dotted=True)
 
 
-    def __drawCircle(self, **kwargs):
-        if "dotted" in kwargs:
-            dotted = kwargs["dotted"]
-            del kwargs["dotted"]
-        else:
-            dotted = False
-        kwargs["num_points"] = 53 * 5
-        coords = self.getCircleCoords(**kwargs)
-        if dotted:
-            dotted_circle = []
-            for part in range(0, 53 + 1, 2):
-                dotted_circle.append(vis.curve(x=coords[0][part * 5:part * 5 + 5],
-                                               z=coords[1][part * 5:part * 5 + 5],
-                                               color=Colours.white))
-            return dotted_circle
-        else:
-            return vis.curve(x=coords[0], z=coords[1], color=Colours.white)
-
-
     def drawDots(self):
-        self.left_dot = self.__drawDot((-self.field_dimensions[0] + 5, 0))
+        dots = getFieldDots(self.field_dimensions)
+        self.left_dot = self.__drawDot(dots["left_dot"])
 
-        self.middle_dot = self.__drawDot((0, 0))
+        self.middle_dot = self.__drawDot(dots["middle_dot"])
 
-        self.right_dot = self.__drawDot((self.field_dimensions[0] - 5, 0))
+        self.right_dot = self.__drawDot(dots["right_dot"])
 
 
     def __drawDot(self, pos):
@@ -453,3 +500,276 @@ class Visualiser(object):
         if self.input_file is not None:
             self.input_file.close()
 
+
+
+class OffscreenRenderer(object):
+    """
+        Renders processed frames (MsgPackWrapper as_numpy rows: max_players * [x, y, weight] + ball [x, y, value] +
+        timestamp) as top views onto NumPy image buffers, without VPython or a display. The field (geometry of
+        Visualiser.drawField/drawCircles/drawDots) is drawn once; players and balls of a batch of frames are stamped
+        onto copies of it at once. Image columns run along the length of the field, rows along the width (z, like the
+        Visualiser scene seen from above).
+        Processed frames only have the main ball (main ballLine or first ball), so only that ball is drawn; the other
+        balls the live Visualiser shows (in red) are not. Like in the Visualiser, a ball is drawn when it is inside the
+        field (ballLine frames have no ball value, so the value column is not used).
+    """
+
+    def __init__(self, max_players, field_dimensions, width=960, margin=3.0):
+        """
+            Constructor
+            :param max_players: maxPlayers of the recording
+            :param field_dimensions: fieldDimensions of the recording (half length and width of the field, in meters)
+            :param width: Image width (pixels), the height follows from the field dimensions
+            :param margin: Space around the field (meters)
+        """
+        self.max_players = max_players
+        self.field_dimensions = (float(field_dimensions[0]), float(field_dimensions[1]))
+        self.margin = margin
+        self.width = int(width)
+        self.scale = self.width / (2 * (self.field_dimensions[0] + self.margin))  # Pixels per meter
+        self.height = int(round(2 * (self.field_dimensions[1] + self.margin) * self.scale))
+        self.player_radius = 0.5
+        self.ball_radius = 0.3
+        self.line_radius = 0.075
+        self.field_image = self.__drawField()
+
+
+    @classmethod
+    def fromHeader(cls, header, width=960, margin=3.0):
+        """
+            Create renderer for the recordings of a header
+            :param header: msg-pack-header (maxPlayers, fieldDimensions)
+            :param width: Image width (pixels)
+            :param margin: Space around the field (meters)
+            :return: OffscreenRenderer
+        """
+        return cls(header["maxPlayers"], header["fieldDimensions"], width=width, margin=margin)
+
+
+    def toPixels(self, x, z):
+        """
+            :param x: Position(s) along the length of the field (meters)
+            :param z: Position(s) along the width of the field (meters)
+            :return: (rows, columns) of the positions, int arrays
+        """
+        return (np.round((np.asarray(z) + self.field_dimensions[1] + self.margin) * self.scale).astype(np.int64),
+                np.round((np.asarray(x) + self.field_dimensions[0] + self.margin) * self.scale).astype(np.int64))
+
+
+    def renderFrames(self, frames, images=None):
+        """
+            Render frames
+            :param frames: array (number of frames x (max_players * 3 + 4)) or one frame
+            :param images: uint8 array (at least number of frames x height x width x 3) to render into (e.g. reused
+                           between batches), None: new array
+            :return: uint8 array (number of frames x height x width x 3), RGB
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        if frames.ndim == 1:
+            frames = frames[np.newaxis]
+        if images is None:
+            images = np.empty((len(frames), self.height, self.width, 3), dtype=np.uint8)
+        images = images[:len(frames)]
+        images[:] = self.field_image
+
+        players = frames[:, :self.max_players * 3].reshape(len(frames), self.max_players, 3)
+        frame_indices, slots = np.nonzero(players.any(axis=2))
+        rows, cols = self.toPixels(players[frame_indices, slots, 0] * self.field_dimensions[0],
+                                   -players[frame_indices, slots, 1] * self.field_dimensions[1])
+        self.__stamp(images, frame_indices, rows, cols, self.player_radius, Colours.blue)
+
+        # Ball positions are in meters; balls outside the field are not valid (Visualiser.drawBallLines)
+        balls = frames[:, self.max_players * 3:self.max_players * 3 + 2]
+        frame_indices = np.flatnonzero((np.abs(balls[:, 0]) < self.field_dimensions[0]) &
+                                       (np.abs(balls[:, 1]) < self.field_dimensions[1]))
+        rows, cols = self.toPixels(balls[frame_indices, 0], -balls[frame_indices, 1])
+        self.__stamp(images, frame_indices, rows, cols, self.ball_radius, Colours.yellow)
+        return images
+
+
+    def __drawField(self):
+        """
+            :return: uint8 array (height x width x 3) with field, lines, dots and goals
+        """
+        image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        image[:] = _toRGB(Colours.black)
+        top, left = self.toPixels(-self.field_dimensions[0], -self.field_dimensions[1])
+        bottom, right = self.toPixels(self.field_dimensions[0], self.field_dimensions[1])
+        image[max(top, 0):bottom + 1, max(left, 0):right + 1] = _toRGB(Colours.green)
+
+        for side in (-1, 1):
+            top, left = self.toPixels(side * self.field_dimensions[0], -GOAL_DIMENSIONS[2] / 2)
+            bottom, right = self.toPixels(side * (self.field_dimensions[0] + GOAL_DIMENSIONS[0]), GOAL_DIMENSIONS[2] / 2)
+            left, right = min(left, right), max(left, right)
+            image[max(top, 0):bottom + 1, max(left, 0):right + 1] = _toRGB(Colours.gray)
+
+        lines = list(getFieldLines(self.field_dimensions).values())
+        for circle_lines in getCircleLines(self.field_dimensions).values():
+            lines.extend(circle_lines)
+        xs, zs = [], []
+        for line_x, line_z in lines:
+            for x_from, x_to, z_from, z_to in zip(line_x[:-1], line_x[1:], line_z[:-1], line_z[1:]):
+                # Samples at most half a pixel apart
+                num_samples = int(math.ceil(math.hypot(x_to - x_from, z_to - z_from) * self.scale * 2)) + 1
+                xs.append(np.linspace(x_from, x_to, num_samples))
+                zs.append(np.linspace(z_from, z_to, num_samples))
+        rows, cols = self.toPixels(np.concatenate(xs), np.concatenate(zs))
+        self.__stamp(image[np.newaxis], np.zeros(len(rows), dtype=np.int64), rows, cols, self.line_radius,
+                     Colours.white)
+
+        dots = np.array(list(getFieldDots(self.field_dimensions).values()), dtype=np.float64)
+        rows, cols = self.toPixels(dots[:, 0], dots[:, 1])
+        self.__stamp(image[np.newaxis], np.zeros(len(rows), dtype=np.int64), rows, cols, 0.2, Colours.white)
+        return image
+
+
+    def __stamp(self, images, image_indices, rows, cols, radius, colour):
+        """
+            Draw discs (all at once with fancy indexing)
+            :param images: array (number of images x height x width x 3)
+            :param image_indices: Image of every disc
+            :param rows: Centre row of every disc
+            :param cols: Centre column of every disc
+            :param radius: Radius (meters, at least half a pixel)
+            :param colour: Colours member
+            :return: None
+        """
+        pixel_radius = max(radius * self.scale, 0.5)
+        size = int(math.ceil(pixel_radius))
+        offset_rows, offset_cols = np.mgrid[-size:size + 1, -size:size + 1]
+        inside = offset_rows ** 2 + offset_cols ** 2 <= pixel_radius ** 2
+        rows = (rows[:, np.newaxis] + offset_rows[inside]).ravel()
+        cols = (cols[:, np.newaxis] + offset_cols[inside]).ravel()
+        image_indices = np.repeat(image_indices, np.count_nonzero(inside))
+        on_image = (rows >= 0) & (rows < images.shape[1]) & (cols >= 0) & (cols < images.shape[2])
+        images[image_indices[on_image], rows[on_image], cols[on_image]] = _toRGB(colour)
+
+
+def _toRGB(colour):
+    return np.round(np.array(colour.value) * 255).astype(np.uint8)
+
+
+def writeImage(file_name, image):
+    """
+        Write an image as PNG (file_name ends with .png) or binary PPM (only zlib is needed, no imaging library)
+        :param file_name: Name of the image file
+        :param image: uint8 array (height x width x 3), RGB
+        :return: None
+    """
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[:2]
+    with open(file_name, "wb") as image_file:
+        if not file_name.lower().endswith(".png"):
+            image_file.write("P6\n{} {}\n255\n".format(width, height).encode("ascii"))
+            image_file.write(image.tobytes())
+            return
+
+        def writeChunk(chunk_type, data):
+            image_file.write(struct.pack(">I", len(data)))
+            image_file.write(chunk_type + data)
+            image_file.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+        # Every row starts with filter type 0 (none)
+        rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+        rows[:, 1:] = image.reshape(height, width * 3)
+        image_file.write(b"\x89PNG\r\n\x1a\n")
+        writeChunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        writeChunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+        writeChunk(b"IEND", b"")
+
+
+def renderRecording(input_file_name, output_pattern="frame_{:06d}.png", width=960, skip_frames=1, batch_size=32,
+                    max_frames=None, **options):
+    """
+        Render the frames of a recording to image files, without a display. The frames are decoded by MsgPackWrapper
+        (not stored) and rendered batch_size frames at a time
+        :param input_file_name: Name of the recording
+        :param output_pattern: Image file names, formatted with the number of the image (.png or .ppm)
+        :param width: Image width (pixels)
+        :param skip_frames: Render one in every skip_frames frames
+        :param batch_size: Number of frames that are rendered at once
+        :param max_frames: Maximal number of images (None: all frames)
+        :param options: Other MsgPackWrapper options (e.g. min_life, all_life_matters, decode_threads)
+        :return: Number of images written
+    """
+    from MsgPackWrapper import MsgPackWrapper
+    wrapper = MsgPackWrapper(input_file_name, as_numpy=True, retain_data=False, retain_msg_pack_data=False,
+                             skip_frames=skip_frames, **options)
+    renderer = OffscreenRenderer.fromHeader(wrapper.header, width=width)
+    images = np.empty((batch_size, renderer.height, renderer.width, 3), dtype=np.uint8)
+    batch = []
+    num_images = 0
+    try:
+        for frame in wrapper:
+            batch.append(frame)
+            last_frame = max_frames is not None and num_images + len(batch) >= max_frames
+            if len(batch) == batch_size or last_frame:
+                for image in renderer.renderFrames(batch, images):
+                    writeImage(output_pattern.format(num_images), image)
+                    num_images += 1
+                batch = []
+            if last_frame:
+                break
+        if batch:
+            for image in renderer.renderFrames(batch, images):
+                writeImage(output_pattern.format(num_images), image)
+                num_images += 1
+    finally:
+        wrapper.closeInputFile()
+    return num_images
+
+
+def renderThumbnail(input_file_name, output_file_name, width=320, frame_number=0, skip_frames=1, **options):
+    """
+        Render one frame of a recording to an image file, without a display
+        :param input_file_name: Name of the recording
+        :param output_file_name: Name of the image file (.png or .ppm)
+        :param width: Image width (pixels)
+        :param frame_number: Frame to render, counted in steps of skip_frames frames (the last frame if the recording
+                             is shorter)
+        :param skip_frames: Use one in every skip_frames frames
+        :param options: Other MsgPackWrapper options
+        :return: None
+    """
+    from MsgPackWrapper import MsgPackWrapper
+    wrapper = MsgPackWrapper(input_file_name, as_numpy=True, retain_data=False, retain_msg_pack_data=False,
+                             skip_frames=skip_frames, **options)
+    renderer = OffscreenRenderer.fromHeader(wrapper.header, width=width)
+    frame = None
+    try:
+        for number, frame in enumerate(wrapper):
+            if number >= frame_number:
+                break
+    finally:
+        wrapper.closeInputFile()
+    if frame is None:
+        raise ValueError("No frames in {}".format(input_file_name))
+    writeImage(output_file_name, renderer.renderFrames(frame)[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Visualise a PlayerData recording: live (VPython, needs a display) "
+                                                 "or rendered to image files")
+    parser.add_argument("input", help="recording")
+    parser.add_argument("-o", "--output", help="render the frames to image files, e.g. frames/frame_{:06d}.png")
+    parser.add_argument("--thumbnail", help="render one frame (--frame) to an image file")
+    parser.add_argument("--frame", type=int, default=0, help="frame of the thumbnail (in steps of SKIP_FRAMES)")
+    parser.add_argument("--width", type=int, default=None, help="image width (default: 960, thumbnail: 320)")
+    parser.add_argument("--skip-frames", type=int, default=1, help="render one in every SKIP_FRAMES frames")
+    parser.add_argument("--max-frames", type=int, default=None, help="maximal number of images")
+    args = parser.parse_args(argv)
+
+    if args.thumbnail:
+        renderThumbnail(args.input, args.thumbnail, width=args.width or 320, frame_number=args.frame,
+                        skip_frames=args.skip_frames)
+        print(args.thumbnail)
+    elif args.output:
+        print(renderRecording(args.input, args.output, width=args.width or 960, skip_frames=args.skip_frames,
+                              max_frames=args.max_frames))
+    else:
+        Visualiser(args.input).startSimulation()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())